@@ -0,0 +1,250 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from binance.helpers import interval_to_milliseconds
+from OpenBacktest.ObtClient import set_offline
+from OpenBacktest.ObtEngine import Container, Engine, Pair, Report, Signals
+from OpenBacktest.ObtUtility import Colors, kline_columns
+from OpenBacktest.ObtWallet import Wallet
+
+# ------------------------------------------------------------------------------------------------
+# Benchmarks of the library on synthetic market data, nothing is requested to the API
+# python -m OpenBacktest.ObtBenchmark --bars 1000000 --output results.json
+# python -m OpenBacktest.ObtBenchmark --bars 1000000 --compare baseline.json --threshold 20
+# ------------------------------------------------------------------------------------------------
+
+# first timestamp of the synthetic bars, 2021-01-01
+START = 1609459200000
+
+
+# make a dataframe of synthetic klines with the columns of binance klines, the same seed always gives the same bars
+def make_synthetic_klines(bars, timeframe="1m", seed=0, start=START):
+    rng = np.random.default_rng(seed)
+    step = interval_to_milliseconds(timeframe)
+
+    # Geometric random walk with some volatility clustering
+    volatility = 0.002 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)).clip(-2, 2))
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 1, bars) * volatility))
+    opening = np.concatenate(([100.0], close[:-1]))
+    high = np.maximum(opening, close) * (1 + rng.exponential(volatility / 2))
+    low = np.minimum(opening, close) * (1 - rng.exponential(volatility / 2))
+    volume = rng.gamma(2, 50, bars)
+    timestamps = start + np.arange(bars, dtype=np.int64) * step
+
+    data = {"timestamp": timestamps, "open": opening, "high": high, "low": low, "close": close, "volume": volume,
+            "close_time": timestamps + step - 1, "quote_av": volume * close,
+            "trades": rng.integers(10, 1000, bars), "tb_base_av": volume / 2, "tb_quote_av": volume * close / 2,
+            "ignore": np.zeros(bars)}
+    return pd.DataFrame({column: data[column] for column in kline_columns})
+
+
+# make an engine with a synthetic main pair holding two EMA columns
+def make_engine(bars, seed=0, timeframe="1m"):
+    pair = Pair("BTCUSDT", "1 January 2021", timeframe, "main")
+    dataframe = make_synthetic_klines(bars, timeframe, seed)
+    dataframe["fast"] = dataframe["close"].ewm(span=20, adjust=False).mean()
+    dataframe["slow"] = dataframe["close"].ewm(span=80, adjust=False).mean()
+    pair.set_dataframe(dataframe)
+    container = Container()
+    container.add_main_pair(pair)
+    return Engine(container, output=False, load=False)
+
+
+# strategy buying when the fast EMA cross over the slow one and selling on the opposite cross
+def cross_strategy(bars, index):
+    if index == 0:
+        return None
+    fast = bars["fast"]
+    slow = bars["slow"]
+    if fast[index] > slow[index] and fast[index - 1] <= slow[index - 1]:
+        return Report("buy")
+    if fast[index] < slow[index] and fast[index - 1] >= slow[index - 1]:
+        return Report("sell")
+    return None
+
+
+# vectorized version of cross_strategy
+def cross_signals(dataframe):
+    above = (dataframe["fast"] > dataframe["slow"]).to_numpy()
+    previous = np.concatenate(([above[0]], above[:-1]))
+    return Signals.from_conditions(above & ~previous, ~above & previous)
+
+
+# time a function, the best of repeat calls is kept, setup is called before each call and not timed
+def measure(function, repeat=3, setup=None):
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+# ------------------------------------------------------------------------------------------------
+# This class run the benchmarks and hold their results as name: {"seconds", "items"}
+# ------------------------------------------------------------------------------------------------
+class Benchmark:
+    def __init__(self, bars=100000, seed=0, repeat=3, output=True):
+        self.bars = bars
+        self.seed = seed
+        self.repeat = repeat
+        self.output = output
+        self.results = {}
+
+    # time a function and store the result, items is the number of processed items used to get a rate
+    def add(self, name, function, items=None, setup=None, repeat=None):
+        seconds = measure(function, self.repeat if repeat is None else repeat, setup)
+        self.results[name] = {"seconds": seconds, "items": items}
+        if self.output:
+            rate = "" if items is None else " (" + format(items / seconds, ",.0f") + " /s)"
+            print(Colors.LIGHT_BLUE + name.ljust(28), format(seconds, ".6f") + "s" + rate)
+
+    # run all benchmarks
+    def run(self):
+        if self.output:
+            print(Colors.PURPLE + "Benchmark on", format(self.bars, ","), "synthetic bars")
+
+        # Data generation
+        self.add("make_synthetic_klines", lambda: make_synthetic_klines(self.bars, seed=self.seed), self.bars,
+                 repeat=1)
+
+        engine = make_engine(self.bars, self.seed)
+        main = engine.container.main
+        parameters = ("USDT", "BTC", 1000, 0, 0.1)
+
+        # Backtests
+        engine.register_strategy(cross_strategy)
+        self.add("run_strategy", lambda: engine.run_strategy(*parameters), self.bars)
+        engine.register_strategy(cross_signals, vectorized=True)
+        self.add("run_strategy_vectorized", lambda: engine.run_strategy(*parameters), self.bars)
+
+        # Orders
+        orders = min(self.bars, 100000) // 2 * 2
+        wallets = []
+
+        def make_wallet():
+            wallets[:] = [Wallet("USDT", "BTC", 1000, 0, 0.1, main.dataframe, bars=engine.bars)]
+
+        def pass_orders():
+            wallet = wallets[0]
+            for index in range(0, orders, 2):
+                wallet.buy(index)
+                wallet.sell(index + 1)
+        self.add("wallet_buy_sell", pass_orders, orders, setup=make_wallet)
+
+        # Summary of the last run
+        engine.run_strategy(*parameters)
+        handler = engine.wallet.get_data_handler()
+        trades = engine.wallet.ledger.length
+        self.add("make_data", handler.make_data, trades)
+        self.add("get_metrics", handler.get_metrics, trades)
+        # The equity curve is cached by the wallet, it's removed to be built again by each call
+        self.add("plot_data", engine.wallet.get_plot_data, self.bars,
+                 setup=lambda: setattr(engine.wallet, "equity", None))
+
+        # Index lookups
+        rng = np.random.default_rng(self.seed)
+        timestamps = rng.integers(main.timestamps[0], main.timestamps[-1], 100000)
+        lookups = timestamps[:10000].tolist()
+        self.add("get_index", lambda: [main.get_index(timestamp) for timestamp in lookups], len(lookups))
+        self.add("get_indexes", lambda: main.get_indexes(timestamps), len(timestamps))
+
+        # Files
+        with tempfile.TemporaryDirectory() as folder:
+            folder += os.sep
+            self.add("save_obt", lambda: main.save(folder, output=False, file_format="obt", cache=False), self.bars)
+            self.add("load_obt", lambda: self.load(main, folder), self.bars)
+            # csv files are slow, they are only measured on a limited size
+            if self.bars <= 1000000:
+                self.add("save_csv", lambda: main.save(folder, output=False, file_format="csv", cache=False), self.bars,
+                         repeat=1)
+                os.remove(folder + main.make_file_name("obt"))
+                self.add("load_csv", lambda: self.load(main, folder), self.bars, repeat=1)
+        return self.results
+
+    # load a copy of a pair from a folder
+    @staticmethod
+    def load(pair, folder):
+        copy = Pair(pair.pair, pair.start, pair.timeframe, pair.name, folder)
+        copy.load(output=False)
+        return copy
+
+    # get the results with the environment they were measured in
+    def make_report(self):
+        return {"bars": self.bars, "seed": self.seed, "repeat": self.repeat, "time": time.time(),
+                "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+                "platform": platform.platform(), "results": self.results}
+
+    # write the report as a json file
+    def save(self, path):
+        with open(path, "w") as file:
+            json.dump(self.make_report(), file, indent=2)
+
+
+# compare results to a baseline report, a benchmark slower than the baseline by more than threshold % and by more than
+# minimum seconds is a regression, minimum ignores the noise of very short benchmarks, return the regressions names
+def compare(results, baseline, threshold=20.0, minimum=0.001, output=True):
+    if baseline.get("bars") is not None and output:
+        print(Colors.PURPLE + "Comparing to a baseline of", format(baseline["bars"], ","), "bars")
+    regressions = []
+    for name, result in results.items():
+        reference = baseline["results"].get(name)
+        if reference is None or not reference["seconds"]:
+            continue
+        change = 100 * (result["seconds"] / reference["seconds"] - 1)
+        if change > threshold and result["seconds"] - reference["seconds"] > minimum:
+            regressions.append(name)
+            color = Colors.RED
+        elif change < -threshold:
+            color = Colors.GREEN
+        else:
+            color = Colors.CYAN
+        if output:
+            print(color + name.ljust(28), format(reference["seconds"], ".6f") + "s ->",
+                  format(result["seconds"], ".6f") + "s", format(change, "+.1f") + "%")
+    if output:
+        if regressions:
+            print(Colors.RED + str(len(regressions)), "regression(s):", ", ".join(regressions))
+        else:
+            print(Colors.LIGHT_GREEN + "No regression")
+    return regressions
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Benchmark Open Backtest on synthetic market data")
+    parser.add_argument("--bars", type=int, default=100000, help="number of synthetic bars")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic bars")
+    parser.add_argument("--repeat", type=int, default=3, help="calls of each benchmark, the best one is kept")
+    parser.add_argument("--output", help="json file to write the results to")
+    parser.add_argument("--compare", help="json file of baseline results")
+    parser.add_argument("--threshold", type=float, default=20.0, help="slowdown in %% flagged as a regression")
+    parser.add_argument("--minimum", type=float, default=0.001, help="slowdown in seconds ignored as noise")
+    arguments = parser.parse_args(arguments)
+
+    # Only synthetic data is used
+    set_offline(True)
+    benchmark = Benchmark(arguments.bars, arguments.seed, arguments.repeat)
+    results = benchmark.run()
+    if arguments.output:
+        benchmark.save(arguments.output)
+
+    if arguments.compare:
+        with open(arguments.compare, "r") as file:
+            baseline = json.load(file)
+        if compare(results, baseline, arguments.threshold, arguments.minimum):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# --------------------------
+# Binary cache file format
+# --------------------------
+# magic | header length (uint64) | json header padded to ALIGNMENT | columns, each one starting on ALIGNMENT bytes
+# the header hold the pair metadata and the name, dtype and offset of each column so columns are memory mapped
+# without parsing
+
+MAGIC = b"OBTCACHE"
+VERSION = 1
+ALIGNMENT = 64
+
+
+# round an offset to the next aligned offset
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+# get a column as an array that can be written in a cache file
+def make_column(series):
+    values = series.to_numpy()
+    if values.dtype.kind in "biufmM":
+        return values
+    try:
+        return pd.to_numeric(series).to_numpy()
+    except (ValueError, TypeError):
+        return series.astype(str).to_numpy(dtype=str)
+
+
+# write a dataframe as a cache file, the file is written next to the path and then replaced atomically
+def write_cache(path, dataframe, metadata):
+    columns = [(str(name), np.ascontiguousarray(make_column(dataframe[name]))) for name in dataframe.columns]
+
+    header = dict(metadata, version=VERSION, rows=len(dataframe), columns=[])
+    if "timestamp" in dataframe.columns and len(dataframe) > 0:
+        header["first_timestamp"] = int(dataframe["timestamp"].iloc[0])
+        header["last_timestamp"] = int(dataframe["timestamp"].iloc[-1])
+
+    # offsets depend of the header size, the header is made large enough for any offset
+    for name, values in columns:
+        header["columns"].append({"name": name, "dtype": values.dtype.str, "offset": 0})
+    header_size = align(len(MAGIC) + 8 + len(json.dumps(header).encode()) + 20 * len(columns) + 64)
+    offset = header_size
+    for column, (name, values) in zip(header["columns"], columns):
+        column["offset"] = offset
+        offset = align(offset + values.nbytes)
+
+    encoded = json.dumps(header).encode()
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(MAGIC)
+        file.write(np.uint64(len(encoded)).tobytes())
+        file.write(encoded.ljust(header_size - len(MAGIC) - 8, b" "))
+        for column, (name, values) in zip(header["columns"], columns):
+            file.seek(column["offset"])
+            file.write(values.tobytes())
+        file.truncate(offset)
+    os.replace(temporary_path, path)
+
+
+# read the header of a cache file
+def read_header(path):
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(path + " is not an Open Backtest cache file")
+        length = int(np.frombuffer(file.read(8), dtype=np.uint64)[0])
+        return json.loads(file.read(length).decode())
+
+
+# read a cache file as a dataframe, with mmap=True columns are copy on write views of the file
+def read_cache(path, mmap=True):
+    header = read_header(path)
+    rows = header["rows"]
+    if mmap and rows > 0:
+        raw = np.memmap(path, dtype=np.uint8, mode="c")
+    else:
+        raw = np.fromfile(path, dtype=np.uint8)
+
+    data = {}
+    for column in header["columns"]:
+        dtype = np.dtype(column["dtype"])
+        start = column["offset"]
+        data[column["name"]] = raw[start:start + rows * dtype.itemsize].view(dtype)
+    return pd.DataFrame(data, copy=False), header
+
+
+# read a cache file by chunks of rows and yield (first row, dataframe), rows are copied out of the file so only one
+# chunk is held in memory, columns selects the columns to read
+def iter_cache(path, chunk_size, columns=None):
+    header = read_header(path)
+    rows = header["rows"]
+    if rows == 0:
+        return
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    selected = [column for column in header["columns"] if columns is None or column["name"] in columns]
+    for start in range(0, rows, chunk_size):
+        end = min(start + chunk_size, rows)
+        data = {}
+        for column in selected:
+            dtype = np.dtype(column["dtype"])
+            offset = column["offset"] + start * dtype.itemsize
+            data[column["name"]] = raw[offset:offset + (end - start) * dtype.itemsize].view(dtype).copy()
+        yield start, pd.DataFrame(data, copy=False)
@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+import time
+from binance.client import Client
+from OpenBacktest.ObtUtility import Colors
+
+# --------------------------
+# Settings
+# --------------------------
+
+# folder of the local caches
+cache_folder = os.path.join(os.path.expanduser("~"), ".open_backtest")
+# time to live of the cached exchange information in seconds
+exchange_info_ttl = 86400
+# in offline mode nothing is requested to the API, only local caches are used
+offline = os.environ.get("OPEN_BACKTEST_OFFLINE", "") not in ("", "0")
+
+# shared python-binance client and exchange information, created when first used
+client = None
+symbols = None
+lock = threading.Lock()
+
+
+# enable or disable the offline mode
+def set_offline(state=True):
+    global offline
+    offline = state
+
+
+# check if the offline mode is enabled
+def is_offline():
+    return offline
+
+
+# set the folder of the local caches
+def set_cache_folder(folder):
+    global cache_folder, symbols
+    cache_folder = folder
+    symbols = None
+
+
+# get the shared python-binance client, None in offline mode
+def get_client():
+    global client
+    if offline:
+        return None
+    with lock:
+        if client is None:
+            client = Client()
+        return client
+
+
+# get the path of the cached exchange information
+def get_exchange_info_path():
+    return os.path.join(cache_folder, "exchange_info.json")
+
+
+# get the symbols of the exchange as a dict of symbol: information, None if they can't be known
+def get_symbols():
+    global symbols
+    if symbols is not None:
+        return symbols
+
+    path = get_exchange_info_path()
+    cached = None
+    if os.path.isfile(path):
+        with open(path, "r") as file:
+            cached = json.load(file)
+
+    if cached is not None and (offline or time.time() - cached["time"] < exchange_info_ttl):
+        symbols = cached["symbols"]
+        return symbols
+    if offline:
+        return None
+
+    try:
+        exchange_info = get_client().get_exchange_info()
+    except Exception as error:
+        # Outdated information is better than nothing
+        print(Colors.YELLOW + "Warning ! Can't get the exchange information:", error)
+        if cached is not None:
+            symbols = cached["symbols"]
+        return symbols
+
+    symbols = {}
+    for symbol in exchange_info["symbols"]:
+        information = {"base": symbol.get("baseAsset"), "quote": symbol.get("quoteAsset")}
+        for exchange_filter in symbol.get("filters", []):
+            if exchange_filter["filterType"] == "PRICE_FILTER":
+                information["tick_size"] = float(exchange_filter["tickSize"])
+            elif exchange_filter["filterType"] == "LOT_SIZE":
+                information["step_size"] = float(exchange_filter["stepSize"])
+        symbols[symbol["symbol"]] = information
+
+    # Written next to the path and replaced to never leave a partial file
+    os.makedirs(cache_folder, exist_ok=True)
+    with open(path + ".tmp", "w") as file:
+        json.dump({"time": time.time(), "symbols": symbols}, file)
+    os.replace(path + ".tmp", path)
+    return symbols
@@ -0,0 +1,193 @@
+import collections
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import numpy as np
+from binance.helpers import date_to_milliseconds, interval_to_milliseconds
+from OpenBacktest.ObtClient import get_client
+from OpenBacktest.ObtUtility import Colors, kline_columns
+
+
+# ------------------------------------------------------------------------------------------------
+# This class count the request weight used during the last period and make threads wait before the limit is exceeded
+# ------------------------------------------------------------------------------------------------
+class WeightLimiter:
+    def __init__(self, limit=1200, period=60.0):
+        # maximum weight during a period in seconds
+        self.limit = limit
+        self.period = period
+        # weight used during the current period
+        self.used = 0
+        # (time, weight) of the requests of the current period
+        self.requests = collections.deque()
+        # requests are blocked until this time after the API asked to slow down
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    # wait until a request of this weight can be sent
+    def acquire(self, weight):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                while self.requests and self.requests[0][0] <= now - self.period:
+                    self.used -= self.requests.popleft()[1]
+                if now >= self.paused_until and (self.used + weight <= self.limit or not self.requests):
+                    self.requests.append((now, weight))
+                    self.used += weight
+                    return
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    wait = self.requests[0][0] + self.period - now
+            time.sleep(wait)
+
+    # block all requests for some seconds
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+# ------------------------------------------------------------------------------------------------
+# This class download klines of many pairs and many time ranges of the same pair in parallel, the client only needs
+# a get_klines(symbol, interval, startTime, endTime, limit) method so a fake client can be used, without client the
+# shared client is created with the first request
+# ------------------------------------------------------------------------------------------------
+class KlineDownloader:
+    def __init__(self, client, workers=8, weight_limit=1200, weight=2, limit=1000, retries=5, backoff=1.0,
+                 output=True):
+        self.client = client
+        # number of requests sent at the same time
+        self.workers = workers
+        # weight of a klines request and number of klines per request
+        self.weight = weight
+        self.limit = limit
+        # retries of a failed request, waiting backoff * 2 ** attempt seconds
+        self.retries = retries
+        self.backoff = backoff
+        self.output = output
+
+        self.limiter = WeightLimiter(weight_limit)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    # download klines of a symbol from start ( date or timestamp in ms ) to end ( now by default )
+    def download(self, symbol, interval, start, end=None):
+        start = to_milliseconds(start)
+        end = int(time.time() * 1000) if end is None else to_milliseconds(end)
+
+        # the first kline of the symbol, there's no need to ask for older ones
+        first = self.request(symbol=symbol, interval=interval, startTime=0, limit=1)
+        if not first:
+            return []
+        start = max(start, first[0][0])
+
+        step = interval_to_milliseconds(interval)
+        if step is None:
+            # Months don't have a fixed duration, the range is downloaded page by page
+            return self.download_chunk(symbol, interval, start, end, follow=True)
+
+        # Ranges of one request each
+        size = step * self.limit
+        chunks = [(chunk_start, min(chunk_start + size - 1, end)) for chunk_start in range(start, end + 1, size)]
+        futures = [self.executor.submit(self.download_chunk, symbol, interval, chunk_start, chunk_end)
+                   for chunk_start, chunk_end in chunks]
+
+        # Merging in order
+        klines = []
+        for future in futures:
+            for kline in future.result():
+                if not klines or kline[0] > klines[-1][0]:
+                    klines.append(kline)
+        return klines
+
+    # download klines between start and end, with follow=True pages are requested until end
+    def download_chunk(self, symbol, interval, start, end, follow=False):
+        klines = []
+        while True:
+            page = self.request(symbol=symbol, interval=interval, startTime=start, endTime=end, limit=self.limit)
+            klines += [kline for kline in page if start <= kline[0] <= end]
+            if not follow or len(page) < self.limit:
+                return klines
+            start = page[-1][0] + 1
+
+    # send a klines request, retrying with backoff when it fails
+    def request(self, **parameters):
+        attempt = 0
+        while True:
+            self.limiter.acquire(self.weight)
+            if self.client is None:
+                self.client = get_client()
+            try:
+                return self.client.get_klines(**parameters)
+            except Exception as error:
+                status = getattr(error, "status_code", None)
+                rate_limited = status in (418, 429)
+                # Client errors other than rate limits won't succeed by retrying
+                if attempt >= self.retries or (status is not None and 400 <= status < 500 and not rate_limited):
+                    raise
+                wait = self.backoff * 2 ** attempt
+                if rate_limited:
+                    # The API asked to slow down, every thread waits
+                    response = getattr(error, "response", None)
+                    retry_after = None if response is None else response.headers.get("Retry-After")
+                    if retry_after is not None:
+                        wait = max(wait, float(retry_after))
+                    self.limiter.pause(wait)
+                if self.output:
+                    print(Colors.YELLOW + "Request failed for " + parameters["symbol"] + ", retrying in " +
+                          str(round(wait, 2)) + "s")
+                time.sleep(wait)
+                attempt += 1
+
+    # stop the threads
+    def close(self):
+        self.executor.shutdown()
+
+
+# ------------------------------------------------------------------------------------------------
+# This class is a fake client serving the klines of a dataframe like the binance API, used to test downloads without
+# network, requests are recorded and the errors of failures are raised by the next requests in their order, klines
+# opened after end_time are not formed yet and aren't served
+# downloader = KlineDownloader(FakeKlineClient(dataframe, failures=[FakeAPIError(429, retry_after=1)]))
+# ------------------------------------------------------------------------------------------------
+class FakeKlineClient:
+    def __init__(self, dataframe, failures=None):
+        self.timestamps = dataframe["timestamp"].to_numpy()
+        # Prices and volumes are strings in the API
+        self.klines = [[int(row[0]), *(str(value) for value in row[1:6]), int(row[6]), str(row[7]), int(row[8]),
+                        *(str(value) for value in row[9:])] for row in dataframe[kline_columns].to_numpy().tolist()]
+        self.failures = collections.deque(failures or [])
+        self.end_time = None
+        # parameters of each request
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def get_klines(self, symbol, interval, startTime=None, endTime=None, limit=500):
+        with self.lock:
+            self.requests.append({"symbol": symbol, "interval": interval, "startTime": startTime, "endTime": endTime,
+                                  "limit": limit})
+            if self.failures:
+                raise self.failures.popleft()
+            if self.end_time is not None:
+                endTime = self.end_time if endTime is None else min(endTime, self.end_time)
+        first = 0 if startTime is None else int(np.searchsorted(self.timestamps, startTime, side="left"))
+        last = len(self.klines) if endTime is None else int(np.searchsorted(self.timestamps, endTime, side="right"))
+        return self.klines[first:min(last, first + limit)]
+
+
+# ------------------------------------------------------------------------------------------------
+# This class is an error of the fake client with the status code and the Retry-After header of an API error
+# ------------------------------------------------------------------------------------------------
+class FakeAPIError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__("APIError(code=" + str(status_code) + ")")
+        self.status_code = status_code
+        headers = {} if retry_after is None else {"Retry-After": str(retry_after)}
+        self.response = SimpleNamespace(headers=headers)
+
+
+# convert a date or a timestamp in ms to a timestamp in ms
+def to_milliseconds(value):
+    if isinstance(value, str):
+        return date_to_milliseconds(value)
+    return int(value)
@@ -1,35 +1,84 @@
 import os
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-from binance.client import Client
-from OpenBacktest.ObtUtility import Colors, timeframes, divide
+from OpenBacktest.ObtCache import iter_cache, read_cache, read_header, write_cache
+from OpenBacktest.ObtClient import get_client, get_symbols, is_offline
+from OpenBacktest.ObtDownload import KlineDownloader
+from OpenBacktest.ObtEvents import ORDER_SUBMITTED, PROGRESS, STOP_HIT, ConsoleSink, EventStream
+from OpenBacktest.ObtProfiler import Profiler
+from OpenBacktest.ObtShared import SharedMarketData
+from OpenBacktest.ObtStops import STOP_LOSS, TAKE_PROFIT, Stops
+from OpenBacktest.ObtStream import iter_csv, iter_dataframe, prepare_chunks, with_indicators, with_warmup
+from OpenBacktest.ObtUtility import AlignedView, BarView, Colors, timeframes, get_close_times, \
+    make_kline_dataframe
 from OpenBacktest.ObtWallet import Wallet
 
+# columns of the bars kept at the end of a streamed run to summarize and plot it
+SUMMARY_COLUMNS = ("timestamp", "open", "high", "low", "close")
+
 
 # Define a symmetric backtest engine
 class Engine:
     # Initialising the class
-    def __init__(self, container, output=True):
+    def __init__(self, container, output=True, load=True, sync=False, workers=None):
         if output:
             print(Colors.PURPLE + "Initialising BackTest Engine")
 
-        # Container
-        self.container = container
-        self.container.load_all(output=output)
+        # Console output
+        self.output = output
 
-        # python-binance client
-        self.client = Client()
+        # Orders, fills, stop hits and progress of the runs are sent to the subscribers of the event stream, the
+        # console only gets the progress when output is True
+        self.events = EventStream()
+        if output:
+            self.events.subscribe(ConsoleSink(), kinds=(PROGRESS,))
+
+        # Container, load=False is used when the pairs are already loaded, sync=True fetch bars missing from files
+        # with workers the pairs are loaded and downloaded in parallel, see Container.load_all
+        # files are only read when a dataframe is first used so a streamed run doesn't load the whole history
+        self.container = container
+        if load:
+            self.container.load_all(output=output, sync=sync, workers=workers, lazy=True)
 
         # Used to run a backtest
         self.strategy = None
+        self.vectorized = False
         self.wallet = None
 
-        # TP & SL
-        self.tp = None
-        self.sl = None
+        # Arrays of the main dataframe given to the strategy
+        self.bars = None
+        # Arrays of the alt dataframes aligned on the main dataframe
+        self.aligned = {}
+
+        # TP, SL & trailing stop of the position
+        self.stops = Stops()
 
         # balance ( use later to plot wallet graph )
         self.balance = []
 
+        # time spent in each phase of the last run made with profile=True
+        self.profiler = None
+
+    # price of the take profit
+    @property
+    def tp(self):
+        return self.stops.take_profit
+
+    # price of the stop loss
+    @property
+    def sl(self):
+        return self.stops.stop_loss
+
+    # python-binance client, created when first used
+    @property
+    def client(self):
+        if self.container.client is not None:
+            return self.container.client
+        return get_client()
+
     # get the main dataframe
     def main_dataframe(self):
         return self.container.main.dataframe
@@ -38,49 +87,466 @@ class Engine:
     def alt_dataframe(self, name):
         return self.container.get_pair(name).dataframe
 
+    # get the arrays of an alt pair aligned on the main dataframe, built at the beginning of each run
+    # aligned_bars(name)["close"][index] is the close of the last alt bar closed at the main bar index
+    def aligned_bars(self, name):
+        return self.aligned[name]
+
+    # get the index of the last alt bar closed at the main bar index, None before the first closed alt bar
+    def alt_index(self, name, index):
+        alt_index = self.aligned[name].indexes[index]
+        if alt_index < 0:
+            return None
+        return int(alt_index)
+
+    # get the value of the wallet at the close of each main bar of the last run
+    def get_equity(self):
+        return self.wallet.get_equity()
+
+    # map each main bar to the last alt bar closed at the same time, there's no lookahead since an alt bar is only
+    # used once it closed
+    def align_pairs(self, start=None, end=None):
+        main = self.container.main
+        main_close_times = get_close_times(main.dataframe, main.timeframe)[start:end]
+        self.aligned = {}
+        for name, pair in self.container.pairs.items():
+            if pair is main:
+                continue
+            indexes = np.searchsorted(get_close_times(pair.dataframe, pair.timeframe), main_close_times,
+                                      side="right") - 1
+            self.aligned[name] = AlignedView(BarView(pair.dataframe), indexes)
+
     # -------------------------------------------------------------------------------
     # def backtest parameters to run an asymmetric strategy
-    def register_strategy(self, strategy):
+    # a vectorized strategy is called once with the whole main dataframe and returns a Signals class
+    def register_strategy(self, strategy, vectorized=False):
         self.strategy = strategy
+        self.vectorized = vectorized
 
     # run an asymmetric strategy
-    def run_strategy(self, coin_name, token_name, coin_balance, token_balance, taker, finish=True):
+    # start and end select a window of main bars like a slice, the strategy then gets the window as its dataframe,
+    # columns computed before on the whole dataframe keep their values
+    # profile=True record the time spent in each phase of the run, see get_profile, the loop without profile is left
+    # untouched so profiling costs nothing when it's off
+    # backend is the numeric backend of the wallet, "float" by default, "decimal" or a FixedPointBackend
+    # chunk_size streams the run over chunks of main bars, see run_stream, start, end and profile can't be used with it
+    def run_strategy(self, coin_name, token_name, coin_balance, token_balance, taker, finish=True, start=None,
+                     end=None, profile=False, backend=None, chunk_size=None, warmup=0, prepare=None, indicators=None):
         # condition not None test
         if self.strategy is None:
             print(Colors.RED + "Error, you can't run a backtest because you don't have a strategy function registered")
             return
+        if chunk_size is not None:
+            if start is not None or end is not None or profile:
+                print(Colors.RED + "Error, start, end and profile can't be used with chunk_size")
+                return
+            self.run_stream(coin_name, token_name, coin_balance, token_balance, taker, chunk_size, warmup, prepare,
+                            finish, backend, indicators)
+            return
+        if indicators is not None:
+            print(Colors.RED + "Error, indicators are only used with chunk_size, add them to the dataframe instead")
+            return
+
+        dataframe = self.main_dataframe()
+        if start is not None or end is not None:
+            dataframe = dataframe.iloc[start:end].reset_index(drop=True)
+
+        # Arrays are pulled once and shared with the wallet
+        self.bars = BarView(dataframe)
+        self.align_pairs(start, end)
+        self.stops = Stops()
 
         # Wallet initialisation
-        self.wallet = Wallet(coin_name, token_name, coin_balance, token_balance, taker, self.main_dataframe())
+        self.wallet = Wallet(coin_name, token_name, coin_balance, token_balance, taker, dataframe, bars=self.bars,
+                             events=self.events, backend=backend)
+        self.events.start_run()
+        if profile:
+            self.run_profiled(dataframe, finish)
+            return
+        if self.vectorized:
+            self.run_signals(self.strategy(dataframe))
+        else:
+            self.run_bars()
+
+        # Sell all remaining coins
+        if self.wallet.current_token_balance > 0 and finish:
+            self.wallet.sell(len(self.bars) - 1)
+        self.finish_events()
+
+    # run the strategy over chunks of chunk_size main bars so only one chunk is held in memory, the main pair is
+    # read from its cache or csv file, the engine only reads the whole file when the main dataframe is used before
+    # each chunk starts with the last warmup bars of the previous one so the strategy can look back warmup bars
+    # indicators is a dict of column: (indicator, columns) with incremental indicators of ObtIndicators, their state
+    # is carried from chunk to chunk so their columns hold the values of a run on the whole history, see
+    # with_indicators, prepare(dataframe) is then called on each chunk to add other columns, they only get the warmup
+    # bars as history so the ones depending on all the previous bars ( like an EMA ) differ slightly from a run on the
+    # whole history
+    # the strategy is only called for the new bars, the wallet and the stops are carried from chunk to chunk, alt
+    # pairs are not available to a streamed strategy
+    # a dataframe already loaded in the main pair is streamed with the columns added to it
+    # at the end the wallet holds the timestamp, open, high, low and close of all bars to summarize and plot the run
+    def run_stream(self, coin_name, token_name, coin_balance, token_balance, taker, chunk_size=100000, warmup=0,
+                   prepare=None, finish=True, backend=None, indicators=None):
+        main = self.container.main
+        chunks = main.stream(chunk_size)
+        if chunks is None:
+            return
+        chunks = with_warmup(chunks, warmup)
+        if indicators:
+            chunks = with_indicators(chunks, indicators)
+        if prepare is not None:
+            chunks = prepare_chunks(chunks, prepare)
+
+        self.stops = Stops()
+        self.aligned = {}
+        self.wallet = None
+        events = self.events
+        total = main.count_rows()
+        events.start_run(total)
+        # summary columns of each bar, allocated once when the number of bars is known
+        if total is None:
+            summary = {column: [] for column in SUMMARY_COLUMNS}
+        else:
+            summary = {column: np.empty(total, dtype=np.int64 if column == "timestamp" else np.float64)
+                       for column in SUMMARY_COLUMNS}
+        for offset, first, dataframe in chunks:
+            bars = BarView(dataframe)
+            if self.wallet is None:
+                self.wallet = Wallet(coin_name, token_name, coin_balance, token_balance, taker, dataframe,
+                                     bars=bars, events=events, backend=backend)
+            else:
+                self.move_chunk(bars, offset)
+                self.wallet.dataframe = dataframe
+                self.wallet.bars = bars
+            self.bars = bars
+            self.wallet.offset = offset
+            events.offset = offset
+            if self.vectorized:
+                self.run_signals(self.strategy(dataframe), first)
+            else:
+                self.run_bars(first)
+            for column, values in summary.items():
+                if total is None:
+                    values.append(bars[column][first:])
+                else:
+                    values[offset + first:offset + len(bars)] = bars[column][first:]
+
+        if self.wallet is None:
+            print(Colors.RED + "Error, no bars found for", main.pair)
+            return
+        # Sell all remaining coins
+        if self.wallet.current_token_balance > 0 and finish:
+            self.wallet.sell(len(self.bars) - 1)
+
+        # The summary of the run only needs the prices of each bar
+        if total is None:
+            summary = {column: np.concatenate(values) for column, values in summary.items()}
+        summary = pd.DataFrame(summary, copy=False)
+        self.bars = BarView(summary)
+        self.wallet.dataframe = summary
+        self.wallet.bars = self.bars
+        self.wallet.offset = 0
+        self.wallet.equity = None
+        events.offset = 0
+        self.finish_events()
+
+    # move the stops from the bars of a chunk to the bars of the next chunk starting at offset
+    def move_chunk(self, bars, offset):
+        stops = self.stops
+        if stops.is_empty():
+            return
+        # The peak of a trailing stop is brought to the last bar of the chunk, the stops are then searched in the
+        # bars of the next chunk
+        stops.move_peak(self.bars, len(self.bars) - 1)
+        stops.index -= offset - self.wallet.offset
+        stops.find_hit(bars)
+
+    # send the last progress event of a run
+    def finish_events(self):
+        if len(self.bars) > 0:
+            self.events.finish_run(len(self.bars) - 1, int(self.bars["timestamp"][-1]))
+
+    # run the strategy like run_strategy while recording the time spent in each phase
+    def run_profiled(self, dataframe, finish=True):
+        self.profiler = profiler = Profiler()
+        profiler.start_run()
+        if self.vectorized:
+            start = time.perf_counter_ns()
+            signals = self.strategy(dataframe)
+            profiler.add("strategy", time.perf_counter_ns() - start)
+            start = time.perf_counter_ns()
+            self.run_signals(signals)
+            profiler.add("orders", time.perf_counter_ns() - start)
+        else:
+            profiler.reserve(len(self.bars))
+            self.run_bars_profiled()
+
+        start = time.perf_counter_ns()
+        if self.wallet.current_token_balance > 0 and finish:
+            self.wallet.sell(len(self.bars) - 1)
+        profiler.add("finish", time.perf_counter_ns() - start)
+        profiler.stop_run()
+        self.finish_events()
+
+    # get the profile report of the last run made with profile=True, see Profiler.get_report
+    def get_profile(self, slowest=10):
+        if self.profiler is None:
+            print(Colors.RED + "Error, no profile found, run a strategy with profile=True")
+            return None
+        return self.profiler.get_report(self.bars["timestamp"], slowest)
+
+    # Summarize the profile of the last run made with profile=True
+    def display_profile(self, slowest=10):
+        if self.profiler is None:
+            print(Colors.RED + "Error, no profile found, run a strategy with profile=True")
+            return
+        self.profiler.display(self.bars["timestamp"], slowest)
+
+    # call the strategy on each bar of the main dataframe from the bar first
+    def run_bars(self, first=0):
         # Ini
-        index = 0
-        percent = 0
+        index = first
+        max_index = len(self.bars) - 1
+        strategy = self.strategy
+        bars = self.bars
+        wallet = self.wallet
+        stops = self.stops
+        events = self.events
+        timestamps = bars["timestamp"]
+        # next bar checking if a progress event is due
+        next_progress = first
 
         # Main loop
-        while index <= self.container.main.max_index:
+        while index <= max_index:
 
-            p = divide(100 * index, self.container.main.max_index)
-            if p > percent + 5:
-                print(Colors.YELLOW + "Progress: " + str(round(p)) + "%")
-                percent = p
+            if index == next_progress:
+                next_progress = events.progress(index, max_index, int(timestamps[index]))
+
+            # stops are hit during the bar, before the strategy is called at its close
+            if stops.hit_index == index:
+                self.update_stop(index)
 
             # main
-            report = self.strategy(self.main_dataframe(), index)
+            report = strategy(bars, index)
             if report is not None:
+                if events.wants(ORDER_SUBMITTED):
+                    self.submit_event(index, report.order, report.amount, report.percent_amount)
                 if report.order == "buy":
-                    self.wallet.buy(index, report.amount, report.percent_amount)
+                    wallet.buy(index, report.amount, report.percent_amount)
                 elif report.order == "sell":
-                    self.wallet.sell(index, report.amount, report.percent_amount)
+                    wallet.sell(index, report.amount, report.percent_amount)
+                    stops.clear()
+
+            # end
+            index += 1
+
+    # same loop as run_bars with a clock stamp between its phases recorded in the profiler, stamps are only turned
+    # into durations by the profiler report to keep the loop as close as possible to run_bars
+    def run_bars_profiled(self, first=0):
+        # Ini
+        index = first
+        max_index = len(self.bars) - 1
+        strategy = self.strategy
+        bars = self.bars
+        wallet = self.wallet
+        stops = self.stops
+        events = self.events
+        timestamps = bars["timestamp"]
+        # next bar checking if a progress event is due
+        next_progress = first
+        clock = time.perf_counter_ns
+        record = self.profiler.record
+
+        # Main loop
+        while index <= max_index:
+            t0 = clock()
+
+            if index == next_progress:
+                next_progress = events.progress(index, max_index, int(timestamps[index]))
+            t1 = clock()
+
+            # stops are hit during the bar, before the strategy is called at its close
+            if stops.hit_index == index:
+                self.update_stop(index)
+            t2 = clock()
 
-            # update tp & sl
-            self.update_stop(index)
+            # main
+            report = strategy(bars, index)
+            t3 = clock()
+            if report is not None:
+                if events.wants(ORDER_SUBMITTED):
+                    self.submit_event(index, report.order, report.amount, report.percent_amount)
+                if report.order == "buy":
+                    wallet.buy(index, report.amount, report.percent_amount)
+                elif report.order == "sell":
+                    wallet.sell(index, report.amount, report.percent_amount)
+                    stops.clear()
+            record(index, (t0, t1, t2, t3, clock()))
 
             # end
             index += 1
 
-        # Sell all remaining coins
-        if self.wallet.wallet_frame.iloc[-1]["token_balance"] > 0 and finish:
-            self.wallet.sell(self.container.main.max_index)
+    # pass the orders of a vectorized strategy, only bars holding an order are sent to the wallet, orders before the
+    # bar first are ignored
+    def run_signals(self, signals, first=0):
+        length = len(self.bars)
+
+        orders = signals.get_orders()
+        if len(orders) != length:
+            print(Colors.RED + "Error, your signals have", len(orders), "rows but the main dataframe has", length)
+            return
+        amounts = signals.get_amounts(length)
+        percent_amounts = signals.get_percent_amounts(length)
+
+        # Bars holding an order
+        indexes = np.flatnonzero(orders)
+        indexes = indexes[indexes >= first]
+        orders = orders[indexes]
+        amounts = amounts[indexes]
+        percent_amounts = percent_amounts[indexes]
+
+        # Orders are read by runs of orders in the same direction
+        starts = np.flatnonzero(np.diff(orders, prepend=0))
+        ends = np.append(starts[1:], len(indexes))
+
+        # the engine jumps from order to order and to the first bar hitting a stop
+        wallet = self.wallet
+        stops = self.stops
+        events = self.events
+        # A buy can't fill without coins and a sell without tokens, once an order left nothing to spend the rest of
+        # its run is skipped up to the next stop hit, orders are all submitted when their events are listened to like
+        # in a bar strategy
+        skip = not events.wants(ORDER_SUBMITTED)
+        for position, end, index, order, amount, percent_amount in zip(
+                starts.tolist(), ends.tolist(), indexes[starts].tolist(), orders[starts].tolist(),
+                amounts[starts].tolist(), percent_amounts[starts].tolist()):
+            while True:
+                # nan means no value
+                amount = None if amount != amount else amount
+                percent_amount = None if percent_amount != percent_amount else percent_amount
+                if stops.hit_index is not None and stops.hit_index <= index:
+                    self.update_stop(stops.hit_index)
+                if events.wants(ORDER_SUBMITTED):
+                    self.submit_event(index, "buy" if order == 1 else "sell", amount, percent_amount)
+                if order == 1:
+                    length = wallet.ledger.length
+                    wallet.buy(index, amount, percent_amount)
+                    if wallet.ledger.length > length:
+                        self.set_signal_stops(signals, index)
+                    empty = wallet.coin_value == 0
+                else:
+                    wallet.sell(index, amount, percent_amount)
+                    stops.clear()
+                    empty = wallet.token_value == 0
+
+                # Next order of the run
+                position += 1
+                if skip and empty:
+                    if stops.hit_index is None:
+                        break
+                    position = max(position, int(np.searchsorted(indexes, stops.hit_index)))
+                if position >= end:
+                    break
+                index = indexes.item(position)
+                amount = amounts.item(position)
+                percent_amount = percent_amounts.item(position)
+        if stops.hit_index is not None:
+            self.update_stop(stops.hit_index)
+
+    # set the stops of signals from the close of a filled buy order
+    def set_signal_stops(self, signals, index):
+        if not signals.has_stops():
+            return
+        close = self.bars["close"][index]
+        stops = self.stops
+        stops.clear()
+        stops.index = index
+        if signals.take_profit is not None:
+            stops.take_profit = close + close * self.wallet.backend.divide(signals.take_profit, 100)
+        if signals.stop_loss is not None:
+            stops.stop_loss = close + close * self.wallet.backend.divide(signals.stop_loss, 100)
+        if signals.trailing_stop is not None:
+            stops.set_trailing(self.bars, index, close, percent_distance=signals.trailing_stop)
+        stops.find_hit(self.bars)
+
+    # run the strategy made by strategy_factory(**parameters) for each parameters combination of param_grid
+    # param_grid is a dict of parameter name: list of values or a list of parameters dicts, the runs are spread over
+    # a pool of workers processes so strategy_factory must be a module level function, the result is a dataframe with
+    # one row per combination in the order of the grid holding the parameters and the data handler metrics
+    def optimize(self, strategy_factory, param_grid, coin_name, token_name, coin_balance, token_balance, taker,
+                 finish=True, vectorized=False, workers=None, chunksize=None, start=None, end=None, backend=None):
+        combinations = make_grid(param_grid)
+        run_parameters = {"coin_name": coin_name, "token_name": token_name, "coin_balance": coin_balance,
+                          "token_balance": token_balance, "taker": taker, "finish": finish, "backend": backend}
+
+        with WorkerPool(self, strategy_factory, vectorized, run_parameters, workers, len(combinations)) as pool:
+            if self.output:
+                print(Colors.PURPLE + "Optimizing", len(combinations), "combinations with", pool.workers,
+                      "worker(s)")
+            results = pool.map([(parameters, start, end) for parameters in combinations], chunksize)
+
+        if self.output:
+            print(Colors.LIGHT_GREEN + "Optimization finished")
+
+        return pd.DataFrame([dict(parameters, **metrics) for parameters, metrics in zip(combinations, results)])
+
+    # optimize the parameters on each in sample window and run the best ones on the following out of sample window
+    # windows are sizes in main bars, with anchored=True in sample windows all start at the first bar, folds move by
+    # step bars ( out_of_sample by default ), metric is the data handler metric to maximize ( or minimize ), the runs
+    # of all folds are spread over one pool of workers using the loaded dataframes and their indicators, the result
+    # is a dataframe with one row per fold holding its windows, the best parameters, their in sample metric and their
+    # out of sample metrics
+    def walk_forward(self, strategy_factory, param_grid, in_sample, out_of_sample, coin_name, token_name,
+                     coin_balance, token_balance, taker, anchored=False, step=None, metric="percent_profit",
+                     maximize=True, finish=True, vectorized=False, workers=None, chunksize=None, backend=None):
+        combinations = make_grid(param_grid)
+        folds = make_folds(len(self.main_dataframe()), in_sample, out_of_sample, anchored, step)
+        if len(folds) == 0:
+            print(Colors.RED + "Error, the main dataframe is too short for a walk forward of", in_sample, "+",
+                  out_of_sample, "bars")
+            return None
+        run_parameters = {"coin_name": coin_name, "token_name": token_name, "coin_balance": coin_balance,
+                          "token_balance": token_balance, "taker": taker, "finish": finish, "backend": backend}
+
+        with WorkerPool(self, strategy_factory, vectorized, run_parameters, workers,
+                        len(folds) * len(combinations)) as pool:
+            if self.output:
+                print(Colors.PURPLE + "Walk forward over", len(folds), "folds of", len(combinations),
+                      "combinations with", pool.workers, "worker(s)")
+
+            # In sample runs of all folds at once
+            tasks = [(parameters, fold[0], fold[1]) for fold in folds for parameters in combinations]
+            results = pool.map(tasks, chunksize)
+            best = []
+            for i in range(len(folds)):
+                scores = pd.Series([metrics.get(metric) for metrics in
+                                    results[i * len(combinations):(i + 1) * len(combinations)]], dtype=float)
+                if scores.isna().all():
+                    best.append((0, None))
+                    continue
+                position = int(scores.idxmax() if maximize else scores.idxmin())
+                best.append((position, scores[position]))
+
+            # Out of sample runs of the best parameters
+            tests = pool.map([(combinations[position], fold[2], fold[3]) for fold, (position, score) in
+                              zip(folds, best)])
+
+        timestamps = self.main_dataframe()["timestamp"].to_numpy()
+        rows = []
+        for i, (fold, (position, score), metrics) in enumerate(zip(folds, best, tests)):
+            row = {"fold": i,
+                   "in_sample_start": int(timestamps[fold[0]]), "in_sample_end": int(timestamps[fold[1] - 1]),
+                   "out_of_sample_start": int(timestamps[fold[2]]),
+                   "out_of_sample_end": int(timestamps[fold[3] - 1]),
+                   "in_sample_" + metric: score}
+            row.update(combinations[position])
+            row.update(metrics)
+            rows.append(row)
+
+        if self.output:
+            print(Colors.LIGHT_GREEN + "Walk forward finished")
+
+        return pd.DataFrame(rows)
 
     # -------------------------------------------------------------------------------
 
@@ -88,7 +554,8 @@ class Engine:
     def get_sub_dataframe(self, name):
         return self.container.get_pair(name).dataframe
 
-    # set TP & SL
+    # set TP & SL, percent targets are relative to the close of the bar index, stops are active from the next bar
+    # and hit when the high or the low of a bar reach them, every sell of the strategy removes them
     def set_take_profit(self, index, target=None, percent_target=None):
         if target is None and percent_target is None:
             print(Colors.LIGHT_RED, "Error we can't register your take profit, no target")
@@ -98,9 +565,11 @@ class Engine:
                 print(Colors.LIGHT_RED, "Error we can't register your take profit, no target")
                 exit()
             else:
-                target = self.main_dataframe()["close"][index] + \
-                         self.main_dataframe()["close"][index] * divide(percent_target, 100)
-        self.tp = target
+                close = self.bars["close"][index]
+                target = close + close * self.wallet.backend.divide(percent_target, 100)
+        self.stops.move_peak(self.bars, index)
+        self.stops.take_profit = target
+        self.stops.find_hit(self.bars)
 
     def set_stop_loss(self, index, target=None, percent_target=None):
         if target is None and percent_target is None:
@@ -111,24 +580,55 @@ class Engine:
                 print(Colors.LIGHT_RED, "Error we can't register your stop loss, no target")
                 exit()
             else:
-                target = self.main_dataframe()["close"][index] + \
-                         self.main_dataframe()["close"][index] * divide(percent_target, 100)
-        self.sl = target
+                close = self.bars["close"][index]
+                target = close + close * self.wallet.backend.divide(percent_target, 100)
+        self.stops.move_peak(self.bars, index)
+        self.stops.stop_loss = target
+        self.stops.find_hit(self.bars)
+
+    # set a stop following the highest price since the bar index, distance is in coin and percent_distance in
+    # percent of the highest price
+    def set_trailing_stop(self, index, distance=None, percent_distance=None):
+        if distance is None and percent_distance is None:
+            print(Colors.LIGHT_RED, "Error we can't register your trailing stop, no distance")
+            return
+        self.stops.set_trailing(self.bars, index, self.bars["close"][index], distance, percent_distance)
+        self.stops.find_hit(self.bars)
 
     def cancel_take_profit(self):
-        self.tp = None
+        self.stops.take_profit = None
+        self.stops.find_hit(self.bars)
 
     def cancel_stop_loss(self):
-        self.sl = None
+        self.stops.stop_loss = None
+        self.stops.find_hit(self.bars)
+
+    def cancel_trailing_stop(self):
+        self.stops.trailing_distance = None
+        self.stops.trailing_percent = None
+        self.stops.peak = None
+        self.stops.find_hit(self.bars)
 
+    # sell the position at the price of the stop hit during the bar index, all stops are then removed
+    # without tokens left there's nothing to sell, the stops are only removed
     def update_stop(self, index):
-        price = self.main_dataframe()["close"][index]
-        if self.tp is not None and self.tp <= price:
-            self.wallet.sell(index)
-            self.tp = None
-        if self.sl is not None and self.sl >= price:
-            self.wallet.sell(index)
-            self.sl = None
+        stops = self.stops
+        if stops.hit_index != index:
+            return
+        if self.wallet.token_value == 0:
+            stops.clear()
+            return
+        if self.events.wants(STOP_HIT):
+            kinds = {TAKE_PROFIT: "take_profit", STOP_LOSS: "stop_loss"}
+            self.events.emit(STOP_HIT, index, int(self.bars["timestamp"][index]),
+                             stop=kinds.get(stops.hit_kind, "trailing_stop"), price=stops.hit_price)
+        self.wallet.sell(index, price=stops.hit_price)
+        stops.clear()
+
+    # send the event of an order given by the strategy, before the wallet fills it
+    def submit_event(self, index, order, amount, percent_amount):
+        self.events.emit(ORDER_SUBMITTED, index, int(self.bars["timestamp"][index]), order=order, amount=amount,
+                         percent_amount=percent_amount)
 
 
 # define a pair
@@ -141,18 +641,20 @@ class Pair:
 
         self.name = name
 
-        self.dataframe = None
-        self.max_index = None
+        # dataframe and index of its last row, see the dataframe and max_index properties
+        self.frame = None
+        self.last_index = None
 
-        self.timestamps_with_index = None
+        # sorted timestamps array and dict of timestamp: index, the dict is built when first used
+        self.timestamp_values = None
+        self.timestamps_index = None
 
-        # First errors test
-        ok = False
-        for pair in Client().get_exchange_info()["symbols"]:
-            if pair["symbol"] == self.pair:
-                ok = True
-                break
-        if not ok:
+        # parameters of a load delayed until the dataframe is used, see load(lazy=True)
+        self.pending = None
+
+        # First errors test, symbols are unknown in offline mode without cached exchange information
+        symbols = get_symbols()
+        if symbols is not None and self.pair not in symbols:
             print(Colors.RED + "Error ! The trade pair", self.pair, "doesn't exist !")
             return
 
@@ -165,11 +667,62 @@ class Pair:
             print(Colors.RED + "Error ! The timeframe", self.timeframe, "doesn't exist !")
             return
 
+        self.folder = path
         self.path = path + self.make_file_name()
+        self.cache_path = path + self.make_file_name("obt")
 
-    # Load / download the pair's dataframe
-    def load(self, client=Client(), output=True):
-        if os.path.isfile(self.path):
+    # the dataframe of a pair loaded with lazy=True is read from its file when it's first used
+    @property
+    def dataframe(self):
+        if self.pending is not None:
+            self.load_pending()
+        return self.frame
+
+    @dataframe.setter
+    def dataframe(self, dataframe):
+        self.pending = None
+        self.frame = dataframe
+
+    @property
+    def max_index(self):
+        if self.pending is not None:
+            self.load_pending()
+        return self.last_index
+
+    @max_index.setter
+    def max_index(self, max_index):
+        self.last_index = max_index
+
+    @property
+    def timestamps(self):
+        if self.pending is not None:
+            self.load_pending()
+        return self.timestamp_values
+
+    @timestamps.setter
+    def timestamps(self, timestamps):
+        self.timestamp_values = timestamps
+
+    # Load / download the pair's dataframe, a binary cache file is used before a csv file
+    # with sync=True the bars newer than the file are downloaded and appended to it
+    # a KlineDownloader can be given to download time ranges in parallel
+    # with lazy=True a file is only read when the dataframe is first used, a streamed run reads it by chunks instead
+    def load(self, client=None, output=True, sync=False, downloader=None, lazy=False):
+        if lazy and not sync and (os.path.isfile(self.cache_path) or os.path.isfile(self.path)):
+            self.frame = None
+            self.pending = {"output": output}
+            return
+        if sync:
+            self.sync(client, output=output, downloader=downloader)
+        elif os.path.isfile(self.cache_path):
+            # Loading from binary cache
+            if output:
+                print(
+                    "Loading data from a file for " + self.pair + " from " + self.start + " timeframe: " + self.timeframe)
+            self.dataframe = read_cache(self.cache_path)[0]
+            if output:
+                print(Colors.LIGHT_GREEN + "Data loaded successfully")
+        elif os.path.isfile(self.path):
             # Loading from path
             if output:
                 print(
@@ -177,64 +730,161 @@ class Pair:
             self.dataframe = pd.read_csv(self.path)
             if output:
                 print(Colors.LIGHT_GREEN + "Data loaded successfully")
+        elif is_offline():
+            print(Colors.RED + "Error ! No file found for " + self.pair + " from " + self.start + " timeframe: " +
+                  self.timeframe + " in offline mode")
+            return
         else:
             # Downloading from API
             if output:
                 print(
                     "Downloading data from API for " + self.pair + " from " + self.start + " timeframe: " + self.timeframe)
-            self.dataframe = pd.DataFrame(client.get_historical_klines(self.pair, self.timeframe,
-                                                                       self.start),
-                                          columns=['timestamp', 'open', 'high', 'low', 'close', 'volume',
-                                                   'close_time',
-                                                   'quote_av', 'trades',
-                                                   'tb_base_av', 'tb_quote_av', 'ignore'])
-            # Parsing it
-            self.dataframe['close'] = pd.to_numeric(self.dataframe['close'])
-            self.dataframe['high'] = pd.to_numeric(self.dataframe['high'])
-            self.dataframe['low'] = pd.to_numeric(self.dataframe['low'])
-            self.dataframe['open'] = pd.to_numeric(self.dataframe['open'])
+            self.dataframe = make_kline_dataframe(self.download(client, self.start, downloader))
             if output:
                 print(Colors.LIGHT_GREEN + "Data downloaded successfully")
 
-        self.max_index = len(self.dataframe["close"]) - 1
-        self.timestamps_with_index = {key: i for i, key in enumerate(self.dataframe["timestamp"])}
+        self.set_dataframe(self.dataframe)
+
+    # Download only the bars after the last cached one and append them to the file
+    def sync(self, client=None, output=True, downloader=None):
+        if os.path.isfile(self.cache_path):
+            path, file_format = self.cache_path, "obt"
+            last_timestamp = read_header(path).get("last_timestamp")
+            dataframe = read_cache(path)[0]
+        elif os.path.isfile(self.path):
+            path, file_format = self.path, "csv"
+            dataframe = pd.read_csv(path)
+            last_timestamp = int(dataframe["timestamp"].iloc[-1]) if len(dataframe) > 0 else None
+        else:
+            # Nothing cached, the whole history is downloaded and cached
+            self.load(client, output=output, downloader=downloader)
+            if self.dataframe is not None:
+                self.save_cache()
+            return
+
+        if is_offline():
+            # Nothing can be downloaded, the cached data is used as it is
+            self.set_dataframe(dataframe)
+            return
+
+        if last_timestamp is None:
+            last_timestamp = self.start
+        if output:
+            print("Syncing data from API for " + self.pair + " timeframe: " + self.timeframe)
+
+        # The last cached bar is downloaded again because it may not have been closed when it was saved
+        new = make_kline_dataframe(self.download(client, last_timestamp, downloader))
+        if len(new) > 0:
+            new = new[[column for column in new.columns if column in dataframe.columns]]
+            dataframe = pd.concat([dataframe[dataframe["timestamp"] < new["timestamp"].iloc[0]], new],
+                                  ignore_index=True)
+            self.dataframe = dataframe
+            if file_format == "obt":
+                self.save_cache()
+                dataframe = read_cache(path)[0]
+            else:
+                self.save(self.folder, output=False)
+
+        self.set_dataframe(dataframe)
+        if output:
+            print(Colors.LIGHT_GREEN + "Data synced successfully,", len(new), "bar(s) downloaded")
+
+    # read the file of a pair loaded with lazy=True
+    def load_pending(self):
+        parameters, self.pending = self.pending, None
+        self.load(**parameters)
+
+    # download klines from start with the client or with a KlineDownloader
+    def download(self, client, start, downloader=None):
+        if downloader is not None:
+            return downloader.download(self.pair, self.timeframe, start)
+        if client is None:
+            client = get_client()
+        return client.get_historical_klines(self.pair, self.timeframe, start)
 
-    # Save the market data into file(s)
-    def save(self, default_path="", output=True):
-        path = default_path + self.make_file_name()
-        self.dataframe.to_csv(path, index=False)
+    # set the pair's dataframe and the values depending of it
+    def set_dataframe(self, dataframe):
+        self.dataframe = dataframe
+        self.max_index = len(dataframe["close"]) - 1
+        self.timestamps = dataframe["timestamp"].to_numpy()
+        self.timestamps_index = None
+
+    # get a dict of timestamp: index
+    @property
+    def timestamps_with_index(self):
+        if self.timestamps_index is None:
+            self.timestamps_index = {key: i for i, key in enumerate(self.timestamps.tolist())}
+        return self.timestamps_index
+
+    # Save the market data into file(s), file_format is "csv" or "obt" for a binary cache file
+    # cache=True also write the binary cache file of the pair at cache_path, it's loaded before the csv file
+    def save(self, default_path="", output=True, file_format="csv", cache=True):
+        path = default_path + self.make_file_name(file_format)
+        if file_format == "obt":
+            write_cache(path, self.dataframe, self.make_metadata())
+        elif file_format == "csv":
+            self.dataframe.to_csv(path + ".tmp", index=False)
+            os.replace(path + ".tmp", path)
+        else:
+            print(Colors.RED + "Error ! The file format", file_format, "doesn't exist !")
+            return
+        if cache and path != self.cache_path:
+            self.save_cache()
         if output:
             print(
                 Colors.LIGHT_GREEN + "Saved dataframe as file for " + self.pair + " from " + self.start + " timeframe: " + self.timeframe)
 
-    # create with class data a file name
-    def make_file_name(self):
-        return Pair.make_name(self.pair, self.start, self.timeframe)
+    # write the binary cache file of the pair
+    def save_cache(self):
+        write_cache(self.cache_path, self.dataframe, self.make_metadata())
 
-    # find the index of a given timestamp
-    def get_index(self, timestamp):
+    # create with class data a file name
+    def make_file_name(self, file_format="csv"):
+        return Pair.make_name(self.pair, self.start, self.timeframe, file_format)
 
-        absolute_difference_function = lambda list_value: abs(list_value - timestamp)
+    # read the bars of the pair in (start, dataframe) chunks of chunk_size rows, from the dataframe when it's loaded so
+    # the columns added to it are kept, otherwise from the cache file or the csv file, None when there's no bars
+    def stream(self, chunk_size):
+        if self.frame is not None:
+            return iter_dataframe(self.frame, chunk_size)
+        if os.path.isfile(self.cache_path):
+            return iter_cache(self.cache_path, chunk_size)
+        if os.path.isfile(self.path):
+            return iter_csv(self.path, chunk_size)
+        print(Colors.RED + "Error ! No file found for " + self.pair + " from " + self.start + " timeframe: " +
+              self.timeframe)
+        return None
 
-        closest_value = min(self.dataframe["timestamp"], key=absolute_difference_function)
+    # count the bars of the pair without loading them, None when they can't be counted ( csv file )
+    def count_rows(self):
+        if self.frame is not None:
+            return len(self.frame)
+        if os.path.isfile(self.cache_path):
+            return read_header(self.cache_path)["rows"]
+        return None
 
-        if closest_value <= timestamp:
-            index = self.timestamps_with_index[closest_value]
-        else:
-            index = self.timestamps_with_index[closest_value] - 1
+    # metadata written in the header of a binary cache file
+    def make_metadata(self):
+        return {"symbol": self.pair, "start": self.start, "timeframe": self.timeframe}
 
+    # find the index of the last row opened at or before a given timestamp with a binary search
+    # return None if the timestamp is older than the beginning of this dataframe
+    def get_index(self, timestamp):
+        index = int(np.searchsorted(self.timestamps, timestamp, side="right")) - 1
         if index < 0:
-            print(Colors.RED + "Error ! The row you're trying to get the equivalent index is "
-                               "older than the beginning of this dataframe")
-            exit()
-
+            return None
         return index
 
+    # find the indexes of an array of timestamps in one call, -1 for timestamps older than the beginning of this
+    # dataframe
+    def get_indexes(self, timestamps):
+        return np.searchsorted(self.timestamps, np.asarray(timestamps), side="right") - 1
+
     # make_file_name core method
     @staticmethod
-    def make_name(market_pair, start, timeframe):
+    def make_name(market_pair, start, timeframe, file_format="csv"):
         start = start.replace(" ", "#")
-        return market_pair + "-" + start + "-" + timeframe + "-.csv"
+        return market_pair + "-" + start + "-" + timeframe + "-." + file_format
 
     # parse_file_name core method ( Currently useless )
     @staticmethod
@@ -249,7 +899,8 @@ class Pair:
 
 # Define pairs data container
 class Container:
-    def __init__(self, client=Client()):
+    # without client the shared client is created when a pair has to be downloaded
+    def __init__(self, client=None):
         self.pairs = {}
         self.main = None
         self.client = client
@@ -266,30 +917,198 @@ class Container:
     def get_pair(self, name):
         return self.pairs[name]
 
-    def load_all(self, output=True):
+    # the client is not sent to other processes
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["client"] = None
+        return state
+
+    # with workers pairs are loaded in parallel and their time ranges are downloaded by workers threads
+    # with lazy=True the pairs having a file read it when their dataframe is first used, see Pair.load
+    def load_all(self, output=True, sync=False, workers=None, lazy=False):
+        if workers is not None and workers > 1:
+            downloader = KlineDownloader(self.client, workers=workers, output=output)
+            try:
+                with ThreadPoolExecutor(max_workers=min(workers, len(self.pairs))) as executor:
+                    futures = [executor.submit(pair.load, self.client, output, sync, downloader, lazy)
+                               for pair in self.pairs.values()]
+                    for future in futures:
+                        future.result()
+            finally:
+                downloader.close()
+            return
+
         current_pair = 1
         total_pairs = len(self.pairs)
         for pair in self.pairs:
             pair = self.pairs[pair]
             if output:
                 print(Colors.PURPLE + "Pair", current_pair, "/", total_pairs)
-            pair.load(self.client)
+            pair.load(self.client, output=output, sync=sync, lazy=lazy)
             current_pair += 1
 
-    def save_all(self, default_path="", output=True):
+    def save_all(self, default_path="", output=True, file_format="csv", cache=True):
         current_pair = 1
         total_pairs = len(self.pairs)
         for pair in self.pairs:
             pair = self.pairs[pair]
             if output:
                 print(Colors.PURPLE + "Pair", current_pair, "/", total_pairs)
-            pair.save(default_path=default_path, output=output)
+            pair.save(default_path=default_path, output=output, file_format=file_format, cache=cache)
             current_pair += 1
 
 
+# make the list of parameters combinations of a grid
+def make_grid(param_grid):
+    if isinstance(param_grid, dict):
+        names = list(param_grid)
+        return [dict(zip(names, values)) for values in itertools.product(*[param_grid[name] for name in names])]
+    return [dict(parameters) for parameters in param_grid]
+
+
+# split length bars into (in sample start, in sample end, out of sample start, out of sample end) windows
+def make_folds(length, in_sample, out_of_sample, anchored=False, step=None):
+    if step is None:
+        step = out_of_sample
+    folds = []
+    start = in_sample
+    while start < length:
+        folds.append((0 if anchored else start - in_sample, start, start, min(start + out_of_sample, length)))
+        start += step
+    return folds
+
+
+# ------------------------------------------------------------------------------------------------
+# This class run (parameters, start, end) tasks with an engine, with more than one worker the market data is
+# published once in shared memory and the tasks are spread over a pool of processes
+# ------------------------------------------------------------------------------------------------
+class WorkerPool:
+    def __init__(self, engine, strategy_factory, vectorized, run_parameters, workers=None, tasks=None):
+        self.engine = engine
+        self.strategy_factory = strategy_factory
+        self.vectorized = vectorized
+        self.run_parameters = run_parameters
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if tasks is not None:
+            workers = min(workers, tasks)
+        self.workers = max(1, workers)
+
+        self.shared = None
+        self.executor = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            # Market data is published once in shared memory for all workers
+            self.shared = SharedMarketData(self.engine.container, output=self.engine.output)
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=initialise_worker,
+                                                initargs=(self.shared, self.strategy_factory, self.vectorized,
+                                                          self.run_parameters))
+        return self
+
+    def __exit__(self, *exception):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        if self.shared is not None:
+            self.shared.unlink()
+            self.shared = None
+
+    # run the tasks and get their metrics in the same order
+    def map(self, tasks, chunksize=None):
+        if self.executor is None:
+            # No pool needed, runs are made in this process with an engine of the same container like a worker does,
+            # the strategy, the wallet and the bars of the given engine are left untouched
+            engine = Engine(self.engine.container, output=False, load=False)
+            results = []
+            for parameters, start, end in tasks:
+                engine.register_strategy(self.strategy_factory(**parameters), self.vectorized)
+                engine.run_strategy(start=start, end=end, **self.run_parameters)
+                results.append(engine.wallet.get_data_handler().get_metrics())
+            return results
+        # Tasks are sent by chunks to limit inter process communications
+        if chunksize is None:
+            chunksize = max(1, len(tasks) // (self.workers * 4))
+        return list(self.executor.map(run_worker, tasks, chunksize=chunksize))
+
+
+# Engine and settings of a worker process used by WorkerPool
+worker_engine = None
+worker_settings = None
+
+
+# called once when a worker process starts
+def initialise_worker(shared, strategy_factory, vectorized, run_parameters):
+    global worker_engine, worker_settings
+    worker_engine = Engine(shared.attach(), output=False, load=False)
+    worker_settings = strategy_factory, vectorized, run_parameters
+
+
+# run one (parameters, start, end) task in a worker process
+def run_worker(task):
+    parameters, start, end = task
+    strategy_factory, vectorized, run_parameters = worker_settings
+    worker_engine.register_strategy(strategy_factory(**parameters), vectorized)
+    worker_engine.run_strategy(start=start, end=end, **run_parameters)
+    return worker_engine.wallet.get_data_handler().get_metrics()
+
+
 # Define a report to decide of what to do
+# in a portfolio, pair is the name of the pair to trade, by default the pair the strategy was called for
 class Report:
-    def __init__(self, order, amount=None, percent_amount=None):
+    def __init__(self, order, amount=None, percent_amount=None, pair=None):
         self.order = order
         self.amount = amount
         self.percent_amount = percent_amount
+        self.pair = pair
+
+
+# Define the signals returned by a vectorized strategy, one value per row of the main dataframe
+# orders can hold "buy" / "sell" / None or 1 / -1 / 0, amounts can be a single value or one value per row
+# take_profit and stop_loss are in percent of the close of each filled buy like Engine.set_take_profit and
+# Engine.set_stop_loss percent targets, trailing_stop is a distance in percent under the highest price
+class Signals:
+    def __init__(self, orders, amount=None, percent_amount=None, take_profit=None, stop_loss=None,
+                 trailing_stop=None):
+        self.orders = orders
+        self.amount = amount
+        self.percent_amount = percent_amount
+        self.take_profit = take_profit
+        self.stop_loss = stop_loss
+        self.trailing_stop = trailing_stop
+
+    # build signals from buy and sell conditions, buy wins when both are true like in a bar strategy
+    @staticmethod
+    def from_conditions(buy, sell, amount=None, percent_amount=None, take_profit=None, stop_loss=None,
+                        trailing_stop=None):
+        buy = np.asarray(buy, dtype=bool)
+        sell = np.asarray(sell, dtype=bool)
+        return Signals(np.where(buy, 1, np.where(sell, -1, 0)), amount, percent_amount, take_profit, stop_loss,
+                       trailing_stop)
+
+    # check if buy orders set stops
+    def has_stops(self):
+        return self.take_profit is not None or self.stop_loss is not None or self.trailing_stop is not None
+
+    # get orders as an array of 1 ( buy ), -1 ( sell ) and 0 ( nothing )
+    def get_orders(self):
+        orders = np.asarray(self.orders)
+        if orders.dtype.kind in "OUS":
+            return np.where(orders == "buy", 1, np.where(orders == "sell", -1, 0)).astype(np.int8)
+        return np.sign(np.nan_to_num(orders.astype(float))).astype(np.int8)
+
+    # get amounts as a float array, nan means no amount
+    def get_amounts(self, length):
+        return Signals.make_values(self.amount, length)
+
+    # get percent amounts as a float array, nan means no percent amount
+    def get_percent_amounts(self, length):
+        return Signals.make_values(self.percent_amount, length)
+
+    # make_values core method
+    @staticmethod
+    def make_values(values, length):
+        if values is None:
+            return np.full(length, np.nan)
+        return np.broadcast_to(np.array(values, dtype=float), (length,))
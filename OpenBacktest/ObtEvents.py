@@ -0,0 +1,185 @@
+import json
+import queue
+import time
+from OpenBacktest.ObtUtility import Colors, parse_timestamp
+
+# Kinds of event
+ORDER_SUBMITTED = "order_submitted"
+ORDER_FILLED = "order_filled"
+STOP_HIT = "stop_hit"
+PROGRESS = "progress"
+KINDS = (ORDER_SUBMITTED, ORDER_FILLED, STOP_HIT, PROGRESS)
+
+# seconds between two progress events
+PROGRESS_INTERVAL = 1.0
+# number of bars between two checks of the clock for progress events
+PROGRESS_CHECK = 256
+
+
+# ------------------------------------------------------------------------------------------------
+# This class represent something happening during a backtest, index is the main bar index, timestamp the open time of
+# the bar and data the values of the event
+# ------------------------------------------------------------------------------------------------
+class Event:
+    __slots__ = ("kind", "index", "timestamp", "data")
+
+    def __init__(self, kind, index, timestamp, data):
+        self.kind = kind
+        self.index = index
+        self.timestamp = timestamp
+        self.data = data
+
+    def to_dict(self):
+        return dict({"kind": self.kind, "index": self.index, "timestamp": self.timestamp}, **self.data)
+
+    def __repr__(self):
+        return "Event(" + ", ".join(key + "=" + repr(value) for key, value in self.to_dict().items()) + ")"
+
+
+# ------------------------------------------------------------------------------------------------
+# This class send the events of an engine to its subscribers, events of a kind without subscriber are not built so
+# the engine checks wants(kind) before making an event
+# ------------------------------------------------------------------------------------------------
+class EventStream:
+    def __init__(self, progress_interval=PROGRESS_INTERVAL):
+        # (sink, kinds) of each subscriber, kinds None means all kinds
+        self.subscribers = []
+        # True when there's at least one subscriber and kinds having at least one subscriber
+        self.active = False
+        self.kinds = frozenset()
+        self.progress_interval = progress_interval
+        # start of the run and time of the last progress event
+        self.start = None
+        self.last_progress = None
+        # index of the first bar of the current chunk in the whole history and number of bars of the history when
+        # a run is streamed, event indexes are indexes of the whole history
+        self.offset = 0
+        self.total = None
+
+    # subscribe a sink, any callable taking an event, to some kinds of event or to all of them
+    def subscribe(self, sink, kinds=None):
+        if kinds is not None:
+            kinds = frozenset(kinds)
+            for kind in kinds:
+                if kind not in KINDS:
+                    print(Colors.RED + "Error, unknown event kind", kind, "use one of", KINDS)
+                    return sink
+        self.subscribers.append((sink, kinds))
+        self.update_kinds()
+        return sink
+
+    def unsubscribe(self, sink):
+        self.subscribers = [subscriber for subscriber in self.subscribers if subscriber[0] is not sink]
+        self.update_kinds()
+
+    # update the kinds listened to after a change of subscribers
+    def update_kinds(self):
+        kinds = set()
+        for sink, sink_kinds in self.subscribers:
+            kinds.update(KINDS if sink_kinds is None else sink_kinds)
+        self.kinds = frozenset(kinds)
+        self.active = len(self.subscribers) > 0
+
+    # check if events of a kind have a subscriber
+    def wants(self, kind):
+        return kind in self.kinds
+
+    # send an event to the subscribers of its kind
+    def emit(self, kind, index, timestamp, **data):
+        event = Event(kind, index + self.offset, timestamp, data)
+        for sink, kinds in self.subscribers:
+            if kinds is None or kind in kinds:
+                sink(event)
+
+    # called at the beginning of a run, total is the number of bars of a streamed run
+    def start_run(self, total=None):
+        self.start = self.last_progress = time.perf_counter()
+        self.offset = 0
+        self.total = total
+
+    # called by the bar loop at the bar it asked for, send a progress event when progress_interval seconds passed
+    # since the last one and return the next bar to call it at, the clock is only read every PROGRESS_CHECK bars
+    def progress(self, index, max_index, timestamp):
+        if PROGRESS not in self.kinds:
+            return max_index + 1
+        now = time.perf_counter()
+        if now - self.last_progress >= self.progress_interval:
+            self.last_progress = now
+            self.emit_progress(index, max_index, timestamp, now)
+        return index + PROGRESS_CHECK
+
+    # called at the end of a run
+    def finish_run(self, max_index, timestamp):
+        if PROGRESS in self.kinds:
+            self.emit_progress(max_index, max_index, timestamp, time.perf_counter())
+
+    def emit_progress(self, index, max_index, timestamp, now):
+        # last bar of the whole history
+        last = max_index + self.offset if self.total is None else self.total - 1
+        percent = 100.0 if last <= 0 else 100 * (index + self.offset) / last
+        self.emit(PROGRESS, index, timestamp, percent=percent, bars=last + 1, elapsed=now - self.start)
+
+
+# ------------------------------------------------------------------------------------------------
+# Sinks, any callable taking an event can be subscribed
+# ------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------
+# This sink discards events, it only counts them by kind
+# ------------------------------------------------------------------------------------------------
+class SilentSink:
+    def __init__(self):
+        self.counts = dict.fromkeys(KINDS, 0)
+
+    def __call__(self, event):
+        self.counts[event.kind] += 1
+
+
+# ------------------------------------------------------------------------------------------------
+# This sink print events in the console
+# ------------------------------------------------------------------------------------------------
+class ConsoleSink:
+    def __call__(self, event):
+        data = event.data
+        if event.kind == PROGRESS:
+            print(Colors.YELLOW + "Progress: " + str(round(data["percent"])) + "%")
+        elif event.kind == ORDER_SUBMITTED:
+            print(Colors.LIGHT_BLUE + "Order submitted:", data["order"], "at", parse_timestamp(event.timestamp))
+        elif event.kind == ORDER_FILLED:
+            print(Colors.LIGHT_GREEN + "Order filled:", data["order"], round(data["amount"], 8), "at",
+                  data["price"], parse_timestamp(event.timestamp))
+        elif event.kind == STOP_HIT:
+            print(Colors.LIGHT_RED + "Stop hit:", data["stop"], "at", data["price"], parse_timestamp(event.timestamp))
+
+
+# ------------------------------------------------------------------------------------------------
+# This sink write events to a file as json lines
+# ------------------------------------------------------------------------------------------------
+class FileSink:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w")
+
+    def __call__(self, event):
+        self.file.write(json.dumps(event.to_dict()) + "\n")
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+# ------------------------------------------------------------------------------------------------
+# This sink put events in a queue read by another thread, a multiprocessing queue can be given to stream them to
+# another process
+# ------------------------------------------------------------------------------------------------
+class QueueSink:
+    def __init__(self, events_queue=None):
+        self.queue = queue.Queue() if events_queue is None else events_queue
+
+    def __call__(self, event):
+        self.queue.put(event)
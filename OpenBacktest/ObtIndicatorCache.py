@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from OpenBacktest import ObtIndicators
+from OpenBacktest.ObtCache import read_cache, write_cache
+from OpenBacktest.ObtUtility import Colors
+
+# default maximum size of a cache folder in bytes
+MAX_SIZE = 1024 ** 3
+
+# batch functions of ObtIndicators by name with the columns they are computed from
+INDICATORS = {"ema": (ObtIndicators.ema, ("close",)),
+              "sma": (ObtIndicators.sma, ("close",)),
+              "rsi": (ObtIndicators.rsi, ("close",)),
+              "atr": (ObtIndicators.atr, ("high", "low", "close")),
+              "bollinger": (ObtIndicators.bollinger, ("close",)),
+              "macd": (ObtIndicators.macd, ("close",))}
+
+
+# get a fingerprint of the bars an indicator is computed from, any change of their timestamps or values gives
+# another fingerprint
+def make_fingerprint(dataframe, columns):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(len(dataframe)).encode())
+    for column in ("timestamp",) + tuple(columns):
+        values = np.ascontiguousarray(dataframe[column].to_numpy())
+        digest.update(column.encode())
+        digest.update(values.dtype.str.encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+# get the module and name of a function, the same for each run of the program, objects without a name like partials
+# get the name of their class
+def get_function_name(function):
+    name = getattr(function, "__qualname__", None) or type(function).__qualname__
+    return str(getattr(function, "__module__", None) or type(function).__module__) + "." + name
+
+
+# ------------------------------------------------------------------------------------------------
+# This class store indicator columns on disk so they are loaded instead of computed again, an entry is found with the
+# symbol and timeframe of the pair, the indicator name, the function computing it, its parameters and the fingerprint
+# of its bars
+# entries are binary cache files memory mapped when loaded, an index file keep their size and last use to remove the
+# least recently used ones when the folder is larger than max_size bytes, an entry computed on bars that changed
+# replaces the previous one
+# the index is written when an entry is stored, last uses of loaded entries are kept in memory until close(), the
+# cache can be used in a with statement to close it, processes sharing a folder merge their index under a lock file
+# with IndicatorCache("indicators") as cache: cache.add_column(pair, "ema20", "ema", window=20)
+# ------------------------------------------------------------------------------------------------
+class IndicatorCache:
+    def __init__(self, folder="indicators", max_size=MAX_SIZE):
+        self.folder = folder
+        self.max_size = max_size
+        self.index_path = os.path.join(folder, "index.json")
+        os.makedirs(folder, exist_ok=True)
+        self.entries = self.read_index()
+        # keys removed since the index was written and whether last uses changed without being written
+        self.removed = set()
+        self.changed = False
+        # number of entries loaded and computed by this instance
+        self.hits = 0
+        self.misses = 0
+
+    # read the index file, entries whose file was removed are forgotten
+    def read_index(self):
+        if not os.path.isfile(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, "r") as file:
+                entries = json.load(file)
+        except (ValueError, OSError):
+            print(Colors.YELLOW + "Indicator cache index unreadable, the cache is emptied")
+            entries = {}
+        return {key: entry for key, entry in entries.items()
+                if os.path.isfile(os.path.join(self.folder, entry["file"]))}
+
+    # write the index file under the lock of the folder, merged with the entries other processes wrote since it was
+    # read, the least recently used entries are then removed, it's written next to its path and replaced atomically
+    def write_index(self):
+        with FileLock(self.index_path + ".lock"):
+            entries = self.read_index()
+            for key in self.removed:
+                entries.pop(key, None)
+            for key, entry in self.entries.items():
+                if key in entries:
+                    entry["last_used"] = max(entry["last_used"], entries[key]["last_used"])
+            entries.update(self.entries)
+            # Entries removed by other processes are forgotten
+            self.entries = {key: entry for key, entry in entries.items()
+                            if os.path.isfile(os.path.join(self.folder, entry["file"]))}
+            self.evict()
+            self.removed = set()
+            self.changed = False
+
+            temporary_path = self.index_path + "." + str(os.getpid()) + ".tmp"
+            with open(temporary_path, "w") as file:
+                json.dump(self.entries, file)
+            os.replace(temporary_path, self.index_path)
+
+    # get an indicator of a pair, from the cache or computed and stored
+    # name is one of INDICATORS or the name of the given function, function(*columns, **parameters) returns an array
+    # or a tuple of arrays, columns are the names of the dataframe columns it's computed from
+    # the module and name of the function are part of the key, version is changed when the code of a function changes
+    def get(self, pair, name, function=None, columns=None, version=None, **parameters):
+        if function is None:
+            if name not in INDICATORS:
+                print(Colors.RED + "Error, unknown indicator", name, "use one of", list(INDICATORS),
+                      "or give its function")
+                return None
+            function, default_columns = INDICATORS[name]
+            if columns is None:
+                columns = default_columns
+        if columns is None:
+            columns = ("close",)
+        columns = tuple(columns)
+
+        dataframe = pair.dataframe
+        fingerprint = make_fingerprint(dataframe, columns)
+        base = {"symbol": pair.pair, "timeframe": pair.timeframe, "name": name,
+                "function": get_function_name(function), "version": version,
+                "parameters": json.dumps(parameters, sort_keys=True, default=str), "columns": list(columns)}
+        key = hashlib.blake2b(json.dumps(dict(base, fingerprint=fingerprint), sort_keys=True).encode(),
+                              digest_size=16).hexdigest()
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            values = self.load(entry)
+            if values is not None:
+                self.hits += 1
+                return values
+
+        # Computing
+        self.misses += 1
+        values = function(*(dataframe[column] for column in columns), **parameters)
+        self.store(key, base, fingerprint, values)
+        return values
+
+    # compute or load an indicator as columns of the pair's dataframe, a tuple of arrays gives the columns column_0,
+    # column_1...
+    def add_column(self, pair, column, name, function=None, columns=None, version=None, **parameters):
+        values = self.get(pair, name, function, columns, version, **parameters)
+        if values is None:
+            return
+        if isinstance(values, tuple):
+            for i, array in enumerate(values):
+                pair.dataframe[column + "_" + str(i)] = array
+        else:
+            pair.dataframe[column] = values
+
+    # load the arrays of an entry, memory mapped
+    def load(self, entry):
+        try:
+            dataframe = read_cache(os.path.join(self.folder, entry["file"]))[0]
+        except (ValueError, OSError):
+            return None
+        # The last use is written with the next stored entry or by close()
+        entry["last_used"] = time.time()
+        self.changed = True
+        arrays = tuple(dataframe[column].to_numpy() for column in dataframe.columns)
+        return arrays if entry["outputs"] > 1 else arrays[0]
+
+    # store the arrays of an indicator, entries of the same indicator computed on other bars are removed
+    def store(self, key, base, fingerprint, values):
+        arrays = values if isinstance(values, tuple) else (values,)
+        dataframe = pd.DataFrame({"value_" + str(i): np.asarray(array, dtype=np.float64)
+                                  for i, array in enumerate(arrays)})
+        file_name = key + ".obt"
+        path = os.path.join(self.folder, file_name)
+        write_cache(path, dataframe, dict(base, fingerprint=fingerprint))
+
+        # Invalidation
+        for old_key, old_entry in list(self.entries.items()):
+            if all(old_entry[name] == base[name] for name in base) and old_entry["fingerprint"] != fingerprint:
+                self.remove(old_key)
+
+        self.entries[key] = dict(base, fingerprint=fingerprint, file=file_name, size=os.path.getsize(path),
+                                 outputs=len(arrays), last_used=time.time())
+        self.write_index()
+
+    # remove the least recently used entries until the folder is smaller than max_size
+    def evict(self):
+        size = self.get_size()
+        for key in sorted(self.entries, key=lambda key: self.entries[key]["last_used"]):
+            if size <= self.max_size:
+                break
+            size -= self.entries[key]["size"]
+            self.remove(key)
+
+    # remove an entry and its file
+    def remove(self, key):
+        entry = self.entries.pop(key)
+        self.removed.add(key)
+        try:
+            os.remove(os.path.join(self.folder, entry["file"]))
+        except OSError:
+            pass
+
+    # size of the entries in bytes
+    def get_size(self):
+        return sum(entry["size"] for entry in self.entries.values())
+
+    # remove all entries, with the ones other processes added
+    def clear(self):
+        self.entries.update({key: entry for key, entry in self.read_index().items() if key not in self.removed})
+        for key in list(self.entries):
+            self.remove(key)
+        self.write_index()
+
+    # write the last uses of the loaded entries
+    def close(self):
+        if self.changed:
+            self.write_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+# ------------------------------------------------------------------------------------------------
+# This class is a lock file shared by the processes using a cache folder, with FileLock(path): ...
+# a lock older than timeout seconds was left by a stopped process and is removed
+# ------------------------------------------------------------------------------------------------
+class FileLock:
+    def __init__(self, path, timeout=10.0, delay=0.005):
+        self.path = path
+        self.timeout = timeout
+        self.delay = delay
+
+    def __enter__(self):
+        while True:
+            try:
+                os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > self.timeout:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue
+            time.sleep(self.delay)
+
+    def __exit__(self, *exception):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,252 @@
+import math
+import numpy as np
+import pandas as pd
+
+# ------------------------------------------------------------------------------------------------
+# Indicators with the definitions of the ta library, each one has:
+# - a class holding a small state updated in O(1) by update() with the values of a new bar, used bar by bar in a
+#   strategy, in a streamed run or live, update() returns nan until the indicator has enough bars
+# - a function computing the indicator on whole arrays at once, used to prepare a dataframe before a backtest
+# both give the same values within float precision, ta fills the ATR with 0 instead of nan before its first value
+# ------------------------------------------------------------------------------------------------
+
+NAN = float("nan")
+
+
+# ------------------------------------------------------------------------------------------------
+# This class compute an exponential moving average, the first value is the seed, values start after window values
+# nan values are skipped
+# ------------------------------------------------------------------------------------------------
+class EMA:
+    __slots__ = ("window", "alpha", "count", "average", "value")
+
+    def __init__(self, window=14, alpha=None):
+        self.window = window
+        self.alpha = 2 / (window + 1) if alpha is None else alpha
+        self.count = 0
+        self.average = NAN
+        self.value = NAN
+
+    def update(self, value):
+        if value != value:
+            return self.value
+        if self.count == 0:
+            self.average = value
+        else:
+            self.average = (1 - self.alpha) * self.average + self.alpha * value
+        self.count += 1
+        if self.count >= self.window:
+            self.value = self.average
+        return self.value
+
+
+# ------------------------------------------------------------------------------------------------
+# This class compute a simple moving average over a ring buffer, the sum is computed again each time the buffer
+# wraps so rounding errors don't add up
+# ------------------------------------------------------------------------------------------------
+class SMA:
+    __slots__ = ("window", "buffer", "position", "count", "total", "value")
+
+    def __init__(self, window=14):
+        self.window = window
+        self.buffer = [0.0] * window
+        self.position = 0
+        self.count = 0
+        self.total = 0.0
+        self.value = NAN
+
+    def update(self, value):
+        self.total += value - self.buffer[self.position]
+        self.buffer[self.position] = value
+        self.position += 1
+        if self.position == self.window:
+            self.position = 0
+            self.total = math.fsum(self.buffer)
+        self.count += 1
+        if self.count >= self.window:
+            self.value = self.total / self.window
+        return self.value
+
+
+# ------------------------------------------------------------------------------------------------
+# This class compute the relative strength index with Wilder's smoothing of the gains and losses
+# ------------------------------------------------------------------------------------------------
+class RSI:
+    __slots__ = ("window", "previous", "gains", "losses", "value")
+
+    def __init__(self, window=14):
+        self.window = window
+        self.previous = None
+        self.gains = EMA(window, alpha=1 / window)
+        self.losses = EMA(window, alpha=1 / window)
+        self.value = NAN
+
+    def update(self, close):
+        # The first bar has no change, it counts as a null gain and loss
+        change = 0.0 if self.previous is None else close - self.previous
+        self.previous = close
+        gains = self.gains.update(change if change > 0 else 0.0)
+        losses = self.losses.update(-change if change < 0 else 0.0)
+        if losses == 0:
+            self.value = 100.0
+        elif losses == losses:
+            self.value = 100 - 100 / (1 + gains / losses)
+        return self.value
+
+
+# ------------------------------------------------------------------------------------------------
+# This class compute the average true range, the first value is the mean of the first window true ranges then it's
+# smoothed with Wilder's method
+# ------------------------------------------------------------------------------------------------
+class ATR:
+    __slots__ = ("window", "previous", "count", "total", "value")
+
+    def __init__(self, window=14):
+        self.window = window
+        self.previous = None
+        self.count = 0
+        self.total = 0.0
+        self.value = NAN
+
+    def update(self, high, low, close):
+        true_range = high - low
+        if self.previous is not None:
+            true_range = max(true_range, abs(high - self.previous), abs(low - self.previous))
+        self.previous = close
+        self.count += 1
+        if self.count < self.window:
+            self.total += true_range
+        elif self.count == self.window:
+            self.value = (self.total + true_range) / self.window
+        else:
+            self.value = (self.value * (self.window - 1) + true_range) / self.window
+        return self.value
+
+
+# ------------------------------------------------------------------------------------------------
+# This class compute the Bollinger bands, moving average and population standard deviation of the window, values are
+# shifted by the mean of the previous window to keep the precision of the sums
+# ------------------------------------------------------------------------------------------------
+class Bollinger:
+    __slots__ = ("window", "window_dev", "buffer", "position", "count", "shift", "total", "squares", "mavg", "hband",
+                 "lband")
+
+    def __init__(self, window=20, window_dev=2):
+        self.window = window
+        self.window_dev = window_dev
+        self.buffer = [0.0] * window
+        self.position = 0
+        self.count = 0
+        self.shift = None
+        self.total = 0.0
+        self.squares = 0.0
+        self.mavg = NAN
+        self.hband = NAN
+        self.lband = NAN
+
+    # return (mavg, hband, lband)
+    def update(self, close):
+        if self.shift is None:
+            self.shift = close
+        value = close - self.shift
+        old = self.buffer[self.position]
+        self.total += value - old
+        self.squares += value * value - old * old
+        self.buffer[self.position] = value
+        self.position += 1
+        if self.position == self.window:
+            # The values are shifted again by their mean and the sums computed again
+            self.position = 0
+            mean = math.fsum(self.buffer) / self.window
+            self.shift += mean
+            self.buffer = [value - mean for value in self.buffer]
+            self.total = math.fsum(self.buffer)
+            self.squares = math.fsum(value * value for value in self.buffer)
+        self.count += 1
+        if self.count >= self.window:
+            mean = self.total / self.window
+            deviation = math.sqrt(max(self.squares / self.window - mean * mean, 0.0))
+            self.mavg = mean + self.shift
+            self.hband = self.mavg + self.window_dev * deviation
+            self.lband = self.mavg - self.window_dev * deviation
+        return self.mavg, self.hband, self.lband
+
+
+# ------------------------------------------------------------------------------------------------
+# This class compute the MACD line, its signal line and their difference
+# ------------------------------------------------------------------------------------------------
+class MACD:
+    __slots__ = ("fast", "slow", "signal_ema", "macd", "signal", "diff")
+
+    def __init__(self, window_slow=26, window_fast=12, window_sign=9):
+        self.fast = EMA(window_fast)
+        self.slow = EMA(window_slow)
+        self.signal_ema = EMA(window_sign)
+        self.macd = NAN
+        self.signal = NAN
+        self.diff = NAN
+
+    # return (macd, signal, diff)
+    def update(self, close):
+        self.macd = self.fast.update(close) - self.slow.update(close)
+        self.signal = self.signal_ema.update(self.macd)
+        self.diff = self.macd - self.signal
+        return self.macd, self.signal, self.diff
+
+
+# update an indicator with each value of some arrays and get its values as arrays, used to warm up an indicator on
+# past bars before updating it bar by bar, run_indicator(ATR(14), high, low, close)
+def run_indicator(indicator, *columns):
+    values = [indicator.update(*row) for row in zip(*(np.asarray(column).tolist() for column in columns))]
+    if values and isinstance(values[0], tuple):
+        return tuple(np.array(column, dtype=np.float64) for column in zip(*values))
+    return np.array(values, dtype=np.float64)
+
+
+# --------------------------
+# Batch functions
+# --------------------------
+
+def ema(close, window=14):
+    return pd.Series(close, dtype=np.float64).ewm(span=window, min_periods=window, adjust=False).mean().to_numpy()
+
+
+def sma(close, window=14):
+    return pd.Series(close, dtype=np.float64).rolling(window, min_periods=window).mean().to_numpy()
+
+
+def rsi(close, window=14):
+    change = pd.Series(close, dtype=np.float64).diff().fillna(0.0)
+    gains = change.clip(lower=0).ewm(alpha=1 / window, min_periods=window, adjust=False).mean().to_numpy()
+    losses = (-change).clip(lower=0).ewm(alpha=1 / window, min_periods=window, adjust=False).mean().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(losses == 0, 100.0, 100 - 100 / (1 + gains / losses))
+
+
+def atr(high, low, close, window=14):
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    previous = np.concatenate(([np.nan], np.asarray(close, dtype=np.float64)[:-1]))
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - previous), np.abs(low - previous)))
+    values = np.full(len(true_range), np.nan)
+    if len(true_range) < window:
+        return values
+    # The mean of the first true ranges is the seed of the smoothing
+    values[window - 1] = true_range[:window].mean()
+    values[window:] = true_range[window:]
+    return pd.Series(values).ewm(alpha=1 / window, adjust=False).mean().to_numpy()
+
+
+# return (mavg, hband, lband)
+def bollinger(close, window=20, window_dev=2):
+    close = pd.Series(close, dtype=np.float64)
+    mavg = close.rolling(window, min_periods=window).mean().to_numpy()
+    deviation = close.rolling(window, min_periods=window).std(ddof=0).to_numpy()
+    return mavg, mavg + window_dev * deviation, mavg - window_dev * deviation
+
+
+# return (macd, signal, diff)
+def macd(close, window_slow=26, window_fast=12, window_sign=9):
+    line = ema(close, window_fast) - ema(close, window_slow)
+    signal = pd.Series(line).ewm(span=window_sign, min_periods=window_sign, adjust=False).mean().to_numpy()
+    return line, signal, line - signal
@@ -0,0 +1,411 @@
+import asyncio
+import json
+import time
+import numpy as np
+import pandas as pd
+import websockets
+from OpenBacktest.ObtDownload import FakeKlineClient, KlineDownloader
+from OpenBacktest.ObtEvents import ORDER_SUBMITTED
+from OpenBacktest.ObtIndicators import run_indicator
+from OpenBacktest.ObtProfiler import Profiler
+from OpenBacktest.ObtStops import Stops
+from OpenBacktest.ObtUtility import BarColumn, Colors, kline_columns
+from OpenBacktest.ObtWallet import Wallet
+
+# ------------------------------------------------------------------------------------------------
+# Paper trading of a strategy on live klines of a websocket stream
+# runner = LiveRunner(engine, "USDT", "BTC", 1000, 0, 0.1, indicators={"ema": (EMA(20), ("close",))})
+# runner.start(max_bars=60)
+# ------------------------------------------------------------------------------------------------
+
+# binance kline stream of a symbol and timeframe
+BINANCE_STREAM = "wss://stream.binance.com:9443/ws/{symbol}@kline_{timeframe}"
+
+# keys of the kline columns in a kline message of the stream
+KLINE_KEYS = {"timestamp": "t", "open": "o", "high": "h", "low": "l", "close": "c", "volume": "v", "close_time": "T",
+              "quote_av": "q", "trades": "n", "tb_base_av": "V", "tb_quote_av": "Q", "ignore": "B"}
+
+# phases of a closed bar timed by the runner, from the reception of its message to the decision
+LIVE_PHASES = ("parse", "indicators", "stops", "strategy", "orders")
+
+
+# get the kline of a stream message as a dict with the keys of the stream, None for other messages
+def parse_kline(message):
+    data = json.loads(message)
+    # Combined streams wrap the event in data
+    data = data.get("data", data)
+    if data.get("e") != "kline":
+        return None
+    return data["k"]
+
+
+# get a closed kline of the API as a dict with the keys of the stream
+def make_stream_kline(kline):
+    values = dict(zip(KLINE_KEYS.values(), kline))
+    values["x"] = True
+    return values
+
+
+# ------------------------------------------------------------------------------------------------
+# This class hold the bars of a live run in preallocated arrays, the bar being formed is written in place at the row
+# after the last closed bar and only becomes visible when it closes, bars["close"] is a BarColumn view of the closed
+# bars so strategies using the attributes of pandas Series work like in a backtest
+# ------------------------------------------------------------------------------------------------
+class LiveBars:
+    def __init__(self, dataframe, capacity=None):
+        self.length = len(dataframe)
+        self.capacity = max(self.length * 2, 1024) if capacity is None else max(capacity, self.length + 1)
+        self.arrays = {}
+        for column in dataframe.columns:
+            values = dataframe[column].to_numpy()
+            if values.dtype.kind not in "biuf":
+                continue
+            array = np.zeros(self.capacity, dtype=values.dtype)
+            array[:self.length] = values
+            self.arrays[column] = array
+        # views of the closed bars, made again when a bar closes
+        self.views = {}
+
+    def __getitem__(self, column):
+        view = self.views.get(column)
+        if view is None:
+            view = self.arrays[column][:self.length].view(BarColumn)
+            self.views[column] = view
+        return view
+
+    def __contains__(self, column):
+        return column in self.arrays
+
+    def __len__(self):
+        return self.length
+
+    # add a float column filled with nan
+    def add_column(self, column):
+        if column not in self.arrays:
+            self.arrays[column] = np.full(self.capacity, np.nan)
+
+    # double the capacity of the arrays
+    def grow(self):
+        self.capacity *= 2
+        for column, array in self.arrays.items():
+            grown = np.zeros(self.capacity, dtype=array.dtype)
+            grown[:self.length] = array[:self.length]
+            self.arrays[column] = grown
+        self.views = {}
+
+    # write a kline of the stream in the row of the bar being formed, return True when the kline closes the bar
+    def update(self, kline):
+        if self.length > 0 and kline["t"] <= self.arrays["timestamp"][self.length - 1]:
+            # Bar already closed
+            return False
+        if self.length == self.capacity:
+            self.grow()
+        row = self.length
+        arrays = self.arrays
+        for column, key in KLINE_KEYS.items():
+            array = arrays.get(column)
+            if array is not None:
+                array[row] = kline[key]
+        return kline["x"]
+
+    # make the row of the bar being formed a closed bar
+    def close_bar(self):
+        self.length += 1
+        self.views = {}
+
+    # get the closed bars as a dataframe
+    def make_dataframe(self):
+        return pd.DataFrame({column: array[:self.length].copy() for column, array in self.arrays.items()})
+
+
+# ------------------------------------------------------------------------------------------------
+# This class run the strategy registered in an engine on the live klines of a websocket stream, orders are paper
+# fills of a Wallet at the close of the bars
+# the main dataframe of the engine is the history given to the strategy before the live bars, indicators is a dict
+# of column: (indicator, columns) with incremental indicators of ObtIndicators warmed up on the history and updated
+# on each closed bar, an indicator giving a tuple of values fills the columns column_0, column_1...
+# the time from the reception of the message closing a bar to the decision is recorded by phase
+# when the stream stops the runner connects again up to retries times in a row without a new bar, waiting
+# backoff * 2 ** attempt seconds, the bars closed while it was disconnected are downloaded with the client and passed
+# to the strategy before the stream is read again, retries=0 ends the run with the stream
+# ------------------------------------------------------------------------------------------------
+class LiveRunner:
+    def __init__(self, engine, coin_name, token_name, coin_balance, token_balance, taker, url=None, indicators=None,
+                 capacity=None, backend=None, client=None, retries=5, backoff=1.0):
+        self.engine = engine
+        main = engine.container.main
+        self.symbol = main.pair
+        self.timeframe = main.timeframe
+        self.url = BINANCE_STREAM.format(symbol=main.pair.lower(), timeframe=main.timeframe) if url is None else url
+        # client downloading the missed bars, the client of the engine by default
+        self.client = client
+        self.retries = retries
+        self.backoff = backoff
+        self.history = engine.main_dataframe()
+        if self.history is None:
+            self.history = pd.DataFrame({column: [] for column in kline_columns})
+        self.bars = LiveBars(self.history, capacity)
+        # column: (indicator, columns, output columns)
+        self.indicators = {}
+        for column, (indicator, columns) in (indicators or {}).items():
+            self.add_indicator(column, indicator, columns)
+
+        self.wallet = Wallet(coin_name, token_name, coin_balance, token_balance, taker, self.history, bars=self.bars,
+                             events=engine.events, backend=backend)
+        self.profiler = Profiler(LIVE_PHASES)
+        # number of live bars closed, bars downloaded after a reconnection are counted
+        self.closed = 0
+        # number of connections to the stream after the first one
+        self.reconnections = 0
+
+    # warm up an indicator on the history
+    def add_indicator(self, column, indicator, columns):
+        values = run_indicator(indicator, *(self.bars[name] for name in columns))
+        outputs = [column + "_" + str(i) for i in range(len(values))] if isinstance(values, tuple) else [column]
+        for output, output_values in zip(outputs, values if isinstance(values, tuple) else (values,)):
+            self.bars.add_column(output)
+            self.bars.arrays[output][:len(self.bars)] = output_values
+        self.bars.views = {}
+        self.indicators[column] = (indicator, tuple(columns), outputs)
+
+    # run until max_bars live bars closed, the stream closes or timeout seconds passed
+    def start(self, max_bars=None, timeout=None, finish=False):
+        return asyncio.run(self.run(max_bars, timeout, finish))
+
+    async def run(self, max_bars=None, timeout=None, finish=False):
+        engine = self.engine
+        if engine.strategy is None or engine.vectorized:
+            print(Colors.RED + "Error, live runs need a strategy called on each bar registered in the engine")
+            return None
+        # The engine methods used by the strategy work on the live bars
+        engine.bars = self.bars
+        engine.wallet = self.wallet
+        engine.stops = Stops()
+        engine.aligned = {}
+        engine.events.start_run()
+        self.profiler.start_run()
+        if engine.output:
+            print(Colors.PURPLE + "Paper trading on", self.url)
+        try:
+            await asyncio.wait_for(self.consume(max_bars), timeout)
+        except asyncio.TimeoutError:
+            pass
+        except (OSError, websockets.exceptions.WebSocketException) as error:
+            print(Colors.RED + "Error, the stream stopped:", error)
+        self.profiler.stop_run()
+
+        # Sell all remaining coins
+        if self.wallet.current_token_balance > 0 and finish and len(self.bars) > 0:
+            self.wallet.sell(len(self.bars) - 1)
+        self.wallet.dataframe = self.bars.make_dataframe()
+        if engine.output:
+            print(Colors.LIGHT_GREEN + "Paper trading finished,", self.closed, "live bar(s)")
+        return self.wallet
+
+    # read the messages of the stream, connecting again when it stops, retries counts the connections in a row that
+    # didn't close any bar
+    async def consume(self, max_bars=None):
+        attempt = 0
+        while True:
+            closed = self.closed
+            error = None
+            try:
+                async with websockets.connect(self.url) as websocket:
+                    # Bars closed while disconnected
+                    if self.reconnections > 0 and await self.backfill(max_bars):
+                        return
+                    if await self.read(websocket, max_bars):
+                        return
+            except (OSError, websockets.exceptions.WebSocketException) as exception:
+                error = exception
+            if self.closed > closed:
+                attempt = 0
+            if attempt >= self.retries:
+                if error is not None:
+                    raise error
+                return
+            wait = self.backoff * 2 ** attempt
+            if self.engine.output:
+                print(Colors.YELLOW + "The stream stopped" + ("" if error is None else ": " + str(error)) +
+                      ", connecting again in " + str(round(wait, 2)) + "s")
+            attempt += 1
+            self.reconnections += 1
+            await asyncio.sleep(wait)
+
+    # read the messages of a connection, return True when max_bars live bars closed
+    async def read(self, websocket, max_bars=None):
+        clock = time.perf_counter_ns
+        async for message in websocket:
+            start = clock()
+            kline = parse_kline(message)
+            if kline is None or not self.bars.update(kline):
+                continue
+            self.on_bar(start)
+            if max_bars is not None and self.closed >= max_bars:
+                return True
+        return False
+
+    # download the bars closed after the last bar and pass them to the strategy, return True when max_bars live bars
+    # closed
+    async def backfill(self, max_bars=None):
+        if len(self.bars) == 0:
+            return False
+        client = self.engine.client if self.client is None else self.client
+        if client is None:
+            print(Colors.RED + "Error, the bars missed while disconnected can't be downloaded without a client")
+            return False
+        downloader = KlineDownloader(client, workers=1, output=self.engine.output)
+        now = int(time.time() * 1000)
+        start = int(self.bars["timestamp"][-1]) + 1
+        try:
+            klines = await asyncio.to_thread(downloader.download_chunk, self.symbol, self.timeframe, start, now,
+                                             True)
+        except Exception as error:
+            print(Colors.RED + "Error, the bars missed while disconnected can't be downloaded:", error)
+            return False
+        finally:
+            downloader.close()
+        clock = time.perf_counter_ns
+        for kline in klines:
+            # The last kline can be the bar being formed
+            if int(kline[6]) >= now:
+                break
+            start = clock()
+            if self.bars.update(make_stream_kline(kline)):
+                self.on_bar(start)
+                if max_bars is not None and self.closed >= max_bars:
+                    return True
+        return False
+
+    # call the strategy on the bar that just closed
+    def on_bar(self, start):
+        clock = time.perf_counter_ns
+        engine = self.engine
+        bars = self.bars
+        t1 = clock()
+        bars.close_bar()
+        index = len(bars) - 1
+
+        # Indicators
+        arrays = bars.arrays
+        for indicator, columns, outputs in self.indicators.values():
+            values = indicator.update(*(arrays[column][index] for column in columns))
+            if len(outputs) == 1:
+                arrays[outputs[0]][index] = values
+            else:
+                for output, value in zip(outputs, values):
+                    arrays[output][index] = value
+        t2 = clock()
+
+        # Stops, only the new bar is searched
+        stops = engine.stops
+        if not stops.is_empty() and stops.index < index:
+            stops.move_peak(bars, index - 1)
+            stops.find_hit(bars)
+            if stops.hit_index == index:
+                engine.update_stop(index)
+        t3 = clock()
+
+        report = engine.strategy(bars, index)
+        t4 = clock()
+        if report is not None:
+            if engine.events.wants(ORDER_SUBMITTED):
+                engine.submit_event(index, report.order, report.amount, report.percent_amount)
+            if report.order == "buy":
+                self.wallet.buy(index, report.amount, report.percent_amount)
+            elif report.order == "sell":
+                self.wallet.sell(index, report.amount, report.percent_amount)
+                stops.clear()
+        self.profiler.record(index, (start, t1, t2, t3, t4, clock()))
+        self.closed += 1
+
+    # get the latency report of the live bars, see Profiler.get_report
+    def get_latency(self, slowest=10):
+        return self.profiler.get_report(self.bars["timestamp"], slowest)
+
+    # Summarize the latency of the live bars
+    def display_latency(self, slowest=10):
+        self.profiler.display(self.bars["timestamp"], slowest)
+
+
+# ------------------------------------------------------------------------------------------------
+# This class is a local kline stream sending the bars of a dataframe like the binance stream, each bar is sent
+# updates times while it's formed and once closed, interval is the time in seconds between two bars
+# a connection continues from the bar after the last one sent, with drop_after the server drops each connection
+# after sending drop_after bars and the next gap bars are formed while the client is disconnected so they're not sent
+# client is a FakeKlineClient serving the bars formed so far, to download the missed bars
+# async with FakeKlineServer(dataframe) as server: runner = LiveRunner(..., url=server.url, client=server.client)
+# ------------------------------------------------------------------------------------------------
+class FakeKlineServer:
+    def __init__(self, dataframe, symbol="BTCUSDT", timeframe="1m", host="127.0.0.1", port=0, interval=0.0,
+                 updates=1, drop_after=None, gap=0):
+        self.dataframe = dataframe
+        self.rows = dataframe.to_dict("records")
+        self.drop_after = drop_after
+        self.gap = gap
+        self.client = FakeKlineClient(dataframe)
+        # next bar to send
+        self.position = 0
+        self.move(0)
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.updates = updates
+        self.server = None
+
+    # move to the bar position, the bars before it are formed
+    def move(self, position):
+        self.position = position
+        if position < len(self.rows):
+            self.client.end_time = int(self.rows[position]["timestamp"]) - 1
+        else:
+            self.client.end_time = None
+
+    @property
+    def url(self):
+        return "ws://" + self.host + ":" + str(self.port)
+
+    # make the messages of a bar, the bar being formed goes from its open to its close
+    def make_messages(self, row):
+        messages = []
+        for update in range(self.updates + 1):
+            closed = update == self.updates
+            close = row["close"] if closed else row["open"] + (row["close"] - row["open"]) * update / self.updates
+            kline = {key: row[column] for column, key in KLINE_KEYS.items() if column in row}
+            kline.update({"c": close, "h": max(row["open"], close) if not closed else row["high"],
+                          "l": min(row["open"], close) if not closed else row["low"], "x": closed,
+                          "s": self.symbol, "i": self.timeframe})
+            for key in ("o", "h", "l", "c", "v", "q", "V", "Q", "B"):
+                if key in kline:
+                    kline[key] = str(kline[key])
+            messages.append(json.dumps({"e": "kline", "E": int(row["timestamp"]), "s": self.symbol, "k": kline}))
+        return messages
+
+    async def handler(self, websocket, *arguments):
+        sent = 0
+        try:
+            while self.position < len(self.rows):
+                if self.drop_after is not None and sent == self.drop_after:
+                    self.move(self.position + self.gap)
+                    await websocket.close(code=1011, reason="Connection dropped")
+                    return
+                for message in self.make_messages(self.rows[self.position]):
+                    await websocket.send(message)
+                self.move(self.position + 1)
+                sent += 1
+                # Sleeping even without interval lets the server read the close of the client
+                await asyncio.sleep(self.interval)
+        except websockets.exceptions.ConnectionClosed:
+            # The client left
+            pass
+
+    async def __aenter__(self):
+        self.server = await websockets.serve(self.handler, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1] if self.port == 0 else self.port
+        return self
+
+    async def __aexit__(self, *exception):
+        self.server.close()
+        await self.server.wait_closed()
@@ -0,0 +1,77 @@
+import numpy as np
+
+# milliseconds in a year, crypto markets never close
+YEAR = 365 * 86400000
+
+
+# compute the value of a wallet at the close of each bar, orders are the ledger rows sorted by bar index, the
+# balances after the last order filled at or before a bar are valued at the close of this bar
+def make_equity(order_indexes, coin_balances, token_balances, closes):
+    indexes = np.arange(len(closes))
+    last = np.searchsorted(order_indexes, indexes, side="right") - 1
+    # Bars before the first order keep the initial balances, the first row of the ledger
+    last = np.maximum(last, 0)
+    return coin_balances[last] + token_balances[last] * closes
+
+
+# compute the drawdown at each bar of an equity curve in %, with the bar index of the last ATH before each bar
+def make_drawdowns(equity):
+    aths = np.maximum.accumulate(equity)
+    drawdowns = 100 * (equity - aths) / aths
+    indexes = np.arange(len(equity))
+    last_aths = np.maximum.accumulate(np.where(equity >= aths, indexes, 0))
+    return drawdowns, last_aths
+
+
+# get the number of bars in a year from the timestamps of the bars
+def get_periods_per_year(timestamps):
+    if len(timestamps) < 2:
+        return None
+    step = float(np.median(np.diff(timestamps)))
+    if step <= 0:
+        return None
+    return YEAR / step
+
+
+# compute risk metrics of an equity curve sampled at timestamps, risk_free is a yearly rate in %
+def get_risk_metrics(equity, timestamps, risk_free=0.0, periods_per_year=None):
+    metrics = {"max_drawdown": 0.0, "max_drawdown_timestamp": None, "max_drawdown_duration": 0,
+               "max_drawdown_duration_bars": 0, "annual_return": None, "volatility": None, "sharpe": None,
+               "sortino": None, "calmar": None}
+    equity = np.asarray(equity, dtype=np.float64)
+    timestamps = np.asarray(timestamps)
+    if len(equity) < 2:
+        return metrics
+
+    # --- Drawdown ---
+    drawdowns, last_aths = make_drawdowns(equity)
+    worst = int(np.argmin(drawdowns))
+    metrics["max_drawdown"] = float(drawdowns[worst])
+    metrics["max_drawdown_timestamp"] = int(timestamps[worst])
+    # Longest time spent under a previous ATH
+    durations = timestamps - timestamps[last_aths]
+    metrics["max_drawdown_duration"] = int(durations.max())
+    metrics["max_drawdown_duration_bars"] = int((np.arange(len(equity)) - last_aths).max())
+
+    # --- Returns ---
+    if periods_per_year is None:
+        periods_per_year = get_periods_per_year(timestamps)
+    if periods_per_year is None or equity[0] <= 0:
+        return metrics
+    returns = equity[1:] / equity[:-1] - 1
+    excess = returns - risk_free / 100 / periods_per_year
+    scale = np.sqrt(periods_per_year)
+
+    years = len(returns) / periods_per_year
+    metrics["annual_return"] = float(100 * ((equity[-1] / equity[0]) ** (1 / years) - 1))
+    deviation = returns.std(ddof=1) if len(returns) > 1 else 0.0
+    metrics["volatility"] = float(100 * deviation * scale)
+    if deviation > 0:
+        metrics["sharpe"] = float(excess.mean() / deviation * scale)
+    # Only the returns under the risk free rate count as risk
+    downside = np.sqrt(np.mean(np.minimum(excess, 0) ** 2))
+    if downside > 0:
+        metrics["sortino"] = float(excess.mean() / downside * scale)
+    if metrics["max_drawdown"] < 0:
+        metrics["calmar"] = metrics["annual_return"] / -metrics["max_drawdown"]
+    return metrics
@@ -0,0 +1,113 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from OpenBacktest.ObtUtility import Colors
+
+# maximum number of values of a batch of simulations, a batch is one (simulations, trades) array
+BATCH_VALUES = 4000000
+
+# Resampling methods
+# shuffle: the trades are kept and their order is drawn again
+# bootstrap: trades are drawn with replacement
+METHODS = ("shuffle", "bootstrap")
+
+
+# simulate a batch of equity curves from trades profits in percent, return the final equity, the worst drawdown in %
+# and the lowest equity of each simulation
+def simulate_batch(trades_percent_profit, simulations, method, seed, initial=1.0):
+    rng = np.random.default_rng(seed)
+    returns = np.asarray(trades_percent_profit, dtype=np.float64)
+    if method == "shuffle":
+        samples = rng.permuted(np.broadcast_to(returns, (simulations, len(returns))), axis=1)
+    else:
+        samples = returns[rng.integers(0, len(returns), (simulations, len(returns)))]
+
+    # Each trade is made with the whole equity, arrays are updated in place to limit allocations
+    equity = np.multiply(samples, 0.01, out=samples)
+    equity += 1
+    np.cumprod(equity, axis=1, out=equity)
+    equity *= initial
+    # The initial equity is the first ATH
+    aths = np.maximum.accumulate(equity, axis=1)
+    np.maximum(aths, initial, out=aths)
+    ratios = np.divide(equity, aths, out=aths)
+    drawdowns = np.minimum(100 * (ratios.min(axis=1) - 1), 0)
+    return equity[:, -1].copy(), drawdowns, np.minimum(equity.min(axis=1), initial)
+
+
+# resample trades many times and get the distribution of their final equity, drawdown and risk of ruin
+# ruin is the loss of capital in % considered as a ruin, batches of simulations are spread over workers processes
+# with workers > 1, a seed gives the same result whatever the number of workers
+def monte_carlo(trades_percent_profit, simulations=10000, method="shuffle", initial=1.0, ruin=50, seed=None,
+                workers=1):
+    if method not in METHODS:
+        print(Colors.RED + "Error, unknown resampling method", method, "use one of", METHODS)
+        return None
+    returns = np.asarray(trades_percent_profit, dtype=np.float64)
+    if len(returns) == 0:
+        print(Colors.YELLOW + "No trades found, simulation canceled")
+        return None
+
+    # Batches are cut independently of the workers so each one always get the same seed
+    size = max(1, min(simulations, BATCH_VALUES // len(returns)))
+    batches = [min(size, simulations - start) for start in range(0, simulations, size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(batches)))
+    arguments = ([returns] * len(batches), batches, [method] * len(batches), seeds, [initial] * len(batches))
+    if workers == 1:
+        results = list(map(simulate_batch, *arguments))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(simulate_batch, *arguments))
+
+    final_equity, drawdowns, lowest = (np.concatenate(values) for values in zip(*results))
+    return MonteCarloResult(final_equity, drawdowns, lowest, initial, ruin, method)
+
+
+# ------------------------------------------------------------------------------------------------
+# This class hold the simulations of a Monte Carlo analysis and summarize them
+# ------------------------------------------------------------------------------------------------
+class MonteCarloResult:
+    def __init__(self, final_equity, drawdowns, lowest, initial, ruin, method):
+        # final equity, worst drawdown in % and lowest equity of each simulation
+        self.final_equity = final_equity
+        self.drawdowns = drawdowns
+        self.lowest = lowest
+        self.initial = initial
+        # loss of capital in % considered as a ruin
+        self.ruin = ruin
+        self.method = method
+
+    # get the summary values of the simulations, percentiles are given for the final equity and the drawdown
+    def get_metrics(self, percentiles=(5, 25, 50, 75, 95)):
+        metrics = {"simulations": len(self.final_equity),
+                   "method": self.method,
+                   "mean_final_equity": float(self.final_equity.mean()),
+                   "mean_drawdown": float(self.drawdowns.mean()),
+                   "probability_of_loss": float(100 * (self.final_equity < self.initial).mean()),
+                   "risk_of_ruin": float(100 * (self.lowest <= self.initial * (1 - self.ruin / 100)).mean())}
+        final_equity = np.percentile(self.final_equity, percentiles)
+        drawdowns = np.percentile(self.drawdowns, percentiles)
+        for percentile, equity, drawdown in zip(percentiles, final_equity, drawdowns):
+            metrics["final_equity_" + str(percentile)] = float(equity)
+            metrics["drawdown_" + str(percentile)] = float(drawdown)
+        return metrics
+
+    # Summarize the simulations
+    def display(self, percentiles=(5, 25, 50, 75, 95)):
+        metrics = self.get_metrics(percentiles)
+        print(Colors.PURPLE + "----------------------------------------------------")
+        print("Monte Carlo:", metrics["simulations"], "simulations", "(" + self.method + ")")
+        print("----------------------------------------------------")
+        print(Colors.LIGHT_BLUE, "Mean final equity:", round(metrics["mean_final_equity"], 3), "/ initial",
+              self.initial)
+        for percentile in percentiles:
+            print(Colors.BLUE, "Percentile " + str(percentile) + "%: final equity",
+                  round(metrics["final_equity_" + str(percentile)], 3), "/ drawdown",
+                  str(round(metrics["drawdown_" + str(percentile)], 2)) + "%")
+        print(Colors.LIGHT_RED, "Probability of loss:", str(round(metrics["probability_of_loss"], 2)) + "%")
+        print(Colors.LIGHT_RED, "Risk of ruin (" + str(self.ruin) + "% loss):",
+              str(round(metrics["risk_of_ruin"], 2)) + "%")
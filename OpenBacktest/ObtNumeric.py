@@ -0,0 +1,204 @@
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_EVEN
+
+# ------------------------------------------------------------------------------------------------
+# Numeric backends of the wallets, a backend holds the arithmetic of the orders: balances, prices and fees are
+# values of the backend converted from and to floats at the edges, the ledger always stores floats
+# coin(), token() and price() convert a float to a value, coin_float(), token_float() and price_float() convert back
+# ------------------------------------------------------------------------------------------------
+
+
+# make a decimal from a float with its shortest representation, 0.1 gives Decimal("0.1"), strings are read as is
+def to_decimal(value):
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, (int, str)):
+        return Decimal(value)
+    return Decimal(repr(float(value)))
+
+
+# ------------------------------------------------------------------------------------------------
+# This backend use float64, the fastest one, results can be computed on whole arrays with the same operations
+# ------------------------------------------------------------------------------------------------
+class FloatBackend:
+    name = "float"
+
+    def coin(self, value):
+        return float(value)
+
+    def token(self, value):
+        return float(value)
+
+    def price(self, value):
+        return float(value)
+
+    def coin_float(self, value):
+        return value
+
+    def token_float(self, value):
+        return value
+
+    def price_float(self, value):
+        return value
+
+    # fees of the taker in percent to the rate applied to amounts
+    def rate(self, taker):
+        return taker / 100
+
+    # percent of a value, in the unit of the value, 100% is the whole value so a full order empties the balance
+    def part(self, value, percent):
+        if percent == 100:
+            return value
+        return value * (percent / 100)
+
+    # fees of an amount, in the unit of the amount
+    def fees(self, value, rate):
+        return value * rate
+
+    # tokens bought with an amount of coin at a price
+    def to_token(self, coin, price):
+        return coin / price
+
+    # coins got from an amount of token at a price
+    def to_coin(self, token, price):
+        return token * price
+
+    # part of a value in % of a whole as a float
+    def ratio(self, part, whole):
+        return 100 * part / whole
+
+    # divide two floats, None when dividing by 0
+    def divide(self, a, b):
+        if b == 0:
+            return None
+        return a / b
+
+
+# ------------------------------------------------------------------------------------------------
+# This backend use exact decimals, floats are read from their shortest representation
+# ------------------------------------------------------------------------------------------------
+class DecimalBackend:
+    name = "decimal"
+
+    def coin(self, value):
+        return to_decimal(value)
+
+    def token(self, value):
+        return to_decimal(value)
+
+    def price(self, value):
+        return to_decimal(value)
+
+    def coin_float(self, value):
+        return float(value)
+
+    def token_float(self, value):
+        return float(value)
+
+    def price_float(self, value):
+        return float(value)
+
+    def rate(self, taker):
+        return to_decimal(taker) / 100
+
+    def part(self, value, percent):
+        if percent == 100:
+            return value
+        return value * (to_decimal(percent) / 100)
+
+    def fees(self, value, rate):
+        return value * rate
+
+    def to_token(self, coin, price):
+        return coin / price
+
+    def to_coin(self, token, price):
+        return token * price
+
+    def ratio(self, part, whole):
+        return float(100 * to_decimal(part) / to_decimal(whole))
+
+    def divide(self, a, b):
+        if b == 0:
+            return None
+        return float(to_decimal(a) / to_decimal(b))
+
+
+# ------------------------------------------------------------------------------------------------
+# This backend use integers counted in exchange units like the exchange does: prices in ticks, tokens in steps and
+# coins in coin steps, bought quantities and coins received are rounded down, fees are rounded up
+# tick_size, step_size and coin_step are the filters of the symbol, "0.01", "0.00001", "0.00000001" for BTCUSDT
+# ------------------------------------------------------------------------------------------------
+class FixedPointBackend:
+    name = "fixed"
+
+    def __init__(self, tick_size, step_size, coin_step="0.00000001"):
+        self.tick_size = to_decimal(tick_size)
+        self.step_size = to_decimal(step_size)
+        self.coin_step = to_decimal(coin_step)
+        if self.tick_size <= 0 or self.step_size <= 0 or self.coin_step <= 0:
+            raise ValueError("tick_size, step_size and coin_step must be positive")
+
+    # convert a decimal to a number of units
+    @staticmethod
+    def to_units(value, unit, rounding=ROUND_FLOOR):
+        return int((value / unit).to_integral_value(rounding))
+
+    def coin(self, value):
+        return self.to_units(to_decimal(value), self.coin_step)
+
+    def token(self, value):
+        return self.to_units(to_decimal(value), self.step_size)
+
+    # prices read in the bars are already on ticks, they are rounded to the closest one
+    def price(self, value):
+        return self.to_units(to_decimal(value), self.tick_size, ROUND_HALF_EVEN)
+
+    def coin_float(self, value):
+        return float(value * self.coin_step)
+
+    def token_float(self, value):
+        return float(value * self.step_size)
+
+    def price_float(self, value):
+        return float(value * self.tick_size)
+
+    def rate(self, taker):
+        return to_decimal(taker) / 100
+
+    def part(self, value, percent):
+        if percent == 100:
+            return value
+        return self.to_units(value * (to_decimal(percent) / 100), 1)
+
+    def fees(self, value, rate):
+        return self.to_units(value * rate, 1, ROUND_CEILING)
+
+    def to_token(self, coin, price):
+        return self.to_units(coin * self.coin_step / (price * self.tick_size), self.step_size)
+
+    def to_coin(self, token, price):
+        return self.to_units(token * self.step_size * price * self.tick_size, self.coin_step)
+
+    def ratio(self, part, whole):
+        return float(Decimal(100 * part) / Decimal(whole))
+
+    def divide(self, a, b):
+        if b == 0:
+            return None
+        return float(to_decimal(a) / to_decimal(b))
+
+
+# backends made from their name
+BACKENDS = {"float": FloatBackend, "decimal": DecimalBackend}
+
+
+# get a backend from a backend, its name or None for the float backend, the fixed point backend needs the filters of
+# the symbol so it's given as an instance
+def get_backend(backend=None):
+    if backend is None:
+        return FloatBackend()
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            raise ValueError("unknown numeric backend " + backend)
+        return BACKENDS[backend]()
+    return backend
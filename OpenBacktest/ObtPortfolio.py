@@ -0,0 +1,459 @@
+import numpy as np
+import pandas as pd
+from OpenBacktest.ObtMetrics import get_risk_metrics
+from OpenBacktest.ObtNumeric import get_backend
+from OpenBacktest.ObtStops import Stops
+from OpenBacktest.ObtUtility import BarView, Colors, get_close_times, parse_timestamp
+from OpenBacktest.ObtWallet import BUY, SELL, Ledger, display_risk
+
+
+# ------------------------------------------------------------------------------------------------
+# This class store the orders of a portfolio, each row is an order on one pair
+# ------------------------------------------------------------------------------------------------
+class PortfolioLedger(Ledger):
+    # name and type of each column
+    columns = {"coin_balance": np.float64, "token_balance": np.float64, "total_fees": np.float64,
+               "order_type": np.int8, "pair": np.int32, "index": np.int64, "step": np.int64,
+               "timestamp": np.int64, "price": np.float64, "size": np.float64, "equivalence": np.float64}
+
+    # add a row to the ledger
+    def append(self, coin_balance, token_balance, total_fees, order_type, pair, index, step, timestamp, price, size,
+               equivalence):
+        if self.length == self.capacity:
+            self.grow()
+        row = self.length
+        arrays = self.arrays
+        arrays["coin_balance"][row] = coin_balance
+        arrays["token_balance"][row] = token_balance
+        arrays["total_fees"][row] = total_fees
+        arrays["order_type"][row] = order_type
+        arrays["pair"][row] = pair
+        arrays["index"][row] = index
+        arrays["step"][row] = step
+        arrays["timestamp"][row] = timestamp
+        arrays["price"][row] = price
+        arrays["size"][row] = size
+        arrays["equivalence"][row] = equivalence
+        self.length += 1
+
+    # build a dataframe of the ledger with the name of the pairs
+    def make_dataframe(self, names=None):
+        data = {name: self.get(name).copy() for name in self.columns}
+        data["order_type"] = np.where(data["order_type"] == BUY, "BUY", "SELL").astype(object)
+        if names is not None:
+            data["pair"] = np.array(names, dtype=object)[data["pair"]]
+        return pd.DataFrame(data)
+
+
+# ------------------------------------------------------------------------------------------------
+# This class represent a wallet with one coin balance shared by the token positions of many pairs
+# backend is the numeric backend of the orders, a FixedPointBackend applies the same filters to all pairs
+# ------------------------------------------------------------------------------------------------
+class PortfolioWallet:
+    def __init__(self, coin_name, coin_balance, taker, pairs, backend=None):
+        # name of the coin
+        self.coin_name = coin_name
+        # Arithmetic of the orders
+        self.backend = get_backend(backend)
+        # Maker fees
+        self.taker = self.backend.rate(taker)
+        # initial coin balance, current coin balance and fees as values of the backend
+        self.coin_balance = coin_balance
+        self.coin_value = self.backend.coin(coin_balance)
+        self.fees_value = self.backend.coin(0)
+
+        # pairs by name, their arrays and close times
+        self.names = list(pairs)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.bars = {name: BarView(pair.dataframe) for name, pair in pairs.items()}
+        self.close_times = {name: get_close_times(pair.dataframe, pair.timeframe) for name, pair in pairs.items()}
+        # token balance of each pair as values of the backend
+        self.positions = {name: self.backend.token(0) for name in self.names}
+
+        # current step of the timeline and its time, set by the engine with the index of the last closed bar of each
+        # pair that closed a bar, when all pairs close their bars at the same times the index is the step
+        self.step = 0
+        self.time = None
+        self.last_indexes = {}
+        self.aligned = False
+
+        self.ledger = PortfolioLedger()
+        self.frame = None
+
+    # get the orders as a dataframe
+    @property
+    def wallet_frame(self):
+        if self.frame is None:
+            self.frame = self.ledger.make_dataframe(self.names)
+        return self.frame
+
+    # get the index of the last bar of a pair closed at the current time, -1 if there's none
+    def get_last_index(self, name):
+        if self.aligned:
+            return self.step
+        index = self.last_indexes.get(name)
+        if index is None:
+            return self.get_index(name, self.time)
+        return index
+
+    # get the index of the last bar of a pair closed at a time, -1 if there's none
+    def get_index(self, name, time):
+        return int(np.searchsorted(self.close_times[name], time, side="right")) - 1
+
+    # current coin balance and fees as floats
+    @property
+    def current_coin_balance(self):
+        return self.backend.coin_float(self.coin_value)
+
+    @property
+    def total_fees(self):
+        return self.backend.coin_float(self.fees_value)
+
+    # get the value of the coin and of all the positions at the current time
+    def get_equivalence(self):
+        equivalence = self.current_coin_balance
+        for name, token_balance in self.positions.items():
+            if token_balance > 0:
+                index = self.get_last_index(name)
+                if index >= 0:
+                    equivalence += self.backend.token_float(token_balance) * self.bars[name]["close"][index]
+        return equivalence
+
+    def buy(self, name, index, amount=None, percent_amount=None, price=None):
+        backend = self.backend
+        coin_balance = self.coin_value
+        token_balance = self.positions[name]
+
+        if amount is None:
+            if percent_amount is None:
+                amount = coin_balance
+            else:
+                amount = backend.part(coin_balance, percent_amount)
+        else:
+            amount = backend.coin(amount)
+            if amount > coin_balance:
+                amount = coin_balance
+
+        if amount == 0:
+            return
+
+        if price is None:
+            price = self.bars[name]["close"][index]
+        price = backend.price(price)
+        fees = backend.fees(amount, self.taker)
+        size = backend.ratio(amount, coin_balance)
+
+        # Updating wallet
+        self.coin_value = coin_balance - amount
+        self.positions[name] = token_balance + backend.to_token(amount - fees, price)
+        self.fees_value += fees
+        self.append_order(BUY, name, index, price, size)
+
+    def sell(self, name, index, amount=None, percent_amount=None, price=None):
+        backend = self.backend
+        coin_balance = self.coin_value
+        token_balance = self.positions[name]
+
+        if amount is None:
+            if percent_amount is None:
+                amount = token_balance
+            else:
+                amount = backend.part(token_balance, percent_amount)
+        else:
+            amount = backend.token(amount)
+            if amount > token_balance:
+                amount = token_balance
+
+        if amount == 0:
+            return
+
+        if price is None:
+            price = self.bars[name]["close"][index]
+        price = backend.price(price)
+        fees = backend.fees(amount, self.taker)
+        size = backend.ratio(amount, token_balance)
+
+        # Updating wallet
+        self.coin_value = coin_balance + backend.to_coin(amount - fees, price)
+        self.positions[name] = token_balance - amount
+        self.fees_value += backend.fees(backend.to_coin(amount, price), self.taker)
+        self.append_order(SELL, name, index, price, size)
+
+    # store an order in the ledger with the balances after it
+    def append_order(self, order_type, name, index, price, size):
+        backend = self.backend
+        self.ledger.append(self.current_coin_balance, backend.token_float(self.positions[name]), self.total_fees,
+                           order_type, self.ids[name], index, self.step, self.bars[name]["timestamp"][index],
+                           backend.price_float(price), size, self.get_equivalence())
+        self.frame = None
+
+
+# ------------------------------------------------------------------------------------------------
+# This class run a strategy over all the pairs of a container with a shared wallet, bars of all pairs are merged
+# in one timeline ordered by close time and the strategy is called once for all the bars closing at the same time
+# each pair has its own take profit, stop loss and trailing stop, like the stops of Engine
+# ------------------------------------------------------------------------------------------------
+class PortfolioEngine:
+    def __init__(self, container, output=True, load=True, sync=False):
+        if output:
+            print(Colors.PURPLE + "Initialising Portfolio Engine")
+
+        # Console output
+        self.output = output
+
+        # Container, load=False is used when the pairs are already loaded
+        self.container = container
+        if load:
+            self.container.load_all(output=output, sync=sync)
+
+        # Used to run a backtest
+        self.strategy = None
+        self.wallet = None
+
+        # close times of the merged timeline and the equity of the wallet at each of them
+        self.timeline = None
+        self.equity = None
+
+        # stops of each pair, the step of the timeline where the stops of a pair are hit and the first of these steps
+        self.stops = {}
+        self.hit_steps = {}
+        self.next_hit = None
+
+    # the strategy is called at each time of the timeline with the bars of all pairs as a dict of name: bars and the
+    # pairs closing a bar at this time as a dict of name: index of the bar, it returns None, a Report or a list of
+    # Reports, the pair of a report can be omitted when only one pair closed a bar
+    # def strategy(bars, closed): for name, index in closed.items(): ...
+    def register_strategy(self, strategy):
+        self.strategy = strategy
+
+    # merge the bars of all pairs, return the timeline and a function giving the pairs closing a bar at a step of the
+    # timeline as a dict of name: index
+    def make_timeline(self):
+        names = self.wallet.names
+        close_times = [self.wallet.close_times[name] for name in names]
+        self.wallet.aligned = all(np.array_equal(times, close_times[0]) for times in close_times[1:])
+        if self.wallet.aligned:
+            # All pairs close their bars at the same times, the bar index is the step
+            return close_times[0], lambda step: dict.fromkeys(names, step)
+
+        pairs = np.concatenate([np.full(len(times), i, dtype=np.int32) for i, times in enumerate(close_times)])
+        indexes = np.concatenate([np.arange(len(times)) for times in close_times])
+        # A stable sort keeps the order of the pairs for bars closing at the same time
+        times = np.concatenate(close_times)
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        new = np.empty(len(times), dtype=bool)
+        new[:1] = True
+        np.not_equal(times[1:], times[:-1], out=new[1:])
+
+        # Bars closed at each step, from bounds[step] to bounds[step + 1]
+        bounds = np.append(np.flatnonzero(new), len(times)).tolist()
+        closed_names = np.array(names, dtype=object)[pairs[order]].tolist()
+        closed_indexes = indexes[order].tolist()
+
+        def get_closed(step):
+            first = bounds[step]
+            last = bounds[step + 1]
+            return dict(zip(closed_names[first:last], closed_indexes[first:last]))
+        return times[new], get_closed
+
+    # run the strategy over the merged timeline
+    # backend is the numeric backend of the wallet, see ObtNumeric
+    def run_strategy(self, coin_name, coin_balance, taker, finish=True, backend=None):
+        # condition not None test
+        if self.strategy is None:
+            print(Colors.RED + "Error, you can't run a backtest because you don't have a strategy function registered")
+            return
+
+        # Wallet initialisation
+        self.wallet = PortfolioWallet(coin_name, coin_balance, taker, self.container.pairs, backend)
+        names = self.wallet.names
+        self.timeline, get_closed = self.make_timeline()
+        timeline = self.timeline.tolist()
+        self.stops = {name: Stops() for name in names}
+        self.hit_steps = {}
+        self.next_hit = len(timeline)
+
+        # Main loop, one iteration per time of the timeline
+        strategy = self.strategy
+        bars = self.wallet.bars
+        wallet = self.wallet
+        aligned = wallet.aligned
+        last_indexes = wallet.last_indexes
+        for step in range(len(timeline)):
+            wallet.step = step
+            wallet.time = timeline[step]
+            closed = get_closed(step)
+            if not aligned:
+                last_indexes.update(closed)
+
+            # stops are hit during the bars, before the strategy is called at their close
+            if step >= self.next_hit:
+                self.update_stops(step)
+
+            report = strategy(bars, closed)
+            if report is not None:
+                if isinstance(report, list):
+                    for sub_report in report:
+                        self.pass_order(sub_report, closed)
+                else:
+                    self.pass_order(report, closed)
+
+        # Sell all remaining tokens
+        if finish:
+            for name in names:
+                if wallet.positions[name] > 0:
+                    wallet.sell(name, wallet.get_last_index(name))
+
+        self.equity = self.make_equity()
+
+    # send the order of a report to the wallet, an order on a pair that didn't close a bar fills at its last closed
+    # bar, a sell removes the stops of the pair
+    def pass_order(self, report, closed):
+        name = report.pair
+        if name is None:
+            if len(closed) != 1:
+                print(Colors.RED + "Error, the pair of a report must be given when many pairs close a bar at once")
+                return
+            name = next(iter(closed))
+        index = closed.get(name)
+        if index is None:
+            index = self.wallet.get_last_index(name)
+            if index < 0:
+                return
+        if report.order == "buy":
+            self.wallet.buy(name, index, report.amount, report.percent_amount)
+        elif report.order == "sell":
+            self.wallet.sell(name, index, report.amount, report.percent_amount)
+            self.clear_stops(name)
+
+    # sell the positions whose stops are hit at the step, their stops are then removed
+    def update_stops(self, step):
+        for name, hit_step in list(self.hit_steps.items()):
+            if hit_step <= step:
+                stops = self.stops[name]
+                if self.wallet.positions[name] > 0:
+                    self.wallet.sell(name, stops.hit_index, price=stops.hit_price)
+                self.clear_stops(name)
+
+    # search the bar hitting the stops of a pair and the step of the timeline where it closes
+    def find_hit(self, name):
+        stops = self.stops[name]
+        stops.find_hit(self.wallet.bars[name])
+        if stops.hit_index is None:
+            self.hit_steps.pop(name, None)
+        else:
+            close_time = self.wallet.close_times[name][stops.hit_index]
+            self.hit_steps[name] = int(np.searchsorted(self.timeline, close_time))
+        self.next_hit = min(self.hit_steps.values(), default=len(self.timeline))
+
+    # set the stops of a pair, percent targets are relative to the close of the bar index of the pair, stops are
+    # active from the next bar of the pair and hit when its high or its low reach them
+    def set_take_profit(self, name, index, target=None, percent_target=None):
+        self.set_target(name, index, "take_profit", target, percent_target)
+
+    def set_stop_loss(self, name, index, target=None, percent_target=None):
+        self.set_target(name, index, "stop_loss", target, percent_target)
+
+    def set_target(self, name, index, kind, target, percent_target):
+        bars = self.wallet.bars[name]
+        if target is None:
+            if percent_target is None:
+                print(Colors.RED + "Error, we can't register your " + kind.replace("_", " ") + ", no target")
+                return
+            close = bars["close"][index]
+            target = close + close * self.wallet.backend.divide(percent_target, 100)
+        self.stops[name].move_peak(bars, index)
+        setattr(self.stops[name], kind, target)
+        self.find_hit(name)
+
+    # set a stop following the highest price of a pair since its bar index, distance is in coin and percent_distance
+    # in percent of the highest price
+    def set_trailing_stop(self, name, index, distance=None, percent_distance=None):
+        if distance is None and percent_distance is None:
+            print(Colors.RED + "Error, we can't register your trailing stop, no distance")
+            return
+        bars = self.wallet.bars[name]
+        self.stops[name].set_trailing(bars, index, bars["close"][index], distance, percent_distance)
+        self.find_hit(name)
+
+    # remove the stops of a pair
+    def clear_stops(self, name):
+        self.stops[name].clear()
+        if self.hit_steps.pop(name, None) is not None:
+            self.next_hit = min(self.hit_steps.values(), default=len(self.timeline))
+
+    # compute the equity of the wallet at each step of the timeline from the orders and the close prices
+    def make_equity(self):
+        ledger = self.wallet.ledger
+        order_steps = ledger.get("step")
+        order_pairs = ledger.get("pair")
+        steps = np.arange(len(self.timeline))
+        if ledger.length == 0:
+            return np.full(len(steps), float(self.wallet.coin_balance))
+
+        # coin balance after the last order of each step
+        last = np.searchsorted(order_steps, steps, side="right") - 1
+        equity = np.where(last >= 0, ledger.get("coin_balance")[np.maximum(last, 0)], self.wallet.coin_balance)
+
+        for i, name in enumerate(self.wallet.names):
+            mask = order_pairs == i
+            if not mask.any():
+                continue
+            # token balance after the last order of the pair at each step
+            last = np.searchsorted(order_steps[mask], steps, side="right") - 1
+            tokens = np.where(last >= 0, ledger.get("token_balance")[mask][np.maximum(last, 0)], 0.0)
+            # close of the last closed bar of the pair at each step
+            indexes = np.searchsorted(self.wallet.close_times[name], self.timeline, side="right") - 1
+            prices = np.where(indexes >= 0, self.wallet.bars[name]["close"][np.maximum(indexes, 0)], 0.0)
+            equity = equity + tokens * prices
+        return equity
+
+    # get the summary values of the run
+    def get_metrics(self):
+        if self.equity is None or len(self.equity) == 0:
+            print(Colors.RED + "Error, no metrics found, run a strategy before getting them")
+            return None
+        equity = self.equity
+        order_pairs = self.wallet.ledger.get("pair")
+        metrics = {"final_equity": float(equity[-1]),
+                   "profit": float(equity[-1] - self.wallet.coin_balance),
+                   "percent_profit": self.wallet.backend.divide(100 * (float(equity[-1]) - self.wallet.coin_balance),
+                                                                self.wallet.coin_balance),
+                   "total_orders": int(self.wallet.ledger.length),
+                   "total_fees": float(self.wallet.total_fees),
+                   "orders_per_pair": {name: int((order_pairs == i).sum())
+                                       for i, name in enumerate(self.wallet.names)}}
+        metrics.update(get_risk_metrics(equity, self.timeline))
+        return metrics
+
+    # Summarize the portfolio evolution
+    def display_portfolio(self):
+        if self.equity is None or len(self.equity) == 0:
+            print(Colors.YELLOW, "This portfolio didn't run")
+            return
+        metrics = self.get_metrics()
+
+        print(Colors.PURPLE + "----------------------------------------------------")
+        print("Data from", parse_timestamp(int(self.timeline[0])), "to", parse_timestamp(int(self.timeline[-1])))
+        print("Pairs:", ", ".join(self.wallet.names))
+        print("----------------------------------------------------")
+
+        print(Colors.YELLOW + "[-Portfolio-]")
+        print(Colors.LIGHT_BLUE, "Initial", self.wallet.coin_name, round(float(self.wallet.coin_balance), 3))
+        print(Colors.LIGHT_BLUE, "Final equity", self.wallet.coin_name, round(metrics["final_equity"], 3))
+        if metrics["profit"] < 0:
+            color = Colors.RED
+        elif metrics["profit"] > 0:
+            color = Colors.GREEN
+        else:
+            color = Colors.CYAN
+        print(color, "Portfolio profit: ", round(metrics["profit"], 2), "/",
+              str(round(metrics["percent_profit"], 2)) + "%")
+        print(Colors.LIGHT_RED, "Fees: ", round(metrics["total_fees"], 3), self.wallet.coin_name)
+        display_risk(metrics)
+
+        print(Colors.YELLOW + "[-Orders-]")
+        print(Colors.BLUE, "Total orders:", metrics["total_orders"])
+        for name, orders in metrics["orders_per_pair"].items():
+            print(Colors.BLUE, name + ":", orders)
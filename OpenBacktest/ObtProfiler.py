@@ -0,0 +1,128 @@
+import time
+import numpy as np
+from OpenBacktest.ObtUtility import Colors, parse_timestamp
+
+# Phases of a bar of Engine.run_bars in their order
+BAR_PHASES = ("progress", "stops", "strategy", "orders")
+
+# edges of the latency histograms in microseconds, from 100ns to 1s
+HISTOGRAM_EDGES = np.geomspace(0.1, 1000000, 15)
+
+
+# ------------------------------------------------------------------------------------------------
+# This class record the time spent in each phase of a run, bar phases are recorded as clock stamps taken between
+# phases and turned into durations only when the report is made, phases made once per run are recorded as totals
+# stamps are kept in a preallocated int64 array grown by doubling, reserve() allocates a whole run at once
+# ------------------------------------------------------------------------------------------------
+class Profiler:
+    def __init__(self, phases=BAR_PHASES, capacity=1024):
+        self.phases = phases
+        # clock stamps in ns, a row of len(phases) + 1 stamps per bar, only the first length rows are recorded
+        self.stamps = np.empty((capacity, len(phases) + 1), dtype=np.int64)
+        # index of each recorded bar
+        self.indexes = np.empty(capacity, dtype=np.int64)
+        self.length = 0
+        # name: ns of the phases made once per run
+        self.totals = {}
+        # start and end of the run
+        self.start = None
+        self.end = None
+
+    def start_run(self):
+        self.start = time.perf_counter_ns()
+
+    def stop_run(self):
+        self.end = time.perf_counter_ns()
+
+    # make room for count more bars
+    def reserve(self, count):
+        if self.length + count > len(self.stamps):
+            self.grow(self.length + count)
+
+    def grow(self, capacity):
+        stamps = np.empty((capacity, len(self.phases) + 1), dtype=np.int64)
+        stamps[:self.length] = self.stamps[:self.length]
+        indexes = np.empty(capacity, dtype=np.int64)
+        indexes[:self.length] = self.indexes[:self.length]
+        self.stamps = stamps
+        self.indexes = indexes
+
+    # record the clock stamps taken between the phases of a bar
+    def record(self, index, stamps):
+        if self.length == len(self.stamps):
+            self.grow(2 * len(self.stamps))
+        self.stamps[self.length] = stamps
+        self.indexes[self.length] = index
+        self.length += 1
+
+    # add the time of a phase made once
+    def add(self, phase, nanoseconds):
+        self.totals[phase] = self.totals.get(phase, 0) + nanoseconds
+
+    # get the duration of each phase of each bar in ns as a (bars, phases) array
+    def get_bar_times(self):
+        return np.diff(self.stamps[:self.length], axis=1)
+
+    # make the report of the run, timestamps are the timestamps of the bars, slowest is the number of slowest bars
+    # kept, times are in seconds for totals and in microseconds for bars
+    def get_report(self, timestamps=None, slowest=10):
+        times = self.get_bar_times()
+        wall = 0 if self.start is None or self.end is None else self.end - self.start
+        report = {"bars": len(times), "total": wall / 1e9, "phases": {}, "slowest_bars": []}
+
+        # Phases of the bars
+        for column, phase in enumerate(self.phases):
+            values = times[:, column] / 1000
+            if len(values) == 0:
+                continue
+            counts = np.histogram(np.clip(values, HISTOGRAM_EDGES[0], HISTOGRAM_EDGES[-1]), HISTOGRAM_EDGES)[0]
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            report["phases"][phase] = {"total": float(values.sum()) / 1e6, "mean": float(values.mean()),
+                                       "p50": float(p50), "p90": float(p90), "p99": float(p99),
+                                       "max": float(values.max()),
+                                       "histogram": {"edges": HISTOGRAM_EDGES.tolist(), "counts": counts.tolist()}}
+        # Phases made once
+        for phase, nanoseconds in self.totals.items():
+            report["phases"][phase] = {"total": nanoseconds / 1e9}
+
+        # Share of the run spent in each phase, the rest is the loop itself and the profiler
+        for values in report["phases"].values():
+            values["share"] = 100 * values["total"] / report["total"] if report["total"] else None
+
+        # Slowest bars
+        if len(times) > 0:
+            totals = times.sum(axis=1)
+            count = min(slowest, len(totals))
+            rows = np.argpartition(totals, -count)[-count:]
+            rows = rows[np.argsort(totals[rows])[::-1]]
+            for row in rows.tolist():
+                index = int(self.indexes[row])
+                bar = {"index": index, "total": float(totals[row]) / 1000}
+                if timestamps is not None:
+                    bar["timestamp"] = int(timestamps[index])
+                for column, phase in enumerate(self.phases):
+                    bar[phase] = float(times[row, column]) / 1000
+                report["slowest_bars"].append(bar)
+        return report
+
+    # Summarize the report
+    def display(self, timestamps=None, slowest=10):
+        report = self.get_report(timestamps, slowest)
+        print(Colors.PURPLE + "----------------------------------------------------")
+        print("Profile of", report["bars"], "bars in", round(report["total"], 4), "s")
+        print("----------------------------------------------------")
+        print(Colors.YELLOW + "[-Phases-]")
+        for phase, values in report["phases"].items():
+            share = "" if values["share"] is None else " / " + str(round(values["share"], 1)) + "%"
+            line = phase.ljust(10) + " " + str(round(values["total"], 4)) + "s" + share
+            if "mean" in values:
+                line += "  mean " + str(round(values["mean"], 2)) + "us  p99 " + str(round(values["p99"], 2)) + \
+                        "us  max " + str(round(values["max"], 2)) + "us"
+            print(Colors.LIGHT_BLUE, line)
+        if report["slowest_bars"]:
+            print(Colors.YELLOW + "[-Slowest bars-]")
+            for bar in report["slowest_bars"]:
+                date = "" if "timestamp" not in bar else " " + str(parse_timestamp(bar["timestamp"]))
+                phases = ", ".join(phase + " " + str(round(bar[phase], 1)) + "us" for phase in self.phases)
+                print(Colors.LIGHT_RED, "bar", str(bar["index"]) + date + ":", str(round(bar["total"], 1)) + "us",
+                      "(" + phases + ")")
@@ -0,0 +1,77 @@
+import copy
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from OpenBacktest.ObtUtility import Colors
+
+
+# ------------------------------------------------------------------------------------------------
+# This class publish the dataframes of a container once in shared memory, it is sent to worker processes instead
+# of the dataframes and each worker attach to the same memory as read only arrays
+# ------------------------------------------------------------------------------------------------
+class SharedMarketData:
+    def __init__(self, container, output=True):
+        # container without dataframes, filled when attaching
+        self.container = copy.copy(container)
+        self.container.pairs = {}
+        # pair name: list of (column, shared memory name, dtype, length)
+        self.columns = {}
+        # shared memories opened by this process
+        self.memories = []
+
+        for name, pair in container.pairs.items():
+            skeleton = copy.copy(pair)
+            skeleton.dataframe = None
+            skeleton.timestamps = None
+            skeleton.timestamps_index = None
+            self.container.pairs[name] = skeleton
+            if container.main is pair:
+                self.container.main = skeleton
+
+            self.columns[name] = []
+            for column in pair.dataframe.columns:
+                values = pair.dataframe[column].to_numpy()
+                # Only numbers can be shared
+                if values.dtype.kind not in "biuf":
+                    try:
+                        values = pd.to_numeric(pair.dataframe[column]).to_numpy()
+                    except (ValueError, TypeError):
+                        if output:
+                            print(Colors.YELLOW + "Column", column, "of", name, "isn't numeric and won't be shared")
+                        continue
+                memory = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+                np.ndarray(values.shape, dtype=values.dtype, buffer=memory.buf)[:] = values
+                self.memories.append(memory)
+                self.columns[name].append((column, memory.name, values.dtype.str, len(values)))
+
+    # shared memories are not sent with the class
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["memories"] = []
+        return state
+
+    # attach to the shared memory and get the container with read only dataframes
+    def attach(self):
+        for name, pair in self.container.pairs.items():
+            data = {}
+            for column, memory_name, dtype, length in self.columns[name]:
+                memory = shared_memory.SharedMemory(name=memory_name)
+                self.memories.append(memory)
+                values = np.ndarray((length,), dtype=np.dtype(dtype), buffer=memory.buf)
+                values.flags.writeable = False
+                data[column] = values
+            pair.set_dataframe(pd.DataFrame(data, copy=False))
+        return self.container
+
+    # close the shared memory in this process
+    def close(self):
+        for memory in self.memories:
+            memory.close()
+        self.memories = []
+
+    # close and free the shared memory, called once by the process that published the data
+    def unlink(self):
+        for memory in self.memories:
+            memory.close()
+            memory.unlink()
+        self.memories = []
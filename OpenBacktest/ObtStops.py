@@ -0,0 +1,123 @@
+import numpy as np
+
+# Kinds of stop
+TAKE_PROFIT = 1
+STOP_LOSS = 2
+TRAILING_STOP = 3
+
+# number of bars scanned at once when searching a hit, doubled after each block without hit so a close hit is found
+# without scanning the whole dataframe
+SCAN_BLOCK = 256
+
+
+# ------------------------------------------------------------------------------------------------
+# This class hold the take profit, stop loss and trailing stop of a position and the first bar hitting one of them,
+# the bar is searched once with array operations on high and low each time the stops change
+# ------------------------------------------------------------------------------------------------
+class Stops:
+    __slots__ = ("take_profit", "stop_loss", "trailing_distance", "trailing_percent", "peak", "index", "hit_index",
+                 "hit_price", "hit_kind")
+
+    def __init__(self):
+        self.clear()
+
+    # remove all stops
+    def clear(self):
+        # prices of the take profit and of the stop loss
+        self.take_profit = None
+        self.stop_loss = None
+        # distance of the trailing stop under the peak in coin or in percent of the peak
+        self.trailing_distance = None
+        self.trailing_percent = None
+        # highest price reached since the trailing stop was set, up to the bar index
+        self.peak = None
+        # bar of the last change, stops are active from the next bar
+        self.index = None
+        # first bar hitting a stop, the price it fills at and the kind of stop hit
+        self.hit_index = None
+        self.hit_price = None
+        self.hit_kind = None
+
+    # check if there's no stop
+    def is_empty(self):
+        return self.take_profit is None and self.stop_loss is None and self.trailing_distance is None and \
+            self.trailing_percent is None
+
+    # check if a trailing stop is set
+    def is_trailing(self):
+        return self.trailing_distance is not None or self.trailing_percent is not None
+
+    # set a trailing stop following the highest price from price at the bar index
+    def set_trailing(self, bars, index, price, distance=None, percent_distance=None):
+        self.move_peak(bars, index)
+        if not self.is_trailing() or self.peak is None:
+            self.peak = price
+        self.trailing_distance = distance
+        self.trailing_percent = percent_distance
+        self.index = index
+
+    # bring the peak of the trailing stop to the bar index
+    def move_peak(self, bars, index):
+        if self.peak is not None and self.index is not None and index > self.index:
+            self.peak = max(self.peak, float(bars["high"][self.index + 1:index + 1].max()))
+        self.index = index
+
+    # get the trailing stop price of each bar from the peaks known before them
+    def get_trailing_prices(self, peaks):
+        if self.trailing_percent is not None:
+            return peaks * (1 - self.trailing_percent / 100)
+        return peaks - self.trailing_distance
+
+    # search the first bar hitting a stop after the bar of the last change, hit_index is None without hit
+    def find_hit(self, bars):
+        self.hit_index = None
+        self.hit_price = None
+        self.hit_kind = None
+        if self.is_empty():
+            return None
+
+        high = bars["high"]
+        low = bars["low"]
+        length = len(high)
+        start = self.index + 1
+        peak = self.peak
+        block = SCAN_BLOCK
+        while start < length:
+            end = min(start + block, length)
+            highs = high[start:end]
+            lows = low[start:end]
+
+            # Stop price of each bar
+            stops = np.full(end - start, -np.inf if self.stop_loss is None else self.stop_loss)
+            if self.is_trailing():
+                # The high of a bar can come after its low, only previous highs move the stop of a bar
+                peaks = np.maximum.accumulate(np.concatenate(([peak], highs[:-1])))
+                stops = np.maximum(stops, self.get_trailing_prices(peaks))
+            stop_hits = lows <= stops
+            if self.take_profit is None:
+                hits = stop_hits
+            else:
+                hits = stop_hits | (highs >= self.take_profit)
+
+            found = np.flatnonzero(hits)
+            if len(found) > 0:
+                i = int(found[0])
+                self.hit_index = start + i
+                opening = bars["open"][self.hit_index]
+                # When both are hit in the same bar, the stop is assumed first, a gap fills at the open
+                if stop_hits[i]:
+                    self.hit_price = float(min(opening, stops[i]))
+                    if self.stop_loss is not None and stops[i] == self.stop_loss:
+                        self.hit_kind = STOP_LOSS
+                    else:
+                        self.hit_kind = TRAILING_STOP
+                else:
+                    self.hit_price = float(max(opening, self.take_profit))
+                    self.hit_kind = TAKE_PROFIT
+                return self.hit_index
+
+            if self.is_trailing():
+                peak = max(peak, float(highs.max()))
+            start = end
+            block *= 2
+        return None
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+from OpenBacktest.ObtIndicators import run_indicator
+
+# ------------------------------------------------------------------------------------------------
+# Generators used to stream a backtest over chunks of bars, each stage takes the chunks of the previous one
+# a chunk is (offset, first, dataframe): offset is the index of the first row of the dataframe in the whole history
+# and first the index of the first row the strategy is called for, rows before it are the warm up of the chunk
+# ------------------------------------------------------------------------------------------------
+
+
+# add the last warmup rows seen in front of each (start, dataframe) chunk, indicators computed on a chunk then have
+# the history they need and the strategy can look back warmup bars
+def with_warmup(chunks, warmup=0):
+    previous = None
+    for start, chunk in chunks:
+        if previous is not None and warmup > 0:
+            tail = previous.iloc[-warmup:]
+            dataframe = pd.concat([tail, chunk], ignore_index=True)
+            first = len(tail)
+        else:
+            dataframe = chunk.reset_index(drop=True)
+            first = 0
+        yield start - first, first, dataframe
+        previous = dataframe
+
+
+# add the columns of incremental indicators of ObtIndicators to each chunk, indicators is a dict of
+# column: (indicator, columns), an indicator giving a tuple of values fills the columns column_0, column_1...
+# indicators are only updated with the new rows of each chunk so their state is carried from chunk to chunk and they
+# give the values of a run on the whole history, the warm up rows keep their values of the previous chunk
+def with_indicators(chunks, indicators):
+    for offset, first, dataframe in chunks:
+        for column, (indicator, columns) in indicators.items():
+            values = run_indicator(indicator, *(dataframe[name].to_numpy()[first:] for name in columns))
+            outputs = [column + "_" + str(i) for i in range(len(values))] if isinstance(values, tuple) else [column]
+            for output, output_values in zip(outputs, values if isinstance(values, tuple) else (values,)):
+                array = np.full(len(dataframe), np.nan)
+                if first > 0:
+                    array[:first] = dataframe[output].to_numpy()[:first]
+                array[first:] = output_values
+                dataframe[output] = array
+        yield offset, first, dataframe
+
+
+# call prepare(dataframe) on each chunk to add its indicators, prepare can return a new dataframe or edit it in place
+def prepare_chunks(chunks, prepare):
+    for offset, first, dataframe in chunks:
+        result = prepare(dataframe)
+        yield offset, first, dataframe if result is None else result
+
+
+# cut a dataframe in (start, dataframe) chunks of chunk_size rows
+def iter_dataframe(dataframe, chunk_size):
+    for start in range(0, len(dataframe), chunk_size):
+        yield start, dataframe.iloc[start:start + chunk_size]
+
+
+# read a csv file in (start, dataframe) chunks of chunk_size rows
+def iter_csv(path, chunk_size, columns=None):
+    start = 0
+    for chunk in pd.read_csv(path, chunksize=chunk_size, usecols=columns):
+        yield start, chunk
+        start += len(chunk)
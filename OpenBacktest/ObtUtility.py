@@ -1,6 +1,8 @@
 from decimal import Decimal
 from binance.client import Client
+from binance.helpers import interval_to_milliseconds
 from datetime import datetime
+import numpy as np
 import pandas as pd
 
 
@@ -44,6 +46,89 @@ timeframes = {
 }
 
 
+# Define a column of a BarView, a numpy array so column[index] is a plain array index, attributes of pandas Series
+# missing from numpy arrays ( iloc, loc, shift, rolling... ) are forwarded to the Series of the column so
+# strategies written for dataframes keep working, arrays computed from the column forward them to a new Series
+class BarColumn(np.ndarray):
+    series = None
+
+    def __getattr__(self, name):
+        # numpy and pandas look for private attributes to know what an object is
+        if name.startswith("_"):
+            raise AttributeError(name)
+        series = self.__dict__.get("series")
+        if series is None:
+            series = pd.Series(np.asarray(self))
+        return getattr(series, name)
+
+
+# Define a lightweight view of a dataframe, each column is pulled once as a BarColumn so view["close"][index]
+# is a plain array index, other keys and attributes are forwarded to the dataframe
+class BarView:
+    def __init__(self, dataframe):
+        self.dataframe = dataframe
+        self.arrays = {}
+
+    def __getitem__(self, column):
+        try:
+            return self.arrays[column]
+        except KeyError:
+            series = self.dataframe[column]
+        except TypeError:
+            # Lists of columns and masks
+            return self.dataframe[column]
+        if not isinstance(series, pd.Series):
+            # Slices of rows
+            return series
+        array = series.to_numpy().view(BarColumn)
+        array.series = series
+        self.arrays[column] = array
+        return array
+
+    def __getattr__(self, name):
+        if name == "dataframe":
+            raise AttributeError(name)
+        return getattr(self.dataframe, name)
+
+    def __contains__(self, column):
+        return column in self.dataframe.columns
+
+    def __len__(self):
+        return len(self.dataframe)
+
+
+# Define a view of an alt dataframe aligned on the rows of the main dataframe, view["close"][index] is the close of
+# the last alt bar closed at the main bar index, nan before the first closed alt bar
+class AlignedView:
+    def __init__(self, bars, indexes):
+        self.bars = bars
+        # index of the alt bar for each main bar, -1 before the first closed alt bar
+        self.indexes = indexes
+        self.arrays = {}
+
+    def __getitem__(self, column):
+        array = self.arrays.get(column)
+        if array is None:
+            array = self.bars[column][np.maximum(self.indexes, 0)]
+            missing = self.indexes < 0
+            if missing.any():
+                array = array.astype(float)
+                array[missing] = np.nan
+            self.arrays[column] = array
+        return array
+
+    def __contains__(self, column):
+        return column in self.bars
+
+    def __len__(self):
+        return len(self.indexes)
+
+
+# Define the columns of binance klines
+kline_columns = ['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_av', 'trades',
+                 'tb_base_av', 'tb_quote_av', 'ignore']
+
+
 # --------------------------
 # Functions
 # --------------------------
@@ -85,41 +170,35 @@ def pull(var, index):
         return var
 
 
-# create a blank dataframe
-def initialise_dataframe(columns):
-    data = {}
-    for col in columns:
-        data[col] = []
-    return pd.DataFrame(data)
-
-
-# append a row to the dataframe
-def append_dataframe(dataframe, values):
-    return dataframe.append(values, ignore_index=True)
-
-
-# return the last row of the dataframe
-def get_last_row(dataframe):
-    return dataframe.iloc[-1]
-
-
-# check if the wallet_frame is symmetric or asymmetric
-def check_wallet_frame(wallet_frame):
-    first = wallet_frame.iloc[1]["order_type"]
-    last = None
-    last_amount = 0
-    for index, row in wallet_frame.iterrows():
-        if row["order_type"] != "blank":
-            if last is None:
-                last = row["order_type"]
-                last_amount = round(row["size"], 2)
-                if last != first:
-                    return False
-            elif last == row["order_type"] or last_amount != round(row["size"], 2):
-                print("returning because other")
-                return False
-            else:
-                last = None
-                last_amount = 0
-    return True
+# get the close time in ms of each bar of a dataframe, from the close_time column or from the timeframe
+def get_close_times(dataframe, timeframe):
+    if "close_time" in dataframe.columns:
+        return dataframe["close_time"].to_numpy()
+    timestamps = dataframe["timestamp"].to_numpy()
+    duration = interval_to_milliseconds(timeframe)
+    if duration is None:
+        # Months don't have a fixed duration, a bar closes when the next one opens
+        return np.append(timestamps[1:], np.iinfo(np.int64).max) - 1
+    return timestamps + duration - 1
+
+
+# make a dataframe of binance klines, all columns are parsed as numbers
+def make_kline_dataframe(klines):
+    dataframe = pd.DataFrame(klines, columns=kline_columns)
+    for column in kline_columns:
+        dataframe[column] = pd.to_numeric(dataframe[column])
+    return dataframe
+
+
+# check if orders are symmetric, each opening order is followed by an opposite closing order of the same size and
+# all trades open the same way, order_type holds 1 for buy and -1 for sell
+def check_orders(order_type, size):
+    if len(order_type) == 0:
+        return True
+    opening = order_type[0::2]
+    closing = order_type[1::2]
+    if (opening != order_type[0]).any() or (closing == order_type[0]).any():
+        return False
+    size = np.round(size, 2)
+    return bool((size[0::2][:len(closing)] == size[1::2]).all())
 
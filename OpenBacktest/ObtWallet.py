@@ -1,118 +1,263 @@
-from statistics import mean
+import numpy as np
+import pandas as pd
+from OpenBacktest.ObtEvents import ORDER_FILLED
 from OpenBacktest.ObtGraph import GraphManager
-from OpenBacktest.ObtUtility import append_dataframe, initialise_dataframe, get_last_row, check_wallet_frame, divide, Colors, remove_fees, parse_timestamp
+from OpenBacktest.ObtMetrics import get_risk_metrics, make_drawdowns, make_equity
+from OpenBacktest.ObtMonteCarlo import monte_carlo
+from OpenBacktest.ObtNumeric import get_backend
+from OpenBacktest.ObtUtility import BarView, check_orders, Colors, parse_timestamp
+
+# Order types stored in the ledger
+BLANK = 0
+BUY = 1
+SELL = -1
+
+
+# ------------------------------------------------------------------------------------------------
+# This class store the orders of a wallet in preallocated typed arrays, growing when they are full
+# ------------------------------------------------------------------------------------------------
+class Ledger:
+    # name and type of each column
+    columns = {"coin_balance": np.float64, "token_balance": np.float64, "total_fees": np.float64,
+               "order_type": np.int8, "index": np.int64, "timestamp": np.int64, "price": np.float64,
+               "size": np.float64, "equivalence": np.float64}
+
+    def __init__(self, capacity=256):
+        # number of rows
+        self.length = 0
+        self.capacity = capacity
+        self.arrays = {name: np.empty(capacity, dtype=dtype) for name, dtype in type(self).columns.items()}
+
+    # add a row to the ledger
+    def append(self, coin_balance, token_balance, total_fees, order_type, index, timestamp, price, size,
+               equivalence):
+        if self.length == self.capacity:
+            self.grow()
+        row = self.length
+        arrays = self.arrays
+        arrays["coin_balance"][row] = coin_balance
+        arrays["token_balance"][row] = token_balance
+        arrays["total_fees"][row] = total_fees
+        arrays["order_type"][row] = order_type
+        arrays["index"][row] = index
+        arrays["timestamp"][row] = timestamp
+        arrays["price"][row] = price
+        arrays["size"][row] = size
+        arrays["equivalence"][row] = equivalence
+        self.length += 1
+
+    # double the capacity of the arrays
+    def grow(self):
+        self.capacity *= 2
+        for name, array in self.arrays.items():
+            grown = np.empty(self.capacity, dtype=array.dtype)
+            grown[:self.length] = array[:self.length]
+            self.arrays[name] = grown
+
+    # get the filled part of a column
+    def get(self, name):
+        return self.arrays[name][:self.length]
+
+    # build a dataframe of the ledger, the first row is the initial wallet and is marked as blank
+    def make_dataframe(self):
+        order_type = self.get("order_type")
+        data = {"coin_balance": self.get("coin_balance").copy(),
+                "token_balance": self.get("token_balance").copy(),
+                "total_fees": self.get("total_fees").copy(),
+                "order_type": np.where(order_type == BUY, "BUY", np.where(order_type == SELL, "SELL", "blank"))
+                .astype(object)}
+        for name in ["timestamp", "price", "size", "equivalence"]:
+            column = self.get(name).astype(object)
+            column[order_type == BLANK] = "blank"
+            data[name] = column
+        return pd.DataFrame(data)
 
 
 # ------------------------------------------------------------------------------------------------
 # This class represent a wallet used to pass buy and sell orders of a symmetric strategy
 # ------------------------------------------------------------------------------------------------
 class Wallet:
-    def __init__(self, coin_name, token_name, coin_balance, token_balance, taker, dataframe):
+    # events is the EventStream of the engine, filled orders are sent to it
+    # backend is the numeric backend of the orders, "float", "decimal" or a FixedPointBackend, see ObtNumeric
+    def __init__(self, coin_name, token_name, coin_balance, token_balance, taker, dataframe, bars=None, events=None,
+                 backend=None):
         # name of the coin
         self.coin_name = coin_name
         # symbol of the token
         self.token_name = token_name
+        # Arithmetic of the orders
+        self.backend = get_backend(backend)
         # Maker fees
-        self.taker = divide(taker, 100.0)
+        self.taker = self.backend.rate(taker)
         # Dataframe
         self.dataframe = dataframe
+        # Arrays of the dataframe used to fill orders
+        self.bars = BarView(dataframe) if bars is None else bars
         # data handler
         self.data_handler = None
+        self.events = events
+        # index of the first bar of the dataframe in the whole history when a run is streamed by chunks, the ledger
+        # stores indexes of the whole history
+        self.offset = 0
         # initial balances
         self.coin_balance = coin_balance
         self.token_balance = token_balance
+        # current balances and fees in coin as values of the backend
+        self.coin_value = self.backend.coin(coin_balance)
+        self.token_value = self.backend.token(token_balance)
+        self.fees_value = self.backend.coin(0)
 
-        self.wallet_frame = initialise_dataframe(["coin_balance", "token_balance", "total_fees", "order_type",
-                                                  "timestamp", "price", "size", "equivalence"])
+        # Orders, the wallet frame is built from it only when asked
+        self.ledger = Ledger()
+        self.frame = None
+        # value of the wallet at the close of each bar, built from the ledger only when asked
+        self.equity = None
 
         # First row
-        self.wallet_frame = append_dataframe(self.wallet_frame, {"coin_balance": coin_balance,
-                                                                 "token_balance": token_balance,
-                                                                 "total_fees": 0.0,
-                                                                 "order_type": "blank",
-                                                                 "timestamp": "blank",
-                                                                 "price": "blank",
-                                                                 "size": "blank",
-                                                                 "equivalence": "blank"})
-
-    def buy(self, index, amount=None, percent_amount=None):
-        last_row = get_last_row(self.wallet_frame)
-        coin_balance = last_row["coin_balance"]
-        total_fees = last_row["total_fees"]
-        token_balance = last_row["token_balance"]
+        self.ledger.append(coin_balance, token_balance, 0.0, BLANK, -1, 0, np.nan, np.nan, np.nan)
+
+    # get the orders as a dataframe
+    @property
+    def wallet_frame(self):
+        if self.frame is None:
+            self.frame = self.ledger.make_dataframe()
+        return self.frame
+
+    # current balances and fees as floats
+    @property
+    def current_coin_balance(self):
+        return self.backend.coin_float(self.coin_value)
+
+    @property
+    def current_token_balance(self):
+        return self.backend.token_float(self.token_value)
+
+    @property
+    def total_fees(self):
+        return self.backend.coin_float(self.fees_value)
+
+    # get the value of the wallet in coin at the close of each bar of the dataframe
+    def get_equity(self):
+        if self.equity is None:
+            ledger = self.ledger
+            self.equity = make_equity(ledger.get("index"), ledger.get("coin_balance"), ledger.get("token_balance"),
+                                      self.bars["close"])
+        return self.equity
+
+    # get the drawdown, volatility and risk adjusted returns of the equity curve, risk_free is a yearly rate in %
+    def get_risk_metrics(self, risk_free=0.0):
+        return get_risk_metrics(self.get_equity(), self.bars["timestamp"], risk_free)
+
+    # get the lists drawn by the plots: timestamps and prices of the orders, equity of each bar and the line from the
+    # last ATH to the bottom of the worst drawdown
+    def get_plot_data(self):
+        ledger = self.ledger
+        order_type = ledger.get("order_type")
+        buys = order_type == BUY
+        sells = order_type == SELL
+        timestamps = ledger.get("timestamp")
+        prices = ledger.get("price")
+
+        equity = self.get_equity()
+        bar_timestamps = self.bars["timestamp"]
+        drawdowns, last_aths = make_drawdowns(equity)
+        worst = int(np.argmin(drawdowns))
+        ath = int(last_aths[worst])
+        return {"buy_timestamps": timestamps[buys].tolist(), "buy_prices": prices[buys].tolist(),
+                "sell_timestamps": timestamps[sells].tolist(), "sell_prices": prices[sells].tolist(),
+                "timestamps": bar_timestamps.tolist(), "equity": equity.tolist(),
+                "drawdown_timestamps": [int(bar_timestamps[ath]), int(bar_timestamps[worst])],
+                "drawdown_equity": [float(equity[ath]), float(equity[worst])]}
+
+    # price is the close of the bar by default, stops fill at their own price
+    def buy(self, index, amount=None, percent_amount=None, price=None):
+        backend = self.backend
+        coin_balance = self.coin_value
+        token_balance = self.token_value
 
         if amount is None:
             if percent_amount is None:
                 amount = coin_balance
             else:
-                amount = coin_balance * divide(percent_amount, 100)
+                amount = backend.part(coin_balance, percent_amount)
         else:
+            amount = backend.coin(amount)
             if amount > coin_balance:
                 amount = coin_balance
 
         if amount == 0:
             return
 
-        fees = remove_fees(amount, self.taker)
+        if price is None:
+            price = self.bars["close"][index]
+        price = backend.price(price)
+        fees = backend.fees(amount, self.taker)
 
-        size = divide(100*amount, coin_balance)
+        size = backend.ratio(amount, coin_balance)
         buying_amount = amount - fees
 
         new_balance = coin_balance - amount
-        new_token_balance = token_balance + divide(buying_amount, self.dataframe["close"][index])
-        # Updating wallet dataframe
-        self.wallet_frame = append_dataframe(self.wallet_frame, {"coin_balance": new_balance,
-                                                                 "token_balance": new_token_balance,
-                                                                 "total_fees": total_fees + fees,
-                                                                 "order_type": "BUY",
-                                                                 "timestamp": self.dataframe["timestamp"][index],
-                                                                 "price": self.dataframe["close"][index],
-                                                                 "size": size,
-                                                                 "equivalence": new_balance + new_token_balance *
-                                                                                self.dataframe["close"][index]})
-
-    def sell(self, index, amount=None, percent_amount=None):
-        last_row = get_last_row(self.wallet_frame)
-        coin_balance = last_row["coin_balance"]
-        total_fees = last_row["total_fees"]
-        token_balance = last_row["token_balance"]
+        new_token_balance = token_balance + backend.to_token(buying_amount, price)
+        # Updating wallet
+        self.coin_value = new_balance
+        self.token_value = new_token_balance
+        self.fees_value += fees
+        self.append_order(BUY, index, price, size, backend.coin_float(amount), backend.coin_float(fees))
+
+    def sell(self, index, amount=None, percent_amount=None, price=None):
+        backend = self.backend
+        coin_balance = self.coin_value
+        token_balance = self.token_value
 
         if amount is None:
             if percent_amount is None:
                 amount = token_balance
             else:
-                amount = token_balance * divide(percent_amount, 100)
+                amount = backend.part(token_balance, percent_amount)
         else:
+            amount = backend.token(amount)
             if amount > token_balance:
                 amount = token_balance
 
         if amount == 0:
             return
 
-        fees_in_coin = remove_fees(self.dataframe["close"][index] * amount, self.taker)
-        fees = remove_fees(amount, self.taker)
+        if price is None:
+            price = self.bars["close"][index]
+        price = backend.price(price)
+        fees_in_coin = backend.fees(backend.to_coin(amount, price), self.taker)
+        fees = backend.fees(amount, self.taker)
 
-        size = divide(100*amount, token_balance)
+        size = backend.ratio(amount, token_balance)
         selling_amount = amount - fees
 
-        new_balance = coin_balance - amount
-        new_token_balance = token_balance + divide(selling_amount, self.dataframe["close"][index])
-        # Updating wallet dataframe
-        self.wallet_frame = append_dataframe(self.wallet_frame,
-                                             {"coin_balance": coin_balance + self.dataframe["close"][
-                                                 index] * selling_amount,
-                                              "token_balance": token_balance - amount,
-                                              "total_fees": total_fees + fees_in_coin,
-                                              "order_type": "SELL",
-                                              "timestamp": self.dataframe["timestamp"][index],
-                                              "price": self.dataframe["close"][index],
-                                              "size": size,
-                                              "equivalence": new_balance + new_token_balance *
-                                                             self.dataframe["close"][index]})
+        new_balance = coin_balance + backend.to_coin(selling_amount, price)
+        new_token_balance = token_balance - amount
+        # Updating wallet
+        self.coin_value = new_balance
+        self.token_value = new_token_balance
+        self.fees_value += fees_in_coin
+        self.append_order(SELL, index, price, size, backend.token_float(amount), backend.coin_float(fees_in_coin))
+
+    # store an order in the ledger with the balances after it, amount is in coin for a buy and in token for a sell
+    def append_order(self, order_type, index, price, size, amount, fees):
+        backend = self.backend
+        coin_balance = backend.coin_float(self.coin_value)
+        token_balance = backend.token_float(self.token_value)
+        price = backend.price_float(price)
+        timestamp = self.bars["timestamp"][index]
+        self.ledger.append(coin_balance, token_balance, backend.coin_float(self.fees_value), order_type,
+                           index + self.offset, timestamp, price, size, coin_balance + token_balance * price)
+        self.frame = None
+        self.equity = None
+        if self.events is not None and self.events.wants(ORDER_FILLED):
+            self.events.emit(ORDER_FILLED, index, int(timestamp), order="buy" if order_type == BUY else "sell",
+                             amount=float(amount), price=float(price), size=float(size), fees=float(fees),
+                             coin_balance=float(coin_balance), token_balance=float(token_balance))
 
     def get_data_handler(self):
         if self.data_handler is None:
-            if check_wallet_frame(self.wallet_frame):
+            if check_orders(self.ledger.get("order_type")[1:], self.ledger.get("size")[1:]):
                 self.data_handler = SymmetricDataHandler(self)
             else:
                 self.data_handler = AsymmetricDataHandler(self)
@@ -120,14 +265,49 @@ class Wallet:
         return self.data_handler
 
 
+# get the worst drawdown of a balance history as (drawdown in %, balance, timestamp, last ATH, last ATH timestamp)
+def get_drawdown(balances, timestamps):
+    aths = np.maximum.accumulate(balances)
+    drawdowns = -100 * (aths - balances) / aths
+    worst = int(np.argmin(drawdowns))
+    if not drawdowns[worst] < 0:
+        return 0, 0, 0, 0, 0
+    # The last ATH is the last balance at its running maximum before the drawdown
+    ath = np.flatnonzero(balances[:worst + 1] >= aths[:worst + 1])[-1]
+    return (float(drawdowns[worst]), float(balances[worst]), int(timestamps[worst]), float(aths[worst]),
+            int(timestamps[ath]))
+
+
+# print the risk metrics of a wallet
+def display_risk(metrics):
+    print(Colors.LIGHT_RED, "Max drawDown per bar: ", str(round(metrics["max_drawdown"], 2)) + "%", "/",
+          round(metrics["max_drawdown_duration"] / 86400000, 2), "day(s) under ATH")
+    values = []
+    for name in ["volatility", "sharpe", "sortino", "calmar"]:
+        value = metrics[name]
+        values.append(name.capitalize() + ": " + ("-" if value is None else str(round(value, 2))))
+    print(Colors.LIGHT_BLUE, " / ".join(values))
+
+
+# get the rounded mean of an array, 0 if it's empty
+def rounded_mean(values):
+    if len(values) == 0:
+        return 0
+    return round(float(values.mean()), 2)
+
+
 # -------------------------------------------------------------------------------
 # This class is used to summarize backtest result of a symmetric strategy
 # -------------------------------------------------------------------------------
 class SymmetricDataHandler:
     def __init__(self, wallet):
         self.wallet = wallet
+        # divisions of the metrics are made by the numeric backend of the wallet
+        self.divide = wallet.backend.divide
+        self.reset()
 
-        # Informative values, these values are initialized but will be calculated by make_data() function
+    # Informative values, these values are initialized but will be calculated by make_data() function
+    def reset(self):
         # coin profit
         self.profit = 0
         # coin profit in %
@@ -194,146 +374,152 @@ class SymmetricDataHandler:
         self.last_ath_timestamp = 0
         # used to plot graph, list of all trades percent profit
         self.trades_percent_profit = []
+        # arrays of the trades: buy_timestamp, sell_timestamp, profit, percent_profit and exposure
+        self.trades = {}
 
     # Make the required data to display wallet
     def make_data(self):
+        # Reset the values of a previous call
+        self.reset()
+        ledger = self.wallet.ledger
+        # Orders without the initial row
+        order_type = ledger.get("order_type")[1:]
+        timestamps = ledger.get("timestamp")[1:]
+        equivalences = ledger.get("equivalence")[1:]
+
+        # --- Splitting ---
+        # Each buy order is paired with the sell order of the same rank, an order left open is not a trade
+        buy_orders = np.flatnonzero(order_type == BUY)
+        sell_orders = np.flatnonzero(order_type == SELL)
         # Total number of trades
-        self.total_trades = round(divide(len(self.wallet.wallet_frame["timestamp"]) - 1, 2))
+        self.total_trades = min(len(buy_orders), len(sell_orders))
         # return if there were no trades
         if self.total_trades == 0:
             return
+        buy_orders = buy_orders[:self.total_trades]
+        sell_orders = sell_orders[:self.total_trades]
 
         # --- Total Profit ---
-        self.profit = self.wallet.wallet_frame.iloc[-1]["coin_balance"] - self.wallet.coin_balance
+        self.profit = float(ledger.get("coin_balance")[-1]) - self.wallet.coin_balance
 
         # Profit in percent depending of initial coin balance
-        self.percent_profit = divide(100 * self.profit, self.wallet.coin_balance)
-
-        # --- Splitting ---
-        buy_orders = \
-            self.wallet.wallet_frame.loc[self.wallet.wallet_frame["order_type"] == "BUY"].reset_index(drop=True)
-        sell_orders = \
-            self.wallet.wallet_frame.loc[self.wallet.wallet_frame["order_type"] == "SELL"].reset_index(drop=True)
+        self.percent_profit = self.divide(100 * self.profit, self.wallet.coin_balance)
 
         # --- Trades ---
-
-        # Ini
-        positive_trades_profit = []
-        positive_trades_percent_profit = []
-        negative_trades_profit = []
-        negative_trades_percent_profit = []
-        trades_profit = []
-        exposures = []
-
-        for index, buy_row in buy_orders.iterrows():
-            # Get the sell order
-            sell_row = sell_orders.iloc[index]
-
-            # Calculate the profit
-            trade_profit = sell_row["equivalence"] - buy_row["equivalence"]
-            trades_profit.append(trade_profit)
-
-            # Calculate the profit in percent
-            trade_percent_profit = float(divide(100 * trade_profit, buy_row["equivalence"]))
-            self.trades_percent_profit.append(trade_percent_profit)
-
-            # Calculate the exposure time
-            exposure = sell_row["timestamp"] - buy_row["timestamp"]
-            self.exposure_time += divide(exposure, 84000000)
-            exposures.append(exposure)
-
-            # Check if the trade was positive or negative
-            if trade_profit > 0:
-                self.total_positives_trades += 1
-                positive_trades_profit.append(trade_profit)
-                positive_trades_percent_profit.append(trade_percent_profit)
-            else:
-                self.total_negatives_trades += 1
-                negative_trades_profit.append(trade_profit)
-                negative_trades_percent_profit.append(trade_percent_profit)
-
-            # Initializing worst_trade & best_trade values with the first trade
-            if self.worst_trade is None or self.best_trade is None:
-                self.worst_trade = trade_profit, trade_percent_profit, buy_row["timestamp"], sell_row["timestamp"]
-                self.best_trade = trade_profit, trade_percent_profit, buy_row["timestamp"], sell_row["timestamp"]
-            # Updating best_trade
-            elif trade_percent_profit > self.best_trade[1]:
-                self.best_trade = trade_profit, trade_percent_profit, buy_row["timestamp"], sell_row["timestamp"]
-            # Updating worst_trade
-            elif trade_percent_profit < self.worst_trade[1]:
-                self.worst_trade = trade_profit, trade_percent_profit, buy_row["timestamp"], sell_row["timestamp"]
-
-        ath = self.wallet.wallet_frame["equivalence"][1]
-        ath_timestamp = self.wallet.dataframe["timestamp"][1]
-
-        # Iteration in dataframe
-        for index, row in self.wallet.wallet_frame.iterrows():
-            if row["timestamp"] != "blank":
-                balance = row["equivalence"]
-                if balance >= ath:
-                    ath = balance
-                    ath_timestamp = row["timestamp"]
-                else:
-                    drawdown = -(divide(100 * (ath - balance), ath))
-                    if drawdown < self.drawdown:
-                        self.drawdown = drawdown
-                        self.balance_at_drawdown = balance
-                        self.drawdown_timestamp = row["timestamp"]
-                        self.last_ath = ath
-                        self.last_ath_timestamp = ath_timestamp
+        buy_timestamps = timestamps[buy_orders]
+        sell_timestamps = timestamps[sell_orders]
+        trades_profit = equivalences[sell_orders] - equivalences[buy_orders]
+        trades_percent_profit = 100 * trades_profit / equivalences[buy_orders]
+        exposures = sell_timestamps - buy_timestamps
+        positives = trades_profit > 0
+        self.trades = {"buy_timestamp": buy_timestamps, "sell_timestamp": sell_timestamps, "profit": trades_profit,
+                       "percent_profit": trades_percent_profit, "exposure": exposures}
+        self.trades_percent_profit = trades_percent_profit.tolist()
+
+        self.total_positives_trades = int(positives.sum())
+        self.total_negatives_trades = self.total_trades - self.total_positives_trades
+
+        # Best and worst trades, the first one on ties
+        best = int(np.argmax(trades_percent_profit))
+        worst = int(np.argmin(trades_percent_profit))
+        self.best_trade = (float(trades_profit[best]), float(trades_percent_profit[best]),
+                           int(buy_timestamps[best]), int(sell_timestamps[best]))
+        self.worst_trade = (float(trades_profit[worst]), float(trades_percent_profit[worst]),
+                            int(buy_timestamps[worst]), int(sell_timestamps[worst]))
+
+        # Total exposure time in days
+        self.exposure_time = float(exposures.sum()) / 86400000
+
+        # Worst drawdown between orders
+        self.drawdown, self.balance_at_drawdown, self.drawdown_timestamp, self.last_ath, self.last_ath_timestamp = \
+            get_drawdown(equivalences, timestamps)
 
         # positive trades ratio depending of total numbers of trades
-        self.positives_trades_ratio = divide(100 * self.total_positives_trades, self.total_trades)
+        self.positives_trades_ratio = self.divide(100 * self.total_positives_trades, self.total_trades)
         # negative trades ratio depending of total numbers of trades
-        self.negatives_trades_ratio = divide(100 * self.total_negatives_trades, self.total_trades)
+        self.negatives_trades_ratio = self.divide(100 * self.total_negatives_trades, self.total_trades)
         # Average positive trades
-        if len(positive_trades_profit) == 0:
-            positive_trades_profit.append(0)
-            positive_trades_percent_profit.append(0)
         self.average_positive_trades = (
-            round(mean(positive_trades_profit), 2), round(mean(positive_trades_percent_profit), 2))
+            rounded_mean(trades_profit[positives]), rounded_mean(trades_percent_profit[positives]))
         # Average negative trades
-        if len(negative_trades_profit) == 0:
-            negative_trades_profit.append(0)
-            negative_trades_percent_profit.append(0)
         self.average_negative_trades = (
-            round(mean(negative_trades_profit), 2), round(mean(negative_trades_percent_profit), 2))
+            rounded_mean(trades_profit[~positives]), rounded_mean(trades_percent_profit[~positives]))
         # Average profit per trades
-        if len(trades_profit) == 0:
-            trades_profit.append(0)
-            self.trades_percent_profit.append(0)
-        self.average_profit_per_trades = (
-            round(mean(trades_profit), 2), round(mean(self.trades_percent_profit), 2))
+        self.average_profit_per_trades = (rounded_mean(trades_profit), rounded_mean(trades_percent_profit))
 
         # Last timestamp of the period
-        self.end = self.wallet.wallet_frame.iloc[-1]["timestamp"]
+        self.end = int(timestamps[-1])
         # First timestamp of the period
-        self.start = self.wallet.dataframe.iloc[0]["timestamp"]
+        self.start = int(self.wallet.bars["timestamp"][0])
         # Total days from first timestamp to the last one
-        self.total_inday_trading_time = divide(int(self.end - self.start), 86400000)
+        self.total_inday_trading_time = self.divide(self.end - self.start, 86400000)
         # First close price of the dataframe
-        self.first_price = self.wallet.dataframe.iloc[0]["close"]
+        self.first_price = float(self.wallet.bars["close"][0])
         # Last close price of the dataframe
-        self.last_price = self.wallet.dataframe.iloc[-1]["close"]
+        self.last_price = float(self.wallet.bars["close"][-1])
         # Profit with buy & hold
-        self.buy_and_hold_profit = divide(self.wallet.wallet_frame.iloc[0]["coin_balance"] * self.last_price,
-                                          self.first_price)
+        self.buy_and_hold_profit = self.divide(float(ledger.get("coin_balance")[0]) * self.last_price, self.first_price)
         # Profit with buy & hold in %
-        self.buy_and_hold_percent_profit = divide(100 * self.last_price, self.first_price)
+        self.buy_and_hold_percent_profit = self.divide(100 * self.last_price, self.first_price)
         # Strategy performance vs buy & hold
         self.strategy_vs_buy_and_hold = self.profit - self.buy_and_hold_profit
         # Strategy performance vs buy & hold in %
         self.strategy_vs_buy_and_hold_percent = self.percent_profit - self.buy_and_hold_percent_profit
         # Average profit generated per day
-        self.average_profit_per_day = divide(self.profit, self.total_inday_trading_time)
+        self.average_profit_per_day = self.divide(self.profit, self.total_inday_trading_time)
         # Average profit generated per day in %
-        self.average_percent_profit_per_day = divide(self.percent_profit, self.total_inday_trading_time)
+        self.average_percent_profit_per_day = self.divide(self.percent_profit, self.total_inday_trading_time)
         # Average exposure time that mean average time of a trade
-        self.average_exposure_time = divide(mean(exposures), 86400000)
+        self.average_exposure_time = float(exposures.mean()) / 86400000
         # Average exposure time that mean average time of a trade in %
-        self.average_percent_exposure_time = divide(100 * self.average_exposure_time, self.total_inday_trading_time)
+        self.average_percent_exposure_time = self.divide(100 * self.average_exposure_time,
+                                                         self.total_inday_trading_time)
         # Total exposure time in %
-        self.percent_exposure_time = divide(100 * self.exposure_time, self.total_inday_trading_time)
+        self.percent_exposure_time = self.divide(100 * self.exposure_time, self.total_inday_trading_time)
+
+    # Make the data and get the summary values without printing them
+    def get_metrics(self):
+        self.make_data()
+        metrics = {"profit": self.profit,
+                   "percent_profit": self.percent_profit,
+                   "total_trades": self.total_trades,
+                   "total_positives_trades": self.total_positives_trades,
+                   "total_negatives_trades": self.total_negatives_trades,
+                   "positives_trades_ratio": self.positives_trades_ratio,
+                   "negatives_trades_ratio": self.negatives_trades_ratio,
+                   "best_trade": None, "best_trade_percent": None,
+                   "worst_trade": None, "worst_trade_percent": None,
+                   "average_positive_trades": None, "average_positive_trades_percent": None,
+                   "average_negative_trades": None, "average_negative_trades_percent": None,
+                   "average_profit_per_trades": None, "average_profit_per_trades_percent": None,
+                   "buy_and_hold_profit": self.buy_and_hold_profit,
+                   "buy_and_hold_percent_profit": self.buy_and_hold_percent_profit,
+                   "strategy_vs_buy_and_hold": self.strategy_vs_buy_and_hold,
+                   "strategy_vs_buy_and_hold_percent": self.strategy_vs_buy_and_hold_percent,
+                   "average_profit_per_day": self.average_profit_per_day,
+                   "average_percent_profit_per_day": self.average_percent_profit_per_day,
+                   "exposure_time": self.exposure_time,
+                   "percent_exposure_time": self.percent_exposure_time,
+                   "average_exposure_time": self.average_exposure_time,
+                   "average_percent_exposure_time": self.average_percent_exposure_time,
+                   "drawdown": self.drawdown}
+        if self.total_trades != 0:
+            metrics["best_trade"], metrics["best_trade_percent"] = self.best_trade[:2]
+            metrics["worst_trade"], metrics["worst_trade_percent"] = self.worst_trade[:2]
+            metrics["average_positive_trades"], metrics["average_positive_trades_percent"] = \
+                self.average_positive_trades
+            metrics["average_negative_trades"], metrics["average_negative_trades_percent"] = \
+                self.average_negative_trades
+            metrics["average_profit_per_trades"], metrics["average_profit_per_trades_percent"] = \
+                self.average_profit_per_trades
+        metrics.update(self.wallet.get_risk_metrics())
+        return metrics
+
+    # resample the trades many times to test the robustness of the strategy, see ObtMonteCarlo.monte_carlo
+    def get_monte_carlo(self, simulations=10000, method="shuffle", ruin=50, seed=None, workers=1):
+        self.make_data()
+        return monte_carlo(self.trades_percent_profit, simulations, method, self.wallet.coin_balance, ruin, seed,
+                           workers)
 
     # Summarize all trades & wallet evolution, strategy stats
     def display_wallet(self):
@@ -388,12 +574,14 @@ class SymmetricDataHandler:
 
         # Fees
         print(Colors.LIGHT_RED, "Fees: ", round(float(self.wallet.wallet_frame.iloc[-1]["total_fees"]), 3),
-              self.wallet.coin_name, "/", str(round(divide(100 * float(self.wallet.wallet_frame.iloc[-1]["total_fees"]),
-                                                           self.wallet.wallet_frame.iloc[-1]["coin_balance"]),
-                                                    2)) + "%")
+              self.wallet.coin_name, "/",
+              str(round(self.divide(100 * float(self.wallet.wallet_frame.iloc[-1]["total_fees"]),
+                                    self.wallet.wallet_frame.iloc[-1]["coin_balance"]), 2)) + "%")
 
         # Drawdown
         print(Colors.LIGHT_RED, "Worst drawDown/drawBack: ", str(round(float(self.drawdown), 2)) + "%")
+        # Per bar drawdown and risk adjusted returns
+        display_risk(self.wallet.get_risk_metrics())
 
         # Buy & hold profit
         if self.buy_and_hold_profit == 0:
@@ -467,36 +655,19 @@ class SymmetricDataHandler:
         manager2.set_sub_title("Balance (" + self.wallet.coin_name + ")", target="y", sub=2)
         manager2.set_sub_title("Trade profit (%)", target="y", sub=3)
 
-        # Total number of trades
-        self.total_trades = round(divide(len(self.wallet.wallet_frame["timestamp"]) - 1, 2))
+        # Build the trades
+        self.make_data()
         # Cancel plotting if there are no trades
         if self.total_trades == 0:
             print(Colors.YELLOW, "No trades found, plotting canceled")
             return
 
-        # Sell orders timestamps
-        sell_timestamps = []
-        # Buy orders timestamps
-        buy_timestamps = []
-        # Price at sell orders
-        sell_prices = []
-        # Price at buy orders
-        buy_prices = []
-
-        # --- Splitting ---
-        buy_orders = \
-            self.wallet.wallet_frame.loc[self.wallet.wallet_frame["order_type"] == "BUY"].reset_index(drop=True)
-        sell_orders = \
-            self.wallet.wallet_frame.loc[self.wallet.wallet_frame["order_type"] == "SELL"].reset_index(drop=True)
-
-        # Build sell and buy orders timestamps and prices
-        for index, row in buy_orders.iterrows():
-            buy_timestamps.append(row["timestamp"])
-            buy_prices.append(row["price"])
-
-        for index, row in sell_orders.iterrows():
-            sell_timestamps.append(row["timestamp"])
-            sell_prices.append(row["price"])
+        # Sell and buy orders timestamps and prices
+        data = self.wallet.get_plot_data()
+        sell_timestamps = data["sell_timestamps"]
+        buy_timestamps = data["buy_timestamps"]
+        sell_prices = data["sell_prices"]
+        buy_prices = data["buy_prices"]
 
         # Graph 1 Sub 1 - Price
         if self.wallet.dataframe is not None:
@@ -570,12 +741,10 @@ class SymmetricDataHandler:
                     else:
                         manager2.draw_line([buy_timestamps[i], sell_timestamps[i]], [0, 0], line_width=10,
                                            line_color="green", hoverinfo="none")
-        # Graph 2 Sub 2 - Wallet
-        df = self.wallet.wallet_frame.loc(["timestamp"] != "blank")
-        manager2.draw_line(list(df["timestamp"]), list(df["equivalence"]),
+        # Graph 2 Sub 2 - Wallet, valued at each bar
+        manager2.draw_line(data["timestamps"], data["equity"],
                            line_color="darkblue", line_width=3, row=2)
-        manager2.draw_line([self.last_ath_timestamp, self.drawdown_timestamp],
-                           [self.last_ath, self.balance_at_drawdown],
+        manager2.draw_line(data["drawdown_timestamps"], data["drawdown_equity"],
                            line_color="red", line_width=3, row=2)
 
         # Graph 2 Sub 3 - Trades profit
@@ -594,8 +763,12 @@ class SymmetricDataHandler:
 class AsymmetricDataHandler:
     def __init__(self, wallet):
         self.wallet = wallet
+        # divisions of the metrics are made by the numeric backend of the wallet
+        self.divide = wallet.backend.divide
+        self.reset()
 
-        # Informative values, these values are initialized but will be calculated by make_data() function
+    # Informative values, these values are initialized but will be calculated by make_data() function
+    def reset(self):
         # coin profit
         self.profit = 0
         # coin profit in %
@@ -641,72 +814,72 @@ class AsymmetricDataHandler:
 
     # Make the required data to display wallet
     def make_data(self):
+        # Reset the values of a previous call
+        self.reset()
+        ledger = self.wallet.ledger
+        # Orders without the initial row
+        order_type = ledger.get("order_type")[1:]
+        timestamps = ledger.get("timestamp")[1:]
         # Total number of trades
-        self.total_orders = round(len(self.wallet.wallet_frame["timestamp"]) - 1)
+        self.total_orders = len(order_type)
         # return if there were no trades
         if self.total_orders == 0:
             return
 
         # --- Total Profit ---
-        self.profit = self.wallet.wallet_frame.iloc[-1]["coin_balance"] - self.wallet.coin_balance
+        self.profit = float(ledger.get("coin_balance")[-1]) - self.wallet.coin_balance
 
         # Profit in percent depending of initial coin balance
-        self.percent_profit = divide(100 * self.profit, self.wallet.coin_balance)
-
-        # --- Splitting ---
-        orders = \
-            self.wallet.wallet_frame.loc[self.wallet.wallet_frame["order_type"] != "blank"].reset_index(drop=True)
+        self.percent_profit = self.divide(100 * self.profit, self.wallet.coin_balance)
 
         # --- Orders ---
-        for index, row in orders.iterrows():
-            # Get the sell order
-            if row["order_type"] == "BUY":
-                self.total_buy_orders += 1
-            elif row["order_type"] == "SELL":
-                self.total_sell_orders += 1
-
-        ath = self.wallet.wallet_frame["equivalence"][1]
-        ath_timestamp = self.wallet.dataframe["timestamp"][1]
-
-        # Iteration in dataframe
-        for index, row in self.wallet.wallet_frame.iterrows():
-            if row["timestamp"] != "blank":
-                balance = row["equivalence"]
-                if balance >= ath:
-                    ath = balance
-                    ath_timestamp = row["timestamp"]
-                else:
-                    drawdown = -(divide(100 * (ath - balance), ath))
-                    if drawdown < self.drawdown:
-                        self.drawdown = drawdown
-                        self.balance_at_drawdown = balance
-                        self.drawdown_timestamp = row["timestamp"]
-                        self.last_ath = ath
-                        self.last_ath_timestamp = ath_timestamp
+        self.total_buy_orders = int((order_type == BUY).sum())
+        self.total_sell_orders = int((order_type == SELL).sum())
+
+        # Worst drawdown between orders
+        self.drawdown, self.balance_at_drawdown, self.drawdown_timestamp, self.last_ath, self.last_ath_timestamp = \
+            get_drawdown(ledger.get("equivalence")[1:], timestamps)
 
         # Last timestamp of the period
-        self.end = self.wallet.wallet_frame.iloc[-1]["timestamp"]
+        self.end = int(timestamps[-1])
         # First timestamp of the period
-        self.start = self.wallet.dataframe.iloc[0]["timestamp"]
+        self.start = int(self.wallet.bars["timestamp"][0])
         # Total days from first timestamp to the last one
-        self.total_inday_trading_time = divide(int(self.end - self.start), 86400000)
+        self.total_inday_trading_time = self.divide(self.end - self.start, 86400000)
         # First close price of the dataframe
-        self.first_price = self.wallet.dataframe.iloc[0]["close"]
+        self.first_price = float(self.wallet.bars["close"][0])
         # Last close price of the dataframe
-        self.last_price = self.wallet.dataframe.iloc[-1]["close"]
+        self.last_price = float(self.wallet.bars["close"][-1])
         # Profit with buy & hold
-        self.buy_and_hold_profit = divide(self.wallet.wallet_frame.iloc[0]["coin_balance"] * self.last_price,
-                                          self.first_price)
+        self.buy_and_hold_profit = self.divide(float(ledger.get("coin_balance")[0]) * self.last_price, self.first_price)
         # Profit with buy & hold in %
-        self.buy_and_hold_percent_profit = divide(100 * self.last_price, self.first_price)
+        self.buy_and_hold_percent_profit = self.divide(100 * self.last_price, self.first_price)
         # Strategy performance vs buy & hold
         self.strategy_vs_buy_and_hold = self.profit - self.buy_and_hold_profit
         # Strategy performance vs buy & hold in %
         self.strategy_vs_buy_and_hold_percent = self.percent_profit - self.buy_and_hold_percent_profit
         # Average profit generated per day
-        self.average_profit_per_day = divide(self.profit, self.total_inday_trading_time)
+        self.average_profit_per_day = self.divide(self.profit, self.total_inday_trading_time)
         # Average profit generated per day in %
-        self.average_percent_profit_per_day = divide(self.percent_profit, self.total_inday_trading_time)
+        self.average_percent_profit_per_day = self.divide(self.percent_profit, self.total_inday_trading_time)
+
+    # Make the data and get the summary values without printing them
+    def get_metrics(self):
+        self.make_data()
+        metrics = {"profit": self.profit,
+                   "percent_profit": self.percent_profit,
+                   "total_orders": self.total_orders,
+                   "total_buy_orders": self.total_buy_orders,
+                   "total_sell_orders": self.total_sell_orders,
+                   "buy_and_hold_profit": self.buy_and_hold_profit,
+                   "buy_and_hold_percent_profit": self.buy_and_hold_percent_profit,
+                   "strategy_vs_buy_and_hold": self.strategy_vs_buy_and_hold,
+                   "strategy_vs_buy_and_hold_percent": self.strategy_vs_buy_and_hold_percent,
+                   "average_profit_per_day": self.average_profit_per_day,
+                   "average_percent_profit_per_day": self.average_percent_profit_per_day,
+                   "drawdown": self.drawdown}
+        metrics.update(self.wallet.get_risk_metrics())
+        return metrics
 
     # Summarize all trades & wallet evolution, strategy stats
     def display_wallet(self):
@@ -755,9 +928,12 @@ class AsymmetricDataHandler:
 
         # Fees
         print(Colors.LIGHT_RED, "Fees: ", round(float(self.wallet.wallet_frame.iloc[-1]["total_fees"]), 3),
-              self.wallet.coin_name, "/", str(round(divide(100 * float(self.wallet.wallet_frame.iloc[-1]["total_fees"]),
-                                                           self.wallet.wallet_frame.iloc[-1]["coin_balance"]),
-                                                    2)) + "%")
+              self.wallet.coin_name, "/",
+              str(round(self.divide(100 * float(self.wallet.wallet_frame.iloc[-1]["total_fees"]),
+                                    self.wallet.wallet_frame.iloc[-1]["coin_balance"]), 2)) + "%")
+
+        # Per bar drawdown and risk adjusted returns
+        display_risk(self.wallet.get_risk_metrics())
 
         # Buy & hold profit
         if self.buy_and_hold_profit == 0:
@@ -807,40 +983,18 @@ class AsymmetricDataHandler:
         manager2.set_sub_title("Balance (" + self.wallet.coin_name + ")", target="y", sub=2)
 
         # Total number of trades
-        total_orders = len(self.wallet.wallet_frame["timestamp"])-1
+        total_orders = self.wallet.ledger.length - 1
         # Cancel plotting if there are no trades
         if total_orders == 0:
             print(Colors.YELLOW, "No trades found, plotting canceled")
             return
 
-        # Sell orders timestamps
-        sell_timestamps = []
-        # Buy orders timestamps
-        buy_timestamps = []
-        # Price at sell orders
-        sell_prices = []
-        # Price at buy orders
-        buy_prices = []
-        # timestamps
-        timestamps = []
-        # equivalence
-        equivalence = []
-
-        # Build sell and buy orders timestamps and prices
-        orders = self.wallet.wallet_frame.loc[self.wallet.wallet_frame["timestamp"] != "blank"]
-        # --- Orders ---
-        for index, row in orders.iterrows():
-            # Get the sell order
-            if row["order_type"] == "BUY":
-                buy_timestamps.append(row["timestamp"])
-                timestamps.append(row["timestamp"])
-                buy_prices.append(row["price"])
-                equivalence.append(row["equivalence"])
-            elif row["order_type"] == "SELL":
-                sell_timestamps.append(row["timestamp"])
-                timestamps.append(row["timestamp"])
-                sell_prices.append(row["price"])
-                equivalence.append(row["equivalence"])
+        # Sell and buy orders timestamps and prices
+        data = self.wallet.get_plot_data()
+        sell_timestamps = data["sell_timestamps"]
+        buy_timestamps = data["buy_timestamps"]
+        sell_prices = data["sell_prices"]
+        buy_prices = data["buy_prices"]
 
         # Graph 1 Sub 1 - Price
         manager1.plot_price(dataframe=self.wallet.dataframe)
@@ -868,8 +1022,8 @@ class AsymmetricDataHandler:
                              marker_symbol="triangle-down",
                              marker_size=size)
 
-        # Graph 2 Sub 2 - Wallet
-        manager2.draw_line(timestamps, equivalence,
+        # Graph 2 Sub 2 - Wallet, valued at each bar
+        manager2.draw_line(data["timestamps"], data["equity"],
                            line_color="darkblue", line_width=3, row=2)
 
         manager1.show()
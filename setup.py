@@ -23,7 +23,8 @@ setuptools.setup(
         "pandas",
         "numpy",
         "plotly",
-        "ta"
+        "ta",
+        "websockets"
     ],
-    python_requires=">=3.6",
+    python_requires=">=3.8",
 )
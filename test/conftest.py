@@ -0,0 +1,21 @@
+import pytest
+from OpenBacktest.ObtBenchmark import make_synthetic_klines
+from OpenBacktest.ObtClient import set_offline
+from OpenBacktest.ObtEngine import Container, Engine, Pair
+
+# The tests never request the API
+set_offline(True)
+
+
+# make an engine without output on a main pair holding a dataframe
+def make_engine(dataframe, pair="BTCUSDT", timeframe="1m"):
+    main = Pair(pair, "1 January 2021", timeframe, "main")
+    main.set_dataframe(dataframe)
+    container = Container()
+    container.add_main_pair(main)
+    return Engine(container, output=False, load=False)
+
+
+@pytest.fixture
+def klines():
+    return make_synthetic_klines(2000)
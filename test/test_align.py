@@ -0,0 +1,72 @@
+import numpy as np
+from OpenBacktest.ObtBenchmark import START, make_synthetic_klines
+from OpenBacktest.ObtEngine import Container, Engine, Pair, Report
+
+MINUTE = 60000
+
+
+def make_engine(klines, alts):
+    main = Pair("BTCUSDT", "1 January 2021", "1m", "main")
+    main.set_dataframe(klines)
+    container = Container()
+    container.add_main_pair(main)
+    for name, (timeframe, dataframe) in alts.items():
+        pair = Pair("ETHUSDT", "1 January 2021", timeframe, name)
+        pair.set_dataframe(dataframe)
+        container.add_pair(pair)
+    return Engine(container, output=False, load=False)
+
+
+# index of the last alt bar closed at each main bar, -1 before the first one
+def expected_indexes(klines, alt, duration):
+    main_close_times = klines["timestamp"].to_numpy() + MINUTE - 1
+    alt_close_times = alt["timestamp"].to_numpy() + duration - 1
+    return np.array([np.flatnonzero(alt_close_times <= time)[-1] if (alt_close_times <= time).any() else -1
+                     for time in main_close_times])
+
+
+def test_alt_bars_are_used_once_closed(klines):
+    alt = make_synthetic_klines(400, "5m", seed=1)
+    # Starting later, the first main bars have no closed alt bar
+    late = make_synthetic_klines(300, "5m", seed=2, start=START + 7 * MINUTE)
+    engine = make_engine(klines, {"alt": ("5m", alt), "late": ("5m", late)})
+    engine.align_pairs()
+
+    indexes = engine.aligned_bars("alt").indexes
+    # A 5m bar closes with the fifth 1m bar
+    np.testing.assert_array_equal(indexes, (np.arange(len(klines)) + 1) // 5 - 1)
+    np.testing.assert_array_equal(indexes, expected_indexes(klines, alt, 5 * MINUTE))
+    close = engine.aligned_bars("alt")["close"]
+    assert np.isnan(close[:4]).all()
+    np.testing.assert_array_equal(close[4:], alt["close"].to_numpy()[indexes[4:]])
+
+    late_indexes = expected_indexes(klines, late, 5 * MINUTE)
+    np.testing.assert_array_equal(engine.aligned_bars("late").indexes, late_indexes)
+    first = int(np.argmax(late_indexes >= 0))
+    assert first == 11
+    late_close = engine.aligned_bars("late")["close"]
+    assert np.isnan(late_close[:first]).all() and not np.isnan(late_close[first:]).any()
+    assert engine.alt_index("late", first - 1) is None
+    assert engine.alt_index("late", first) == 0
+
+
+def test_alignment_without_close_times(klines):
+    alt = make_synthetic_klines(400, "5m", seed=1).drop(columns="close_time")
+    engine = make_engine(klines.drop(columns="close_time"), {"alt": ("5m", alt)})
+    engine.align_pairs()
+    np.testing.assert_array_equal(engine.aligned_bars("alt").indexes, (np.arange(len(klines)) + 1) // 5 - 1)
+
+
+def test_strategy_sees_the_window_of_a_run(klines):
+    alt = make_synthetic_klines(400, "5m", seed=1)
+    engine = make_engine(klines, {"alt": ("5m", alt)})
+    seen = []
+
+    def strategy(bars, index):
+        seen.append(engine.aligned_bars("alt")["close"][index])
+        return Report("buy") if index == 0 else None
+
+    engine.register_strategy(strategy)
+    engine.run_strategy("USDT", "BTC", 1000, 0, 0.1, start=102, end=500)
+    indexes = (np.arange(102, 500) + 1) // 5 - 1
+    np.testing.assert_array_equal(seen, alt["close"].to_numpy()[indexes])
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+from OpenBacktest.ObtUtility import BarView
+
+
+def test_columns_are_arrays(klines):
+    bars = BarView(klines)
+    close = bars["close"]
+    assert isinstance(close, np.ndarray)
+    assert close[10] == klines["close"].iloc[10]
+    assert bars["close"] is close
+
+
+def test_series_api_is_forwarded(klines):
+    klines["fast"] = klines["close"].rolling(5).mean()
+    bars = BarView(klines)
+    assert bars["close"].iloc[-1] == klines["close"].iloc[-1]
+    pd.testing.assert_series_equal(bars["close"].shift(1), klines["close"].shift(1))
+    pd.testing.assert_series_equal(bars["close"].rolling(3).mean(), klines["close"].rolling(3).mean())
+    assert bars["close"][5:10].iloc[0] == klines["close"].iloc[5]
+    assert isinstance(pd.Series(bars["close"]), pd.Series)
+
+
+def test_other_keys_are_forwarded(klines):
+    klines["fast"] = klines["close"].rolling(5).mean()
+    bars = BarView(klines)
+    pd.testing.assert_frame_equal(bars[["close", "fast"]], klines[["close", "fast"]])
+    pd.testing.assert_frame_equal(bars[2:5], klines[2:5])
+    assert len(bars[klines["close"] > klines["fast"]]) == (klines["close"] > klines["fast"]).sum()
+    assert bars.shape == klines.shape
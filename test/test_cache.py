@@ -0,0 +1,57 @@
+import numpy as np
+from OpenBacktest.ObtCache import iter_cache, read_cache, read_header, write_cache
+
+METADATA = {"symbol": "BTCUSDT", "start": "1 January 2021", "timeframe": "1m"}
+
+
+def write(klines, tmp_path):
+    path = str(tmp_path / "pair.obt")
+    write_cache(path, klines, METADATA)
+    return path
+
+
+def test_cache_round_trip_keeps_the_values_and_the_dtypes(klines, tmp_path):
+    klines["label"] = ["a", "bc"] * (len(klines) // 2)
+    path = write(klines, tmp_path)
+    for mmap in (True, False):
+        dataframe, header = read_cache(path, mmap=mmap)
+        assert list(dataframe.columns) == list(klines.columns)
+        for column in klines.columns:
+            values = np.asarray(dataframe[column])
+            assert values.dtype.kind == klines[column].to_numpy().dtype.kind or column == "label"
+            np.testing.assert_array_equal(values, klines[column].to_numpy())
+    assert header["symbol"] == "BTCUSDT"
+    assert header["rows"] == len(klines)
+    assert header["first_timestamp"] == int(klines["timestamp"].iloc[0])
+    assert header["last_timestamp"] == int(klines["timestamp"].iloc[-1])
+    assert all(column["offset"] % 64 == 0 for column in read_header(path)["columns"])
+
+
+def test_memory_mapped_columns_are_copy_on_write(klines, tmp_path):
+    path = write(klines, tmp_path)
+    dataframe = read_cache(path)[0]
+    base = np.asarray(dataframe["close"])
+    while not isinstance(base, np.memmap):
+        base = base.base
+    assert base.mode == "c"
+    dataframe.loc[:9, "close"] = -1.0
+    assert (dataframe["close"][:10] == -1.0).all()
+    # The file is left untouched
+    np.testing.assert_array_equal(np.asarray(read_cache(path)[0]["close"]), klines["close"].to_numpy())
+
+
+def test_chunks_cover_the_file(klines, tmp_path):
+    path = write(klines, tmp_path)
+    chunks = list(iter_cache(path, 300, columns=["close"]))
+    assert [start for start, chunk in chunks] == list(range(0, len(klines), 300))
+    assert all(list(chunk.columns) == ["close"] for start, chunk in chunks)
+    np.testing.assert_array_equal(np.concatenate([chunk["close"].to_numpy() for start, chunk in chunks]),
+                                  klines["close"].to_numpy())
+
+
+def test_empty_dataframe_round_trip(klines, tmp_path):
+    path = write(klines.iloc[:0], tmp_path)
+    dataframe, header = read_cache(path)
+    assert len(dataframe) == 0 and list(dataframe.columns) == list(klines.columns)
+    assert "first_timestamp" not in header
+    assert list(iter_cache(path, 100)) == []
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+from conftest import make_engine
+from OpenBacktest.ObtEngine import Report
+from OpenBacktest.ObtWallet import AsymmetricDataHandler, SymmetricDataHandler, get_drawdown
+
+DAY = 86400000
+
+
+# run a strategy buying and selling all at random bars, or buying twice in a row with asymmetric=True
+def run(klines, seed=0, asymmetric=False, open_trade=False):
+    rng = np.random.default_rng(seed)
+    orders = rng.choice([0, 1, -1], len(klines), p=[0.9, 0.05, 0.05])
+    if open_trade:
+        orders[-50:] = 0
+        orders[-20] = 1
+
+    def strategy(bars, index):
+        if orders[index] == 1:
+            return Report("buy", percent_amount=50 if asymmetric else 100)
+        if orders[index] == -1:
+            return Report("sell", percent_amount=100)
+
+    engine = make_engine(klines)
+    engine.register_strategy(strategy)
+    engine.run_strategy("USDT", "BTC", 1000, 0, 0.1)
+    return engine.wallet
+
+
+# statistics of the trades computed row by row over the wallet frame like make_data did before
+def make_reference(wallet):
+    frame = wallet.wallet_frame
+    buy_orders = frame.loc[frame["order_type"] == "BUY"].reset_index(drop=True)
+    sell_orders = frame.loc[frame["order_type"] == "SELL"].reset_index(drop=True)
+    reference = {"profits": [], "percent_profits": [], "exposure_time": 0, "best": None, "worst": None}
+    for index, buy_row in buy_orders.iterrows():
+        if index >= len(sell_orders):
+            break
+        sell_row = sell_orders.iloc[index]
+        profit = sell_row["equivalence"] - buy_row["equivalence"]
+        percent_profit = 100 * profit / buy_row["equivalence"]
+        reference["profits"].append(profit)
+        reference["percent_profits"].append(percent_profit)
+        reference["exposure_time"] += (sell_row["timestamp"] - buy_row["timestamp"]) / DAY
+        trade = profit, percent_profit, buy_row["timestamp"], sell_row["timestamp"]
+        if reference["best"] is None or percent_profit > reference["best"][1]:
+            reference["best"] = trade
+        if reference["worst"] is None or percent_profit < reference["worst"][1]:
+            reference["worst"] = trade
+
+    drawdown = (0, 0, 0, 0, 0)
+    rows = frame.loc[frame["order_type"] != "blank"]
+    ath = rows["equivalence"].iloc[0]
+    ath_timestamp = rows["timestamp"].iloc[0]
+    for index, row in rows.iterrows():
+        balance = row["equivalence"]
+        if balance >= ath:
+            ath = balance
+            ath_timestamp = row["timestamp"]
+        elif -100 * (ath - balance) / ath < drawdown[0]:
+            drawdown = (-100 * (ath - balance) / ath, balance, row["timestamp"], ath, ath_timestamp)
+    reference["drawdown"] = drawdown
+    return reference
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("open_trade", [False, True])
+def test_symmetric_statistics_match_the_row_by_row_ones(klines, seed, open_trade):
+    wallet = run(klines, seed, open_trade=open_trade)
+    handler = wallet.get_data_handler()
+    assert isinstance(handler, SymmetricDataHandler)
+    handler.make_data()
+    reference = make_reference(wallet)
+
+    # A trade left open is not counted
+    assert handler.total_trades == len(reference["profits"]) > 5
+    np.testing.assert_allclose(handler.trades["profit"], reference["profits"])
+    np.testing.assert_allclose(handler.trades_percent_profit, reference["percent_profits"])
+    positives = np.array(reference["profits"]) > 0
+    assert handler.total_positives_trades == positives.sum()
+    assert handler.total_negatives_trades == (~positives).sum()
+    assert handler.best_trade == pytest.approx(reference["best"])
+    assert handler.worst_trade == pytest.approx(reference["worst"])
+    assert handler.average_positive_trades == (round(np.mean(np.array(reference["profits"])[positives]), 2),
+                                               round(np.mean(np.array(reference["percent_profits"])[positives]), 2))
+    assert handler.average_profit_per_trades[0] == round(np.mean(reference["profits"]), 2)
+    assert (handler.drawdown, handler.balance_at_drawdown, handler.drawdown_timestamp, handler.last_ath,
+            handler.last_ath_timestamp) == pytest.approx(reference["drawdown"])
+
+    # Exposure is in days of 86400000 ms, like the trading time it's compared to
+    assert handler.exposure_time == pytest.approx(reference["exposure_time"])
+    assert handler.exposure_time == pytest.approx(handler.trades["exposure"].sum() / DAY)
+    assert handler.average_exposure_time == pytest.approx(reference["exposure_time"] / handler.total_trades)
+    assert handler.total_inday_trading_time == pytest.approx(
+        (handler.end - int(klines["timestamp"].iloc[0])) / DAY)
+
+
+def test_asymmetric_orders_are_counted(klines):
+    wallet = run(klines, asymmetric=True)
+    handler = wallet.get_data_handler()
+    assert isinstance(handler, AsymmetricDataHandler)
+    handler.make_data()
+    frame = wallet.wallet_frame
+    assert handler.total_buy_orders == (frame["order_type"] == "BUY").sum() > 0
+    assert handler.total_sell_orders == (frame["order_type"] == "SELL").sum() > 0
+    assert handler.total_orders == len(frame) - 1
+    assert handler.drawdown == pytest.approx(make_reference(wallet)["drawdown"][0])
+
+
+def test_drawdown_of_a_known_balance_history():
+    balances = np.array([100.0, 120.0, 90.0, 130.0, 104.0, 110.0])
+    timestamps = np.arange(6) * 10
+    assert get_drawdown(balances, timestamps) == (pytest.approx(-25.0), 90.0, 20, 120.0, 10)
+    assert get_drawdown(np.array([1.0, 2.0, 3.0]), np.arange(3)) == (0, 0, 0, 0, 0)
@@ -0,0 +1,112 @@
+import time
+import pytest
+from OpenBacktest.ObtBenchmark import make_synthetic_klines
+from OpenBacktest.ObtDownload import FakeAPIError, FakeKlineClient, KlineDownloader, WeightLimiter
+
+
+@pytest.fixture
+def bars():
+    return make_synthetic_klines(3500)
+
+
+def make_downloader(client, **parameters):
+    parameters.setdefault("output", False)
+    return KlineDownloader(client, workers=4, **parameters)
+
+
+def test_ranges_are_downloaded_in_pages(bars):
+    client = FakeKlineClient(bars)
+    downloader = make_downloader(client)
+    klines = downloader.download("BTCUSDT", "1m", int(bars["timestamp"].iloc[0]), int(bars["timestamp"].iloc[-1]))
+    downloader.close()
+    assert [kline[0] for kline in klines] == bars["timestamp"].tolist()
+    assert klines[0][1] == str(bars["open"].iloc[0])
+    # One request for the first kline, then one per range of limit klines
+    pages = client.requests[1:]
+    assert len(pages) == 4
+    assert all(page["limit"] == 1000 for page in pages)
+    pages.sort(key=lambda page: page["startTime"])
+    assert all(page["endTime"] + 1 == following["startTime"] for page, following in zip(pages, pages[1:]))
+
+
+def test_start_is_moved_to_the_first_kline(bars):
+    client = FakeKlineClient(bars)
+    downloader = make_downloader(client)
+    klines = downloader.download("BTCUSDT", "1m", 0, int(bars["timestamp"].iloc[1500]))
+    downloader.close()
+    assert len(klines) == 1501
+    assert len(client.requests) == 3
+
+
+def test_pages_are_followed_until_the_end(bars):
+    client = FakeKlineClient(bars)
+    downloader = make_downloader(client)
+    klines = downloader.download_chunk("BTCUSDT", "1M", int(bars["timestamp"].iloc[0]),
+                                       int(bars["timestamp"].iloc[-1]), follow=True)
+    downloader.close()
+    assert len(klines) == len(bars)
+    # Each page starts after the last kline of the previous one
+    timestamps = bars["timestamp"]
+    assert [request["startTime"] for request in client.requests] == \
+        [int(timestamps.iloc[0])] + [int(timestamps.iloc[i]) + 1 for i in (999, 1999, 2999)]
+
+
+def test_limiter_waits_for_the_weight_of_the_period():
+    limiter = WeightLimiter(limit=4, period=0.3)
+    start = time.monotonic()
+    limiter.acquire(2)
+    limiter.acquire(2)
+    assert time.monotonic() - start < 0.1
+    limiter.acquire(2)
+    assert time.monotonic() - start >= 0.3
+    assert limiter.used == 2
+
+
+def test_limiter_pause_blocks_requests():
+    limiter = WeightLimiter()
+    limiter.pause(0.2)
+    start = time.monotonic()
+    limiter.acquire(1)
+    assert time.monotonic() - start >= 0.2
+
+
+def test_retry_after_pauses_every_request(bars):
+    client = FakeKlineClient(bars, failures=[FakeAPIError(429, retry_after=0.3)])
+    downloader = make_downloader(client, backoff=0.01)
+    start = time.monotonic()
+    klines = downloader.request(symbol="BTCUSDT", interval="1m", startTime=0, limit=1)
+    downloader.close()
+    assert time.monotonic() - start >= 0.3
+    assert downloader.limiter.paused_until >= start + 0.3
+    assert klines[0][0] == bars["timestamp"].iloc[0]
+    assert len(client.requests) == 2
+
+
+def test_server_errors_are_retried_with_backoff(bars):
+    client = FakeKlineClient(bars, failures=[FakeAPIError(500), FakeAPIError(502), ConnectionError()])
+    downloader = make_downloader(client, backoff=0.05)
+    start = time.monotonic()
+    klines = downloader.request(symbol="BTCUSDT", interval="1m", startTime=0, limit=1)
+    downloader.close()
+    # 0.05 + 0.1 + 0.2 seconds of backoff
+    assert time.monotonic() - start >= 0.35
+    assert len(klines) == 1
+    assert len(client.requests) == 4
+
+
+def test_client_errors_are_not_retried(bars):
+    client = FakeKlineClient(bars, failures=[FakeAPIError(400)])
+    downloader = make_downloader(client, backoff=0.01)
+    with pytest.raises(FakeAPIError):
+        downloader.request(symbol="BTCUSDT", interval="1m", startTime=0, limit=1)
+    downloader.close()
+    assert len(client.requests) == 1
+
+
+def test_retries_are_limited(bars):
+    client = FakeKlineClient(bars, failures=[FakeAPIError(500)] * 3)
+    downloader = make_downloader(client, backoff=0.01, retries=2)
+    with pytest.raises(FakeAPIError):
+        downloader.request(symbol="BTCUSDT", interval="1m", startTime=0, limit=1)
+    downloader.close()
+    assert len(client.requests) == 3
@@ -0,0 +1,52 @@
+import pytest
+from conftest import make_engine
+from OpenBacktest.ObtEngine import Report
+from OpenBacktest.ObtEvents import KINDS, ORDER_FILLED, ORDER_SUBMITTED, PROGRESS, STOP_HIT, EventStream, SilentSink
+
+
+def strategy(bars, index):
+    return Report("buy" if index % 10 < 5 else "sell")
+
+
+# run the strategy and get the kinds of the events built by the engine
+def run(klines, monkeypatch, subscriptions):
+    engine = make_engine(klines)
+    sinks = [engine.events.subscribe(SilentSink(), kinds) for kinds in subscriptions]
+    built = []
+    emit = engine.events.emit
+
+    def record(kind, *arguments, **data):
+        built.append(kind)
+        emit(kind, *arguments, **data)
+    monkeypatch.setattr(engine.events, "emit", record)
+    engine.register_strategy(strategy)
+    engine.run_strategy("USDT", "BTC", 1000, 0, 0.1)
+    return set(built), sinks
+
+
+def test_wants_follows_subscribers():
+    events = EventStream()
+    assert not events.active and not any(events.wants(kind) for kind in KINDS)
+    progress = events.subscribe(SilentSink(), [PROGRESS])
+    assert events.active and events.wants(PROGRESS) and not events.wants(ORDER_FILLED)
+    every = events.subscribe(SilentSink())
+    assert all(events.wants(kind) for kind in KINDS)
+    events.unsubscribe(every)
+    assert events.wants(PROGRESS) and not events.wants(ORDER_SUBMITTED)
+    events.unsubscribe(progress)
+    assert not events.active and not events.wants(PROGRESS)
+
+
+@pytest.mark.parametrize("kinds", [[PROGRESS], [ORDER_FILLED], [ORDER_SUBMITTED, STOP_HIT]])
+def test_only_listened_kinds_are_built(klines, monkeypatch, kinds):
+    built, sinks = run(klines, monkeypatch, [kinds])
+    assert built <= set(kinds)
+    assert sum(sinks[0].counts.values()) > 0
+
+
+def test_every_kind_is_built_for_a_sink_of_all_kinds(klines, monkeypatch):
+    built, sinks = run(klines, monkeypatch, [None, [PROGRESS]])
+    assert {ORDER_SUBMITTED, ORDER_FILLED, PROGRESS} <= built
+    assert sinks[0].counts[ORDER_SUBMITTED] == len(klines)
+    assert sinks[0].counts[ORDER_FILLED] > 0
+    assert sinks[1].counts[ORDER_FILLED] == 0
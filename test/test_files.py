@@ -0,0 +1,101 @@
+import os
+import numpy as np
+import pandas as pd
+from OpenBacktest.ObtCache import read_cache
+from OpenBacktest.ObtClient import set_offline
+from OpenBacktest.ObtDownload import FakeKlineClient, KlineDownloader
+from OpenBacktest.ObtEngine import Container, Engine, Pair
+
+
+def make_pair(klines, folder):
+    pair = Pair("BTCUSDT", "1 January 2021", "1m", "main", folder)
+    pair.set_dataframe(klines)
+    return pair
+
+
+def test_save_writes_a_csv_file_and_the_cache_by_default(klines, tmp_path):
+    folder = str(tmp_path) + "/"
+    pair = make_pair(klines, folder)
+    pair.save(folder, output=False)
+    assert os.path.isfile(folder + pair.make_file_name("csv"))
+    assert os.path.isfile(pair.cache_path)
+    pd.testing.assert_frame_equal(pd.read_csv(folder + pair.make_file_name("csv")), klines, check_dtype=False)
+
+    loaded = make_pair(klines.iloc[:0], folder)
+    loaded.load(output=False)
+    assert list(loaded.dataframe.columns) == list(klines.columns)
+    for column in klines.columns:
+        np.testing.assert_array_equal(np.asarray(loaded.dataframe[column]), klines[column].to_numpy())
+
+
+def test_save_without_cache_only_writes_the_csv_file(klines, tmp_path):
+    folder = str(tmp_path) + "/"
+    pair = make_pair(klines, folder)
+    pair.save(folder, output=False, cache=False)
+    assert sorted(os.listdir(folder)) == [pair.make_file_name("csv")]
+
+
+def sync(pair, klines):
+    client = FakeKlineClient(klines)
+    downloader = KlineDownloader(client, workers=2, weight_limit=10 ** 9, output=False)
+    set_offline(False)
+    try:
+        pair.sync(output=False, downloader=downloader)
+    finally:
+        set_offline(True)
+        downloader.close()
+    return client
+
+
+def check_synced(pair, klines, folder):
+    for dataframe in (pair.dataframe, read_cache(pair.cache_path)[0]):
+        assert len(dataframe) == len(klines)
+        assert dataframe["timestamp"].tolist() == klines["timestamp"].tolist()
+        # Prices are parsed again from the strings of the API
+        for column in klines.columns:
+            np.testing.assert_allclose(np.asarray(dataframe[column]), klines[column].to_numpy(), rtol=1e-12)
+    # Files are written next to their path and then replaced
+    assert not [name for name in os.listdir(folder) if name.endswith(".tmp")]
+
+
+def test_sync_appends_the_new_bars_to_the_cache(klines, tmp_path):
+    folder = str(tmp_path) + "/"
+    cached = klines.iloc[:1500].copy()
+    # The last cached bar wasn't closed when it was saved
+    cached.loc[1499, "close"] = -1.0
+    make_pair(cached, folder).save_cache()
+    old = read_cache(make_pair(cached, folder).cache_path)[0]
+
+    pair = make_pair(klines.iloc[:0], folder)
+    client = sync(pair, klines)
+    assert client.requests[1]["startTime"] == int(klines["timestamp"].iloc[1499])
+    check_synced(pair, klines, folder)
+    # The file is replaced, a dataframe mapping the old file keeps its values
+    assert len(old) == 1500 and old["close"].iloc[-1] == -1.0
+
+    # Nothing new, the file keeps the same bars
+    sync(pair, klines)
+    check_synced(pair, klines, folder)
+
+
+def test_sync_appends_the_new_bars_to_the_csv_file(klines, tmp_path):
+    folder = str(tmp_path) + "/"
+    make_pair(klines.iloc[:1500], folder).save(folder, output=False, cache=False)
+    pair = make_pair(klines.iloc[:0], folder)
+    sync(pair, klines)
+    check_synced(pair, klines, folder)
+    np.testing.assert_array_equal(pd.read_csv(pair.path)["timestamp"].to_numpy(), klines["timestamp"].to_numpy())
+
+
+def test_engine_loads_the_pairs_with_workers(klines, tmp_path):
+    folder = str(tmp_path) + "/"
+    container = Container()
+    for name, timeframe in [("main", "1m"), ("alt", "5m")]:
+        pair = Pair("BTCUSDT", "1 January 2021", timeframe, name, folder)
+        pair.set_dataframe(klines)
+        pair.save(folder, output=False)
+        container.add_pair(Pair("BTCUSDT", "1 January 2021", timeframe, name, folder))
+    engine = Engine(container, output=False, workers=2)
+    for pair in engine.container.pairs.values():
+        assert pair.max_index == len(klines) - 1
+        np.testing.assert_array_equal(pair.timestamps, klines["timestamp"].to_numpy())
@@ -0,0 +1,42 @@
+import numpy as np
+from OpenBacktest.ObtEngine import Pair
+
+
+def make_pair(klines):
+    pair = Pair("BTCUSDT", "1 January 2021", "1m", "main")
+    pair.set_dataframe(klines)
+    return pair
+
+
+# index found by the scan over every timestamp used before the binary search
+def find_index(timestamps, timestamp):
+    closest = min(timestamps, key=lambda value: abs(value - timestamp))
+    index = timestamps.index(closest)
+    return index if closest <= timestamp else index - 1
+
+
+def test_get_index_finds_the_last_bar_opened_before_a_timestamp(klines):
+    pair = make_pair(klines)
+    timestamps = klines["timestamp"].tolist()
+    first, last = timestamps[0], timestamps[-1]
+    lookups = [first, last, last + 10 ** 9, first + 1, first + 59999, first + 60000]
+    lookups += np.random.default_rng(3).integers(first, last, 200).tolist()
+    for timestamp in lookups:
+        assert pair.get_index(timestamp) == find_index(timestamps, timestamp)
+    np.testing.assert_array_equal(pair.get_indexes(lookups), [find_index(timestamps, value) for value in lookups])
+
+
+def test_timestamps_older_than_the_dataframe_are_not_found(klines):
+    pair = make_pair(klines)
+    first = int(klines["timestamp"].iloc[0])
+    assert pair.get_index(first - 1) is None
+    assert pair.get_index(0) is None
+    assert pair.get_indexes([first - 1, first]).tolist() == [-1, 0]
+
+
+def test_timestamps_with_index_is_made_when_used(klines):
+    pair = make_pair(klines)
+    assert pair.timestamps_index is None
+    assert pair.timestamps_with_index[int(klines["timestamp"].iloc[25])] == 25
+    pair.set_dataframe(klines.iloc[10:].reset_index(drop=True))
+    assert pair.timestamps_with_index[int(klines["timestamp"].iloc[25])] == 15
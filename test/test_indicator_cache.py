@@ -0,0 +1,96 @@
+import json
+import os
+import numpy as np
+from OpenBacktest.ObtBenchmark import make_synthetic_klines
+from OpenBacktest.ObtEngine import Pair
+from OpenBacktest.ObtIndicatorCache import IndicatorCache
+from OpenBacktest.ObtIndicators import bollinger, ema
+
+
+# make a pair holding synthetic klines
+def make_pair(rows=300):
+    pair = Pair("BTCUSDT", "1 January 2021", "1m", "main")
+    pair.set_dataframe(make_synthetic_klines(rows))
+    return pair
+
+
+def test_hit_after_a_restart(tmp_path):
+    pair = make_pair()
+    with IndicatorCache(str(tmp_path)) as cache:
+        values = cache.get(pair, "ema", window=20)
+        assert (cache.hits, cache.misses) == (0, 1)
+    with IndicatorCache(str(tmp_path)) as cache:
+        np.testing.assert_array_equal(cache.get(pair, "ema", window=20), values)
+        np.testing.assert_array_equal(values, ema(pair.dataframe["close"], 20))
+        assert (cache.hits, cache.misses) == (1, 0)
+        # Other parameters are another entry
+        cache.get(pair, "ema", window=30)
+        assert cache.misses == 1
+
+
+def test_hits_write_the_index_on_close(tmp_path):
+    pair = make_pair()
+    cache = IndicatorCache(str(tmp_path))
+    cache.get(pair, "ema", window=20)
+    index_path = os.path.join(str(tmp_path), "index.json")
+    before = json.load(open(index_path))
+    os.utime(index_path, (0, 0))
+
+    cache.get(pair, "ema", window=20)
+    assert os.path.getmtime(index_path) == 0
+    cache.close()
+    after = json.load(open(index_path))
+    key = next(iter(after))
+    assert after[key]["last_used"] > before[key]["last_used"]
+
+
+def test_changed_bars_invalidate_the_entry(tmp_path):
+    pair = make_pair()
+    cache = IndicatorCache(str(tmp_path))
+    cache.get(pair, "rsi", window=14)
+    pair.dataframe.loc[100, "close"] += 1
+    values = cache.get(pair, "rsi", window=14)
+    assert (cache.hits, cache.misses) == (0, 2)
+    # The stale entry was replaced
+    assert len(cache.entries) == 1
+    assert len([name for name in os.listdir(str(tmp_path)) if name.endswith(".obt")]) == 1
+    np.testing.assert_array_equal(IndicatorCache(str(tmp_path)).get(pair, "rsi", window=14), values)
+
+
+def test_functions_are_part_of_the_key(tmp_path):
+    pair = make_pair()
+    cache = IndicatorCache(str(tmp_path))
+    doubled = cache.get(pair, "custom", lambda close: close * 2)
+    roots = cache.get(pair, "custom", np.sqrt)
+    assert cache.misses == 2
+    np.testing.assert_allclose(roots, np.sqrt(pair.dataframe["close"]))
+    np.testing.assert_allclose(doubled, pair.dataframe["close"] * 2)
+    cache.get(pair, "custom", np.sqrt, version=2)
+    assert cache.misses == 3
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    pair = make_pair()
+    cache = IndicatorCache(str(tmp_path))
+    cache.get(pair, "sma", window=5)
+    size = cache.get_size()
+    cache.max_size = int(size * 2.5)
+    cache.get(pair, "sma", window=10)
+    cache.get(pair, "sma", window=5)
+    cache.get(pair, "sma", window=15)
+    windows = sorted(json.loads(entry["parameters"])["window"] for entry in cache.entries.values())
+    assert windows == [5, 15]
+    assert cache.get_size() <= cache.max_size
+    assert sorted(IndicatorCache(str(tmp_path)).entries) == sorted(cache.entries)
+
+
+def test_tuple_outputs(tmp_path):
+    pair = make_pair()
+    cache = IndicatorCache(str(tmp_path))
+    cache.add_column(pair, "bands", "bollinger", window=20, window_dev=2)
+    cache.close()
+    values = IndicatorCache(str(tmp_path)).get(pair, "bollinger", window=20, window_dev=2)
+    assert isinstance(values, tuple) and len(values) == 3
+    for i, expected in enumerate(bollinger(pair.dataframe["close"], 20, 2)):
+        np.testing.assert_array_equal(values[i], expected)
+        np.testing.assert_array_equal(pair.dataframe["bands_" + str(i)], expected)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from ta.momentum import RSIIndicator
+from ta.trend import MACD as TaMACD, EMAIndicator, SMAIndicator
+from ta.volatility import AverageTrueRange, BollingerBands
+from OpenBacktest.ObtIndicators import ATR, EMA, MACD, RSI, SMA, Bollinger, atr, bollinger, ema, macd, rsi, \
+    run_indicator, sma
+
+
+@pytest.mark.parametrize("window", [5, 14, 50])
+def test_single_value_indicators_match_ta(klines, window):
+    close = klines["close"]
+    expected = {"ema": EMAIndicator(close, window).ema_indicator().to_numpy(),
+                "sma": SMAIndicator(close, window).sma_indicator().to_numpy(),
+                "rsi": RSIIndicator(close, window).rsi().to_numpy()}
+    for name, indicator, function in (("ema", EMA, ema), ("sma", SMA, sma), ("rsi", RSI, rsi)):
+        assert np.allclose(run_indicator(indicator(window), close), expected[name], equal_nan=True), name
+        assert np.allclose(function(close, window), expected[name], equal_nan=True), name
+
+
+@pytest.mark.parametrize("window", [5, 14, 50])
+def test_atr_matches_ta_after_its_first_value(klines, window):
+    high, low, close = klines["high"], klines["low"], klines["close"]
+    expected = AverageTrueRange(high, low, close, window).average_true_range().to_numpy()
+    for values in (run_indicator(ATR(window), high, low, close), atr(high, low, close, window)):
+        # ta fills the bars before the first value with 0 where ObtIndicators gives nan
+        assert np.isnan(values[:window - 1]).all()
+        assert (expected[:window - 1] == 0).all()
+        assert np.allclose(values[window - 1:], expected[window - 1:])
+
+
+def test_bollinger_matches_ta(klines):
+    close = klines["close"]
+    bands = BollingerBands(close, 20, 2)
+    expected = (bands.bollinger_mavg(), bands.bollinger_hband(), bands.bollinger_lband())
+    for values in (run_indicator(Bollinger(20, 2), close), bollinger(close, 20, 2)):
+        for column, expected_column in zip(values, expected):
+            assert np.allclose(column, expected_column.to_numpy(), equal_nan=True)
+
+
+def test_macd_matches_ta(klines):
+    close = klines["close"]
+    indicator = TaMACD(close, 26, 12, 9)
+    expected = (indicator.macd(), indicator.macd_signal(), indicator.macd_diff())
+    for values in (run_indicator(MACD(26, 12, 9), close), macd(close, 26, 12, 9)):
+        for column, expected_column in zip(values, expected):
+            assert np.allclose(column, expected_column.to_numpy(), equal_nan=True)
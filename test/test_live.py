@@ -0,0 +1,122 @@
+import asyncio
+import time
+import numpy as np
+from conftest import make_engine
+from OpenBacktest.ObtEngine import Report
+from OpenBacktest.ObtIndicators import EMA, ema
+from OpenBacktest.ObtLive import FakeKlineServer, LiveRunner
+
+HISTORY = 1500
+
+
+def make_strategy(engine):
+    def strategy(bars, index):
+        fast = bars["fast"]
+        slow = bars["slow"]
+        if fast[index] > slow[index] and fast[index - 1] <= slow[index - 1]:
+            engine.set_stop_loss(index, percent_target=-0.3)
+            return Report("buy")
+        if fast[index] < slow[index] and fast[index - 1] >= slow[index - 1]:
+            return Report("sell")
+    return strategy
+
+
+# run the strategy on the history and then on the live bars sent by a fake stream
+def run_live(klines, server=None, runner=None, **parameters):
+    engine = make_engine(klines.iloc[:HISTORY].copy())
+    engine.register_strategy(make_strategy(engine))
+
+    async def main():
+        async with FakeKlineServer(klines.iloc[HISTORY:], **dict({"updates": 2}, **(server or {}))) as fake:
+            live = LiveRunner(engine, "USDT", "BTC", 1000, 0, 0.1, url=fake.url, client=fake.client,
+                              indicators={"fast": (EMA(10), ("close",)), "slow": (EMA(40), ("close",))},
+                              **dict({"retries": 0}, **(runner or {})))
+            wallet = await live.run(**parameters)
+            return live, wallet, fake.client
+    return asyncio.run(main())
+
+
+# check the bars and the orders of a live run against a backtest of the strategy called from the first live bar
+def check_backtest(klines, runner, wallet):
+    for column in ("timestamp", "open", "high", "low", "close", "volume"):
+        np.testing.assert_array_equal(runner.bars[column], klines[column].to_numpy())
+    np.testing.assert_array_equal(runner.bars["fast"], ema(klines["close"], 10))
+
+    full = klines.copy()
+    full["fast"] = ema(full["close"], 10)
+    full["slow"] = ema(full["close"], 40)
+    engine = make_engine(full)
+    strategy = make_strategy(engine)
+    engine.register_strategy(lambda bars, index: strategy(bars, index) if index >= HISTORY else None)
+    engine.run_strategy("USDT", "BTC", 1000, 0, 0.1, finish=False)
+    expected = engine.wallet.ledger
+    assert wallet.ledger.length == expected.length > 3
+    for column, values in expected.arrays.items():
+        np.testing.assert_array_equal(values[:expected.length], wallet.ledger.arrays[column][:expected.length])
+    assert wallet.ledger.arrays["index"][1] >= HISTORY
+
+
+def test_live_run_matches_a_backtest(klines):
+    runner, wallet, client = run_live(klines)
+    assert client.requests == []
+    # Only closed bars are added, with the values of the closing message
+    assert runner.closed == len(klines) - HISTORY
+    assert len(runner.bars) == len(klines)
+    check_backtest(klines, runner, wallet)
+
+    report = runner.get_latency()
+    assert report["bars"] == runner.closed
+    assert set(report["phases"]) == {"parse", "indicators", "stops", "strategy", "orders"}
+
+
+def test_live_run_reconnects_and_downloads_missed_bars(klines):
+    runner, wallet, client = run_live(klines, server={"drop_after": 100, "gap": 30},
+                                      runner={"retries": 2, "backoff": 0.01}, max_bars=len(klines) - HISTORY,
+                                      timeout=30)
+    assert runner.reconnections == 4
+    assert runner.closed == len(klines) - HISTORY
+    # Missed bars come from the client, from the bar after the last one received
+    assert [request["startTime"] for request in client.requests] == \
+        [int(klines["timestamp"][HISTORY + i]) + 1 for i in (99, 229, 359, 489)]
+    check_backtest(klines, runner, wallet)
+
+
+def test_live_run_stops(klines):
+    runner, wallet, client = run_live(klines, max_bars=50)
+    assert runner.closed == 50
+    assert len(runner.bars) == HISTORY + 50
+    assert len(wallet.dataframe) == HISTORY + 50
+
+    start = time.monotonic()
+    runner, wallet, client = run_live(klines, server={"interval": 0.05}, timeout=0.3)
+    assert time.monotonic() - start < 2
+    assert 0 < runner.closed < 20
+
+    # A stream dropped without new bars ends the run once the retries are used
+    runner, wallet, client = run_live(klines, server={"drop_after": 0}, runner={"retries": 2, "backoff": 0.01})
+    assert (runner.closed, runner.reconnections) == (0, 2)
+    assert len(wallet.dataframe) == HISTORY
+
+
+def test_live_bars_keep_the_series_api(klines):
+    means = {}
+    engine = make_engine(klines.iloc[:HISTORY].copy())
+
+    def strategy(bars, index):
+        means[index] = bars["close"].rolling(5).mean().iloc[-1]
+    engine.register_strategy(strategy)
+
+    async def main():
+        async with FakeKlineServer(klines.iloc[HISTORY:HISTORY + 20]) as server:
+            await LiveRunner(engine, "USDT", "BTC", 1000, 0, 0.1, url=server.url, retries=0).run()
+    asyncio.run(main())
+    expected = klines["close"].rolling(5).mean().to_numpy()
+    assert sorted(means) == list(range(HISTORY, HISTORY + 20))
+    np.testing.assert_allclose([means[index] for index in sorted(means)], expected[HISTORY:HISTORY + 20])
+
+
+def test_live_run_needs_a_bar_strategy(klines):
+    engine = make_engine(klines)
+    engine.register_strategy(lambda dataframe: None, vectorized=True)
+    runner = LiveRunner(engine, "USDT", "BTC", 1000, 0, 0.1, url="ws://127.0.0.1:1")
+    assert runner.start() is None
@@ -0,0 +1,67 @@
+import math
+import statistics
+import numpy as np
+import pytest
+from conftest import make_engine
+from OpenBacktest.ObtEngine import Report
+from OpenBacktest.ObtMetrics import get_periods_per_year, get_risk_metrics, make_drawdowns, make_equity
+
+DAY = 86400000
+EQUITY = [100.0, 120.0, 90.0, 100.0, 130.0, 117.0, 140.0]
+
+
+def test_drawdowns_of_a_known_equity_curve():
+    drawdowns, last_aths = make_drawdowns(np.array(EQUITY))
+    np.testing.assert_allclose(drawdowns, [0, 0, -25, -100 / 6, 0, -10, 0])
+    assert last_aths.tolist() == [0, 1, 1, 1, 4, 4, 6]
+
+
+def test_risk_metrics_of_a_known_equity_curve():
+    timestamps = np.arange(len(EQUITY)) * DAY
+    metrics = get_risk_metrics(EQUITY, timestamps, risk_free=3.65)
+    assert metrics["max_drawdown"] == pytest.approx(-25)
+    assert metrics["max_drawdown_timestamp"] == 2 * DAY
+    # Under the ATH of the second bar until the fifth one
+    assert metrics["max_drawdown_duration"] == 2 * DAY
+    assert metrics["max_drawdown_duration_bars"] == 2
+
+    returns = [after / before - 1 for before, after in zip(EQUITY, EQUITY[1:])]
+    excess = [value - 0.0365 / 365 for value in returns]
+    deviation = statistics.stdev(returns)
+    assert metrics["annual_return"] == pytest.approx(100 * (1.4 ** (365 / 6) - 1))
+    assert metrics["volatility"] == pytest.approx(100 * deviation * math.sqrt(365))
+    assert metrics["sharpe"] == pytest.approx(statistics.mean(excess) / deviation * math.sqrt(365))
+    downside = math.sqrt(sum(min(value, 0) ** 2 for value in excess) / len(excess))
+    assert metrics["sortino"] == pytest.approx(statistics.mean(excess) / downside * math.sqrt(365))
+    assert metrics["calmar"] == pytest.approx(metrics["annual_return"] / 25)
+
+
+def test_risk_metrics_without_risk():
+    timestamps = np.arange(5) * 60000
+    metrics = get_risk_metrics([100.0, 101.0, 102.0, 103.0, 104.0], timestamps)
+    assert metrics["max_drawdown"] == 0 and metrics["max_drawdown_duration"] == 0
+    assert metrics["sortino"] is None and metrics["calmar"] is None
+    assert get_periods_per_year(timestamps) == 365 * 24 * 60
+    assert get_risk_metrics([100.0], [0])["sharpe"] is None
+
+
+def test_equity_values_the_balances_at_each_close():
+    closes = np.array([10.0, 11.0, 12.0, 9.0, 8.0])
+    # Initial row, a buy at bar 1 and a sell at bar 3
+    equity = make_equity(np.array([-1, 1, 3]), np.array([100.0, 0.0, 90.0]), np.array([0.0, 9.0, 0.0]), closes)
+    np.testing.assert_allclose(equity, [100, 99, 108, 90, 90])
+
+
+def test_wallet_risk_metrics_use_the_equity_of_each_bar(klines):
+    def strategy(bars, index):
+        if index == 0:
+            return Report("buy")
+
+    engine = make_engine(klines)
+    engine.register_strategy(strategy)
+    engine.run_strategy("USDT", "BTC", 1000, 0, 0)
+    closes = klines["close"].to_numpy()
+    np.testing.assert_allclose(engine.get_equity(), 1000 * closes / closes[0])
+    metrics = engine.wallet.get_risk_metrics()
+    assert metrics == pytest.approx(get_risk_metrics(1000 * closes / closes[0], klines["timestamp"].to_numpy()))
+    assert metrics["max_drawdown"] == pytest.approx(make_drawdowns(closes)[0].min())
@@ -0,0 +1,24 @@
+import pytest
+from OpenBacktest.ObtNumeric import FixedPointBackend
+from OpenBacktest.ObtWallet import Wallet
+
+BACKENDS = ["float", "decimal", FixedPointBackend("0.01", "0.00001")]
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=["float", "decimal", "fixed"])
+@pytest.mark.parametrize("percent_amount", [None, 100])
+def test_full_orders_empty_the_balance(klines, backend, percent_amount):
+    wallet = Wallet("USDT", "BTC", 1000, 0, 0.1, klines, backend=backend)
+    for index in range(1, 200, 2):
+        wallet.buy(index, percent_amount=percent_amount)
+        assert wallet.current_coin_balance == 0
+        wallet.sell(index + 1, percent_amount=percent_amount)
+        assert wallet.current_token_balance == 0
+    assert wallet.ledger.length == 201
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=["float", "decimal", "fixed"])
+def test_partial_order(klines, backend):
+    wallet = Wallet("USDT", "BTC", 1000, 0, 0.1, klines, backend=backend)
+    wallet.buy(1, percent_amount=25)
+    assert wallet.current_coin_balance == pytest.approx(750)
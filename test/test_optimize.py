@@ -0,0 +1,77 @@
+from multiprocessing import shared_memory
+import pandas as pd
+import pytest
+from conftest import make_engine
+from OpenBacktest import ObtEngine
+from OpenBacktest.ObtEngine import Report
+from OpenBacktest.ObtShared import SharedMarketData
+
+
+def make_strategy(fast=5, slow=30):
+    def strategy(bars, index):
+        if index < slow:
+            return None
+        close = bars["close"]
+        if close[index - fast:index + 1].mean() > close[index - slow:index + 1].mean():
+            return Report("buy")
+        return Report("sell")
+    return strategy
+
+
+def user_strategy(bars, index):
+    return None
+
+
+def test_in_process_runs_leave_the_engine_untouched(klines):
+    engine = make_engine(klines)
+    engine.register_strategy(user_strategy)
+    engine.run_strategy("USDT", "BTC", 1000, 0, 0.1)
+    wallet = engine.wallet
+    bars = engine.bars
+
+    results = engine.optimize(make_strategy, {"fast": [3, 5], "slow": [20, 40]}, "USDT", "BTC", 1000, 0, 0.1,
+                              workers=1)
+    assert len(results) == 4
+    folds = engine.walk_forward(make_strategy, {"fast": [3, 5]}, 800, 400, "USDT", "BTC", 1000, 0, 0.1, workers=1)
+    assert len(folds) > 0
+
+    assert engine.strategy is user_strategy
+    assert not engine.vectorized
+    assert engine.wallet is wallet
+    assert engine.bars is bars
+
+
+
+def test_workers_give_the_results_of_one_process(klines):
+    engine = make_engine(klines)
+    grid = {"fast": [3, 5], "slow": [20, 40]}
+    results = engine.optimize(make_strategy, grid, "USDT", "BTC", 1000, 0, 0.1, workers=1)
+    assert len(results) == 4
+    pd.testing.assert_frame_equal(engine.optimize(make_strategy, grid, "USDT", "BTC", 1000, 0, 0.1, workers=2),
+                                  results)
+    folds = engine.walk_forward(make_strategy, grid, 800, 400, "USDT", "BTC", 1000, 0, 0.1, workers=1)
+    assert len(folds) > 0
+    pd.testing.assert_frame_equal(engine.walk_forward(make_strategy, grid, 800, 400, "USDT", "BTC", 1000, 0, 0.1,
+                                                      workers=2), folds)
+
+
+# SharedMarketData keeping the names of the shared memory it published
+class RecordedSharedMarketData(SharedMarketData):
+    names = []
+
+    def __init__(self, container, output=True):
+        super().__init__(container, output)
+        RecordedSharedMarketData.names += [memory.name for memory in self.memories]
+
+
+def test_shared_memory_is_freed_after_the_runs(klines, monkeypatch):
+    monkeypatch.setattr(ObtEngine, "SharedMarketData", RecordedSharedMarketData)
+    engine = make_engine(klines)
+    engine.optimize(make_strategy, {"fast": [3, 5]}, "USDT", "BTC", 1000, 0, 0.1, workers=2)
+    engine.walk_forward(make_strategy, {"fast": [3, 5]}, 800, 400, "USDT", "BTC", 1000, 0, 0.1, workers=2)
+
+    # One segment per column for each pool, unlinked when the pool is closed
+    assert len(RecordedSharedMarketData.names) == 2 * len(klines.columns)
+    for name in RecordedSharedMarketData.names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
@@ -0,0 +1,108 @@
+import numpy as np
+from conftest import make_engine
+from OpenBacktest.ObtBenchmark import make_synthetic_klines
+from OpenBacktest.ObtEngine import Container, Pair, Report
+from OpenBacktest.ObtPortfolio import PortfolioEngine
+
+
+# make a portfolio engine without output on some pairs
+def make_portfolio(names=("BTCUSDT", "ETHUSDT"), rows=500):
+    container = Container()
+    for name in names:
+        pair = Pair(name, "1 January 2021", "1m", name)
+        pair.set_dataframe(make_synthetic_klines(rows))
+        container.add_pair(pair)
+    return PortfolioEngine(container, output=False, load=False)
+
+
+def test_metrics_need_a_run(capsys):
+    portfolio = make_portfolio()
+    assert portfolio.get_metrics() is None
+    assert "Error" in capsys.readouterr().out
+
+    def strategy(bars, closed):
+        return [Report("buy" if index % 100 == 10 else "sell", percent_amount=50, pair=name)
+                for name, index in closed.items() if index % 50 == 10]
+    portfolio.register_strategy(strategy)
+    portfolio.run_strategy("USDT", 1000, 0.1)
+    metrics = portfolio.get_metrics()
+    assert metrics["total_orders"] == sum(metrics["orders_per_pair"].values()) > 0
+    # 5 buys, 5 half sells and the last sell of the run
+    assert metrics["orders_per_pair"] == {"BTCUSDT": 11, "ETHUSDT": 11}
+
+
+def test_one_call_per_close_time():
+    portfolio = make_portfolio(("BTCUSDT", "ETHUSDT", "BNBUSDT"))
+    calls = []
+    portfolio.register_strategy(lambda bars, closed: calls.append(dict(closed)))
+    portfolio.run_strategy("USDT", 1000, 0.1)
+    assert len(calls) == len(portfolio.timeline) == 500
+    assert all(closed == {"BTCUSDT": i, "ETHUSDT": i, "BNBUSDT": i} for i, closed in enumerate(calls))
+
+
+# buy with a take profit and a stop loss, sell later if no stop was hit
+def make_orders(index):
+    if index % 100 == 10:
+        return "buy"
+    if index % 100 == 60:
+        return "sell"
+    return None
+
+
+def test_stops_match_the_engine(klines):
+    klines = klines.iloc[:1000]
+    engine = make_engine(klines)
+
+    def strategy(bars, index):
+        order = make_orders(index)
+        if order == "buy":
+            engine.set_take_profit(index, percent_target=0.4)
+            engine.set_stop_loss(index, percent_target=-0.3)
+        if order is not None:
+            return Report(order)
+    engine.register_strategy(strategy)
+    engine.run_strategy("USDT", "BTC", 1000, 0, 0.1)
+
+    container = Container()
+    pair = Pair("BTCUSDT", "1 January 2021", "1m", "BTCUSDT")
+    pair.set_dataframe(klines)
+    container.add_pair(pair)
+    portfolio = PortfolioEngine(container, output=False, load=False)
+
+    def portfolio_strategy(bars, closed):
+        index = closed["BTCUSDT"]
+        order = make_orders(index)
+        if order == "buy":
+            portfolio.set_take_profit("BTCUSDT", index, percent_target=0.4)
+            portfolio.set_stop_loss("BTCUSDT", index, percent_target=-0.3)
+        if order is not None:
+            return Report(order)
+    portfolio.register_strategy(portfolio_strategy)
+    portfolio.run_strategy("USDT", 1000, 0.1)
+
+    # The first row of the engine ledger is the initial balance
+    expected = {column: engine.wallet.ledger.get(column)[1:] for column in engine.wallet.ledger.columns}
+    ledger = portfolio.wallet.ledger
+    assert ledger.length == len(expected["index"]) > 10
+    # Some orders are stops filled away from the close
+    assert (expected["price"] != klines["close"].to_numpy()[expected["index"]]).any()
+    for column in ("index", "order_type", "price", "coin_balance", "token_balance"):
+        np.testing.assert_allclose(ledger.get(column), expected[column])
+
+
+def test_pairs_of_other_timeframes_close_at_their_time(klines):
+    minutes = klines.iloc[:300].reset_index(drop=True)
+    hours = minutes.iloc[::3].reset_index(drop=True)
+    hours["close_time"] = hours["timestamp"] + 3 * 60000 - 1
+    container = Container()
+    for name, timeframe, dataframe in (("BTCUSDT", "1m", minutes), ("ETHUSDT", "3m", hours)):
+        pair = Pair(name, "1 January 2021", timeframe, name)
+        pair.set_dataframe(dataframe)
+        container.add_pair(pair)
+    portfolio = PortfolioEngine(container, output=False, load=False)
+    calls = []
+    portfolio.register_strategy(lambda bars, closed: calls.append(dict(closed)))
+    portfolio.run_strategy("USDT", 1000, 0.1)
+    assert len(calls) == 300
+    for i, closed in enumerate(calls):
+        assert closed == ({"BTCUSDT": i, "ETHUSDT": i // 3} if i % 3 == 2 else {"BTCUSDT": i})
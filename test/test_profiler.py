@@ -0,0 +1,45 @@
+import numpy as np
+from conftest import make_engine
+from OpenBacktest.ObtEngine import Report
+from OpenBacktest.ObtProfiler import BAR_PHASES, Profiler
+
+
+def strategy(bars, index):
+    return Report("buy" if index % 20 < 10 else "sell")
+
+
+def run(klines, profile):
+    engine = make_engine(klines)
+    engine.register_strategy(strategy)
+    engine.run_strategy("USDT", "BTC", 1000, 0, 0.1, profile=profile)
+    return engine
+
+
+def test_profile_does_not_change_the_run(klines):
+    plain = run(klines, False)
+    profiled = run(klines, True)
+    assert plain.wallet.ledger.length == profiled.wallet.ledger.length
+    for column, values in plain.wallet.ledger.arrays.items():
+        np.testing.assert_array_equal(values[:plain.wallet.ledger.length],
+                                      profiled.wallet.ledger.arrays[column][:plain.wallet.ledger.length])
+
+
+def test_profile_report(klines):
+    engine = run(klines, True)
+    profiler = engine.profiler
+    assert profiler.length == len(klines)
+    assert profiler.stamps.dtype == np.int64
+    report = engine.get_profile(slowest=3)
+    assert report["bars"] == len(klines)
+    assert set(BAR_PHASES) <= set(report["phases"])
+    assert len(report["slowest_bars"]) == 3
+    assert all(phase["total"] >= 0 for phase in report["phases"].values())
+
+
+def test_profiler_grows():
+    profiler = Profiler(capacity=2)
+    for index in range(5):
+        profiler.record(index, (0, 1, 3, 6, 10))
+    assert profiler.length == 5
+    np.testing.assert_array_equal(profiler.get_bar_times(), [[1, 2, 3, 4]] * 5)
+    assert profiler.get_report()["slowest_bars"][0]["index"] in range(5)
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from conftest import make_engine
+from OpenBacktest.ObtEngine import Report, Signals
+from OpenBacktest.ObtEvents import ORDER_FILLED, ORDER_SUBMITTED, SilentSink
+from OpenBacktest.ObtNumeric import FixedPointBackend
+
+BACKENDS = ["float", "decimal", FixedPointBackend("0.01", "0.00001")]
+SEEDS = range(8)
+
+
+# make random signals with runs of orders in the same direction
+def make_signals(length, seed, sizing, stops=False):
+    rng = np.random.default_rng(seed)
+    orders = np.repeat(rng.choice([-1, 0, 1], size=length // 5 + 1, p=[0.3, 0.4, 0.3]), 5)[:length]
+    orders = np.where(rng.random(length) < 0.3, 0, orders)
+    amount = None
+    percent_amount = None
+    if sizing == "percent":
+        percent_amount = np.where(rng.random(length) < 0.5, 100, rng.uniform(10, 90, length).round(2))
+    elif sizing == "amount":
+        amount = np.where(orders == 1, rng.uniform(100, 600, length).round(2), rng.uniform(1, 6, length).round(3))
+    if stops:
+        return Signals(orders, amount, percent_amount, take_profit=0.4, stop_loss=-0.3)
+    return Signals(orders, amount, percent_amount)
+
+
+# bar strategy giving the same orders as signals, stops are set after a buy that fills like run_signals does and
+# removed by the engine on each sell
+def make_strategy(engine, signals):
+    length = len(signals.orders)
+    orders = signals.get_orders()
+    amounts = signals.get_amounts(length)
+    percent_amounts = signals.get_percent_amounts(length)
+
+    def strategy(bars, index):
+        order = orders[index]
+        if order == 0:
+            return None
+        amount = None if np.isnan(amounts[index]) else float(amounts[index])
+        percent_amount = None if np.isnan(percent_amounts[index]) else float(percent_amounts[index])
+        if signals.has_stops():
+            # stops only go with full orders
+            if order == 1 and engine.wallet.coin_value > 0:
+                engine.stops.clear()
+                engine.set_take_profit(index, percent_target=signals.take_profit)
+                engine.set_stop_loss(index, percent_target=signals.stop_loss)
+        return Report("buy" if order == 1 else "sell", amount, percent_amount)
+    return strategy
+
+
+def run(klines, strategy, vectorized, backend, listen):
+    engine = make_engine(klines)
+    sink = engine.events.subscribe(SilentSink(), [ORDER_SUBMITTED, ORDER_FILLED]) if listen else None
+    engine.register_strategy(strategy(engine), vectorized)
+    engine.run_strategy("USDT", "BTC", 1000, 0, 0.1, backend=backend)
+    return engine.wallet.ledger, sink
+
+
+def assert_same_ledger(a, b):
+    assert a.length == b.length
+    for column, values in a.arrays.items():
+        np.testing.assert_array_equal(values[:a.length], b.arrays[column][:b.length], err_msg=column)
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=["float", "decimal", "fixed"])
+@pytest.mark.parametrize("sizing,stops", [("full", False), ("percent", False), ("amount", False), ("full", True)])
+@pytest.mark.parametrize("listen", [False, True], ids=["silent", "listened"])
+def test_signals_match_bars(klines, backend, sizing, stops, listen):
+    for seed in SEEDS:
+        signals = make_signals(len(klines), seed, sizing, stops)
+        bars_ledger, bars_sink = run(klines, lambda engine: make_strategy(engine, signals), False, backend, listen)
+        signals_ledger, signals_sink = run(klines, lambda engine: lambda dataframe: signals, True, backend, listen)
+        assert_same_ledger(bars_ledger, signals_ledger)
+        if listen:
+            assert bars_sink.counts == signals_sink.counts
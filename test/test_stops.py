@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+from conftest import make_engine
+from OpenBacktest.ObtBenchmark import make_synthetic_klines
+from OpenBacktest.ObtEngine import Report
+from OpenBacktest.ObtEvents import STOP_HIT
+from OpenBacktest.ObtStops import SCAN_BLOCK, STOP_LOSS, TAKE_PROFIT, TRAILING_STOP, Stops
+
+
+# make klines from (open, high, low, close) rows
+def make_klines(rows):
+    klines = make_synthetic_klines(len(rows))
+    for column, values in zip(["open", "high", "low", "close"], np.array(rows, dtype=float).T):
+        klines[column] = values
+    return klines
+
+
+def make_bars(rows):
+    return {column: values.to_numpy() for column, values in make_klines(rows)[["open", "high", "low", "close"]].items()}
+
+
+def find_hit(rows, take_profit=None, stop_loss=None):
+    stops = Stops()
+    stops.index = 0
+    stops.take_profit = take_profit
+    stops.stop_loss = stop_loss
+    stops.find_hit(make_bars(rows))
+    return stops.hit_index, stops.hit_price, stops.hit_kind
+
+
+def test_stops_are_hit_by_the_high_or_the_low_of_a_bar():
+    rows = [(100, 100, 100, 100), (100, 105, 99, 101), (101, 102, 95, 100)]
+    assert find_hit(rows, take_profit=104) == (1, 104, TAKE_PROFIT)
+    assert find_hit(rows, stop_loss=96) == (2, 96, STOP_LOSS)
+    assert find_hit(rows, take_profit=110, stop_loss=90) == (None, None, None)
+
+
+def test_stops_are_active_from_the_next_bar():
+    rows = [(100, 120, 80, 100), (100, 101, 99, 100)]
+    assert find_hit(rows, take_profit=110, stop_loss=90) == (None, None, None)
+
+
+def test_stop_loss_wins_when_both_stops_are_hit_in_a_bar():
+    rows = [(100, 100, 100, 100), (100, 105, 95, 101)]
+    assert find_hit(rows, take_profit=104, stop_loss=96) == (1, 96, STOP_LOSS)
+
+
+def test_gaps_fill_at_the_open():
+    rows = [(100, 100, 100, 100), (90, 91, 89, 90)]
+    assert find_hit(rows, take_profit=104, stop_loss=96) == (1, 90, STOP_LOSS)
+    rows = [(100, 100, 100, 100), (110, 111, 109, 110)]
+    assert find_hit(rows, take_profit=104, stop_loss=96) == (1, 110, TAKE_PROFIT)
+
+
+def test_trailing_stop_follows_the_previous_highs():
+    # The low of the second bar is under the stop of its own high, the high may come after the low
+    rows = [(100, 100, 100, 100), (100, 120, 105, 118), (118, 119, 107, 110)]
+    stops = Stops()
+    bars = make_bars(rows)
+    stops.set_trailing(bars, 0, 100, percent_distance=10)
+    stops.find_hit(bars)
+    assert (stops.hit_index, stops.hit_price, stops.hit_kind) == (2, 108, TRAILING_STOP)
+
+    stops.clear()
+    stops.set_trailing(bars, 0, 100, distance=5)
+    stops.find_hit(bars)
+    assert (stops.hit_index, stops.hit_price, stops.hit_kind) == (2, 115, TRAILING_STOP)
+
+
+def test_hits_are_found_after_many_blocks():
+    rows = [(100, 101, 99, 100)] * (3 * SCAN_BLOCK + 10)
+    rows[-5] = (100, 101, 80, 90)
+    assert find_hit(rows, stop_loss=95) == (len(rows) - 5, 95, STOP_LOSS)
+
+
+# run a strategy giving orders and setting stops at some bars, the hit events are listed
+def run(klines, orders, stop_loss=None):
+    engine = make_engine(klines)
+    hits = []
+    engine.events.subscribe(hits.append, [STOP_HIT])
+
+    def strategy(bars, index):
+        if index in stop_loss:
+            engine.set_stop_loss(index, target=stop_loss[index])
+        if index in orders:
+            return Report(orders[index])
+
+    engine.register_strategy(strategy)
+    engine.run_strategy("USDT", "BTC", 1000, 0, 0, finish=False)
+    return engine, hits
+
+
+def test_engine_sells_at_the_stop_price():
+    rows = [(100, 100, 100, 100)] * 3 + [(100, 101, 94, 99)] + [(99, 99, 99, 99)] * 3
+    engine, hits = run(make_klines(rows), {0: "buy"}, stop_loss={0: 95})
+    ledger = engine.wallet.ledger
+    assert ledger.length == 3
+    assert ledger.get("index")[2] == 3 and ledger.get("price")[2] == 95
+    assert [(event.index, event.data["stop"], event.data["price"]) for event in hits] == [(3, "stop_loss", 95)]
+    assert engine.stops.is_empty()
+
+
+def test_stops_without_tokens_are_removed_without_selling():
+    rows = [(100, 100, 100, 100)] * 3 + [(100, 101, 94, 99)] + [(99, 99, 99, 99)] * 3
+    engine, hits = run(make_klines(rows), {}, stop_loss={0: 95})
+    assert engine.wallet.ledger.length == 1
+    assert hits == []
+    assert engine.stops.is_empty()
+
+
+@pytest.mark.parametrize("profile", [False, True])
+def test_sells_of_the_strategy_remove_the_stops(profile):
+    rows = [(100, 100, 100, 100)] * 5 + [(100, 101, 94, 99)] + [(99, 99, 99, 99)] * 3
+    engine = make_engine(make_klines(rows))
+    hits = []
+    engine.events.subscribe(hits.append, [STOP_HIT])
+
+    def strategy(bars, index):
+        if index == 0:
+            engine.set_stop_loss(index, target=95)
+            return Report("buy")
+        if index == 1:
+            return Report("sell")
+        if index == 2:
+            return Report("buy")
+
+    engine.register_strategy(strategy)
+    engine.run_strategy("USDT", "BTC", 1000, 0, 0, finish=False, profile=profile)
+    # The stop loss of the first position isn't hit by the second one
+    assert engine.wallet.ledger.get("index")[1:].tolist() == [0, 1, 2]
+    assert hits == []
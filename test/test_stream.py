@@ -0,0 +1,123 @@
+import numpy as np
+from conftest import make_engine
+from OpenBacktest.ObtEngine import SUMMARY_COLUMNS, Container, Engine, Pair, Report
+from OpenBacktest.ObtGraph import GraphManager
+from OpenBacktest.ObtIndicators import EMA, Bollinger, run_indicator
+
+
+def add_averages(dataframe):
+    dataframe["fast"] = dataframe["close"].rolling(5).mean()
+    dataframe["slow"] = dataframe["close"].rolling(30).mean()
+
+
+def strategy(bars, index):
+    if bars["fast"][index] > bars["slow"][index]:
+        return Report("buy")
+    if bars["fast"][index] < bars["slow"][index]:
+        return Report("sell")
+
+
+def make_indicators():
+    return {"fast": (EMA(5), ("close",)), "slow": (EMA(30), ("close",))}
+
+
+def run(dataframe, **parameters):
+    engine = make_engine(dataframe)
+    engine.register_strategy(strategy)
+    engine.run_strategy("USDT", "BTC", 1000, 0, 0.1, **parameters)
+    return engine
+
+
+def test_stream_keeps_the_columns_of_the_loaded_dataframe(klines, tmp_path):
+    folder = str(tmp_path) + "/"
+    pair = Pair("BTCUSDT", "1 January 2021", "1m", "main", folder)
+    pair.set_dataframe(klines)
+    pair.save(folder, output=False)
+    # Columns added after the files were written
+    add_averages(klines)
+    container = Container()
+    container.add_main_pair(pair)
+    streamed = Engine(container, output=False, load=False)
+    streamed.register_strategy(strategy)
+    streamed.run_strategy("USDT", "BTC", 1000, 0, 0.1, chunk_size=300)
+    full = run(klines)
+    assert streamed.wallet.ledger.length == full.wallet.ledger.length > 1
+    for column, values in full.wallet.ledger.arrays.items():
+        np.testing.assert_array_equal(values[:full.wallet.ledger.length],
+                                      streamed.wallet.ledger.arrays[column][:full.wallet.ledger.length])
+
+
+def test_stream_summary_can_be_plotted(klines, monkeypatch):
+    add_averages(klines)
+    engine = run(klines, chunk_size=300)
+    summary = engine.wallet.dataframe
+    assert tuple(summary.columns) == SUMMARY_COLUMNS
+    for column in SUMMARY_COLUMNS:
+        np.testing.assert_array_equal(summary[column].to_numpy(), klines[column].to_numpy())
+    shown = []
+    monkeypatch.setattr(GraphManager, "show", lambda manager: shown.append(manager))
+    engine.wallet.get_data_handler().plot_wallet()
+    assert shown
+
+
+def test_stream_rejects_window_and_profile(klines, capsys):
+    add_averages(klines)
+    for parameters in ({"start": 10}, {"end": 100}, {"profile": True}):
+        engine = run(klines, chunk_size=300, **parameters)
+        assert engine.wallet is None
+        assert "can't be used with chunk_size" in capsys.readouterr().out
+
+
+def test_default_engine_streams_from_the_file_without_loading_it(klines, tmp_path):
+    folder = str(tmp_path) + "/"
+    pair = Pair("BTCUSDT", "1 January 2021", "1m", "main", folder)
+    pair.set_dataframe(klines)
+    pair.save(folder, output=False)
+    container = Container()
+    container.add_main_pair(Pair("BTCUSDT", "1 January 2021", "1m", "main", folder))
+    streamed = Engine(container, output=False)
+    streamed.register_strategy(strategy)
+    streamed.run_strategy("USDT", "BTC", 1000, 0, 0.1, chunk_size=300, indicators=make_indicators())
+    assert container.main.frame is None
+    # The dataframe is read when it's used
+    assert len(streamed.main_dataframe()) == len(klines)
+
+
+def test_stream_carries_the_state_of_the_indicators(klines):
+    # The strategy looks back one bar, the warmup bars keep the values of the previous chunk
+    def lookback_strategy(bars, index):
+        if index > 0 and bars["fast"][index - 1] > bars["slow"][index - 1]:
+            return Report("buy")
+        return Report("sell")
+
+    full = make_engine(klines.copy())
+    dataframe = full.main_dataframe()
+    dataframe["fast"] = run_indicator(EMA(5), dataframe["close"])
+    dataframe["slow"] = run_indicator(EMA(30), dataframe["close"])
+    full.register_strategy(lookback_strategy)
+    full.run_strategy("USDT", "BTC", 1000, 0, 0.1)
+
+    indicators = dict(make_indicators(), bands=(Bollinger(20), ("close",)))
+    seen = []
+
+    def prepare(chunk):
+        seen.append(chunk["bands_0"].to_numpy().copy())
+
+    streamed = make_engine(klines)
+    streamed.register_strategy(lookback_strategy)
+    streamed.run_strategy("USDT", "BTC", 1000, 0, 0.1, chunk_size=300, warmup=10, indicators=indicators,
+                          prepare=prepare)
+    assert streamed.wallet.ledger.length == full.wallet.ledger.length > 1
+    for column, values in full.wallet.ledger.arrays.items():
+        np.testing.assert_array_equal(values[:full.wallet.ledger.length],
+                                      streamed.wallet.ledger.arrays[column][:full.wallet.ledger.length])
+    # Tuples of values are split in columns, chunks after the first one start with 10 warmup bars
+    bands = run_indicator(Bollinger(20), klines["close"])[0]
+    np.testing.assert_array_equal(np.concatenate([seen[0]] + [chunk[10:] for chunk in seen[1:]]), bands)
+    np.testing.assert_array_equal(seen[1][:10], bands[290:300])
+
+
+def test_indicators_need_chunk_size(klines, capsys):
+    engine = run(klines, indicators=make_indicators())
+    assert engine.wallet is None
+    assert "only used with chunk_size" in capsys.readouterr().out